@@ -0,0 +1,120 @@
+#Public names of every submodule. A submodule is imported on the first access of one of its names, so importing
+#the package is fast, and a worker that only reads files or computes iso-velocity never loads pandas or matplotlib
+SUBMODULES = {
+    #Stage records and exporters
+    'INSTRUMENTATION': 'monitoring',
+    'INSTRUMENTATION_LOCK': 'monitoring',
+    'stage_stack': 'monitoring',
+    'count_rows': 'monitoring',
+    'instrument': 'monitoring',
+    'run_instrumented': 'monitoring',
+    'enable_instrumentation': 'monitoring',
+    'disable_instrumentation': 'monitoring',
+    'instrumentation': 'monitoring',
+    'json_lines_exporter': 'monitoring',
+    'summary_exporter': 'monitoring',
+
+    #Reading and streaming of site files
+    'read_profile': 'io',
+    'split_chunks': 'io',
+    'import_chunk': 'io',
+    'import_file': 'io',
+    'cached_import_file': 'io',
+    'iter_import_file': 'io',
+    'stream_statistics': 'io',
+    'stream_axes': 'io',
+
+    #Merged dataset, compact storage, and queries
+    'resample_depth': 'dataset',
+    'aggregate_measurements': 'dataset',
+    'CompactDataset': 'dataset',
+    'DatasetIndex': 'dataset',
+    'parameter_list': 'dataset',
+    'decimate_points': 'dataset',
+
+    #Velocity grids and on-disk stores
+    'nearest_index': 'grid',
+    'VelocityVolume': 'grid',
+    'SparseVolume': 'grid',
+    'site_profiles': 'grid',
+    'barycentric_weights': 'grid',
+    'grid_profiles': 'grid',
+    'VolumePyramid': 'grid',
+    'ChunkedVolumeStore': 'grid',
+    'plotly_friendly_dataframe': 'grid',
+
+    #Slices and cross sections
+    'northeast_southwest_slice': 'slice',
+    'northwest_southeast_slice': 'slice',
+    'north_south_slice': 'slice',
+    'east_west_slice': 'slice',
+    'haversine_distance': 'slice',
+    'polyline_section': 'slice',
+    'cross_section': 'slice',
+    'section_dataframe': 'slice',
+
+    #Matplotlib visualization
+    'basin_scatterplot': 'plot',
+    'TRIANGULATION_CACHE': 'plot',
+    'slice_contourf': 'plot',
+    'finish_figure': 'plot',
+    'slice_scatterplot': 'plot',
+    'northeast_southwest_contourplot': 'plot',
+    'northwest_southeast_contourplot': 'plot',
+    'latitudinal_longitudinal_contourplot': 'plot',
+    'render_section_chunk': 'plot',
+    'render_sections': 'plot',
+    'isovelocity_contourmap': 'plot',
+
+    #Iso-velocity depth and maps
+    'velocity_crossings': 'constant_velocity',
+    'isovelocity_chunk': 'constant_velocity',
+    'isovelocity': 'constant_velocity',
+    'isovelocity_table': 'constant_velocity',
+    'isodepth_raster': 'constant_velocity',
+    'stream_isovelocity': 'constant_velocity',
+}
+
+__all__ = ['project_documentation'] + list(SUBMODULES)
+
+def project_documentation():
+    markdown_documentation= """ This is the documentation to give description of contained
+    functions. These functions were constructed to perform data visualization from velocity subsurface of a region. The functions have different purpose, including for importing database, arranging dataset which are visualization-ready, and subsetting dataset to create two-dimensional slice of subsurface volume.
+
+# Subsurface Velocity of Basin
+Velocity data that have been acquired can be visualized to illustrate the velocity distribution as one of important geological parameters to indicate basin lithology and/or structure. The visualization is important to be done in two- or three-dimensional to see the distribution pattern for further analysis
+
+## Importing data
+The data is usually obtained from numerous measurements in the same point as well as different point. It leads to hundreds of large-sized database that should be imported. In order to import the data effectively, the dedicated function of importing file was constructed to acquire and merge different files into one single database
+
+## Dataset for Plotly Visualization
+Plotly is a Python visualization package that require grid data as the input. The unified database will be further tailored to follow the required structure that is plotly-friendly
+
+## Create Slice Data
+While Matplotlib and Plotly can execute 3D visualization, 2D plots are also needed to display clearer velocity parameters in certain orientations. This project will create two-dimensional slices in constant latitude (east-west), constant longitude (north_south), as well as diagonal direction
+
+## Iso-velocity contour
+Create depth contour map of constant velocity value (for example, visualize depth contour from V = 1.0 km/s or V = 2.5 km/s) 
+    """
+    
+    return markdown_documentation
+
+def __getattr__(name):
+    """Input: Name of a public function, class, or submodule
+    Function purpose: Import the submodule of the name on first access (PEP 562) and keep the name in the package namespace
+    Return: Function, class, or submodule"""
+    
+    #Import module
+    import importlib
+    
+    if name in SUBMODULES:
+        value = getattr(importlib.import_module('.' + SUBMODULES[name], __name__), name)
+        globals()[name] = value
+        return value
+    if name in set(SUBMODULES.values()):
+        return importlib.import_module('.' + name, __name__)
+    
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
@@ -0,0 +1,334 @@
+#Version of the artifact layout, part of every key so a new layout never reuses old artifacts
+ARTIFACT_VERSION = 1
+
+def artifact_key(step, inputs):
+    """Input: Name of the pipeline step, JSON-serializable description of its inputs (upstream artifact keys, file fingerprints, and parameters)
+    Function purpose: Address an artifact by the content of its inputs, so the same inputs always give the same artifact and any change gives a new one
+    Return: Hexadecimal key"""
+    
+    #Import modules
+    import json
+    import hashlib
+    
+    text = json.dumps({'step': step, 'version': ARTIFACT_VERSION, 'inputs': inputs}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:20]
+
+def file_fingerprint(filenames, content=False):
+    """Input: List of files, whether to hash the file content instead of the size and modification time
+    Function purpose: Describe the input files of the ingest step. As in cached_import_file(), path, size, and modification time are used by default, which needs no read of thousands of files. With content, the SHA-256 of every file is used, so touching a file does not invalidate the artifact
+    Return: List of file descriptions"""
+    
+    #Import modules
+    import os
+    import hashlib
+    
+    fingerprint = []
+    for filename in filenames:
+        path = os.path.abspath(filename)
+        if content:
+            with open(path, 'rb') as f:
+                fingerprint.append([path, hashlib.sha256(f.read()).hexdigest()])
+        else:
+            stat = os.stat(path)
+            fingerprint.append([path, stat.st_size, stat.st_mtime_ns])
+    
+    return fingerprint
+
+def load_state(workspace):
+    """Input: Workspace directory
+    Function purpose: Read the key of the latest artifact of every step, which is the default input of the next step
+    Return: Dictionary of step name and artifact key"""
+    
+    #Import modules
+    import os
+    import json
+    
+    path = os.path.join(workspace, 'state.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(workspace, step, key):
+    """Input: Workspace directory, name of the step, key of its artifact
+    Function purpose: Record the artifact as the latest of the step
+    Return: None"""
+    
+    #Import modules
+    import os
+    import json
+    
+    state = load_state(workspace)
+    state[step] = key
+    temporary = os.path.join(workspace, 'state.json.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(temporary, os.path.join(workspace, 'state.json'))
+
+def upstream_key(workspace, step, key=None):
+    """Input: Workspace directory, name of the upstream step, optional artifact key given by the user
+    Function purpose: Choose the input artifact of a step, which is the latest artifact of the upstream step unless a key is given
+    Return: Artifact key"""
+    
+    if key is None:
+        key = load_state(workspace).get(step)
+    if key is None:
+        raise Exception("No %s artifact in the workspace, run the %s step first" % (step, step))
+    
+    return key
+
+def artifact_path(workspace, step, key, extension):
+    """Input: Workspace directory, name of the step, artifact key, file extension (empty for a directory)
+    Return: Path of the artifact"""
+    
+    #Import module
+    import os
+    
+    return os.path.join(workspace, 'artifacts', '%s-%s%s' % (step, key, extension))
+
+def write_npz(path, **arrays):
+    """Input: Path of the artifact, arrays to store
+    Function purpose: Write the arrays to a temporary file and move it into place, so an interrupted step never leaves a partial artifact
+    Return: Path of the artifact"""
+    
+    #Import modules
+    import os
+    import numpy as np
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+    
+    return path
+
+def run_step(workspace, step, inputs, extension, build, force=False):
+    """Input: Workspace directory, name of the step, description of the inputs, file extension of the artifact, function that writes the artifact to a given path, whether to rebuild an existing artifact
+    Function purpose: Run a step only when there is no artifact for its inputs, and record the artifact as the latest of the step
+    Return: Artifact key and path"""
+    
+    #Import module
+    import os
+    
+    key = artifact_key(step, inputs)
+    path = artifact_path(workspace, step, key, extension)
+    
+    if os.path.exists(path) and not force:
+        print("%s: unchanged inputs, reusing %s" % (step, path))
+    else:
+        build(path)
+        print("%s: wrote %s" % (step, path))
+    save_state(workspace, step, key)
+    
+    return key, path
+
+def ingest(workspace, patterns, workers=None, content=False, force=False):
+    """Input: Workspace directory, list of files or glob patterns of the site files, optional number of worker processes, whether to fingerprint the file content, whether to rebuild
+    Function purpose: Import the site files into the merged dataset artifact with import_file()
+    Return: Artifact key and path"""
+    
+    #Import modules
+    import os
+    import glob
+    import numpy as np
+    from .io import import_file
+    
+    filenames = sorted(set(name for pattern in patterns for name in (glob.glob(pattern) or [pattern])))
+    missing = [name for name in filenames if not os.path.isfile(name)]
+    if missing:
+        raise Exception("Site files not found: %s" % ", ".join(missing[:5]))
+    
+    def build(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.tmp.npy'
+        np.save(temporary, import_file(filenames, workers))
+        os.replace(temporary, path)
+    
+    return run_step(workspace, 'ingest', {'files': file_fingerprint(filenames, content)}, '.npy', build, force)
+
+def grid(workspace, source=None, resolution=None, method='nearest', force=False):
+    """Input: Workspace directory, optional key of the ingest artifact, optional grid spacing in degrees, interpolation method of grid_profiles(), whether to rebuild
+    Function purpose: Build the velocity grid artifact from the merged dataset, as the measured grid of VelocityVolume.from_array() or interpolated at a resolution by grid_profiles(). The interpolation method is only part of the key when a resolution is given, since the measured grid does not use it
+    Return: Artifact key and path"""
+    
+    #Import modules
+    import numpy as np
+    from .grid import VelocityVolume, grid_profiles
+    
+    source = upstream_key(workspace, 'ingest', source)
+    
+    def build(path):
+        array = np.asarray(np.load(artifact_path(workspace, 'ingest', source, '.npy'), mmap_mode='r'))
+        volume = VelocityVolume.from_array(array) if resolution is None else grid_profiles(array, resolution, method)
+        write_npz(path, latitude=volume.latitude, longitude=volume.longitude, depth=volume.depth, values=volume.values)
+    
+    inputs = {'ingest': source, 'resolution': resolution}
+    if resolution is not None:
+        inputs['method'] = method
+    
+    return run_step(workspace, 'grid', inputs, '.npz', build, force)
+
+def load_volume(workspace, key):
+    """Input: Workspace directory, key of the grid artifact
+    Return: VelocityVolume of the artifact"""
+    
+    #Import modules
+    import numpy as np
+    from .grid import VelocityVolume
+    
+    with np.load(artifact_path(workspace, 'grid', key, '.npz')) as data:
+        return VelocityVolume(data['latitude'], data['longitude'], data['depth'], data['values'])
+
+def sections(workspace, source=None, longitudes=(), latitudes=(), lines=(), spacing=1.0, force=False):
+    """Input: Workspace directory, optional key of the grid artifact, longitudes of north-south sections, latitudes of east-west sections, (latitude, longitude, latitude, longitude) of straight cross sections, sample spacing of the cross sections in kilometres, whether to rebuild
+    Function purpose: Cut the requested sections from the grid into one artifact, in the (x, depth, velocity) form of render_sections()
+    Return: Artifact key and path"""
+    
+    #Import modules
+    import numpy as np
+    from .slice import cross_section
+    
+    source = upstream_key(workspace, 'grid', source)
+    if not (longitudes or latitudes or lines):
+        raise Exception("No section requested")
+    
+    def build(path):
+        volume = load_volume(workspace, source)
+        cut = []
+        for longitude in longitudes:
+            cut.append(('Longitude %s' % longitude, volume.latitude, volume.north_south_section(longitude)))
+        for latitude in latitudes:
+            cut.append(('Latitude %s' % latitude, volume.longitude, volume.east_west_section(latitude)))
+        for line in lines:
+            distance, section = cross_section(volume, tuple(line[:2]), tuple(line[2:]), spacing)[2:]
+            cut.append(('%s, %s to %s, %s' % tuple(line), distance, section))
+        
+        arrays = {'depth': volume.depth, 'titles': np.array([title for title, _, _ in cut])}
+        for i, (_, x, section) in enumerate(cut):
+            arrays['x_%d' % i] = x
+            arrays['values_%d' % i] = section
+        write_npz(path, **arrays)
+    
+    inputs = {'grid': source, 'longitudes': list(longitudes), 'latitudes': list(latitudes),
+              'lines': [list(line) for line in lines], 'spacing': spacing}
+    return run_step(workspace, 'slice', inputs, '.npz', build, force)
+
+def isovelocity_depth(workspace, velocities, source=None, force=False):
+    """Input: Workspace directory, list of velocity values, optional key of the ingest artifact, whether to rebuild
+    Function purpose: Compute the iso-velocity depth of every site from the merged dataset artifact with isovelocity_table()
+    Return: Artifact key and path"""
+    
+    #Import modules
+    import numpy as np
+    from .constant_velocity import isovelocity_table
+    
+    source = upstream_key(workspace, 'ingest', source)
+    
+    def build(path):
+        array = np.asarray(np.load(artifact_path(workspace, 'ingest', source, '.npy'), mmap_mode='r'))
+        sites, depth = isovelocity_table(array, velocities)
+        write_npz(path, sites=sites, depth=depth, velocities=np.asarray(velocities, dtype=float))
+    
+    return run_step(workspace, 'isovelocity', {'ingest': source, 'velocities': list(velocities)}, '.npz', build, force)
+
+def render(workspace, source=None, maps=None, fmt='png', cmap=None, levels=20, workers=None, force=False):
+    """Input: Workspace directory, optional key of the slice artifact (or of the isovelocity artifact with maps), optional raster spacing in degrees to render the iso-velocity maps instead of the sections, image format, optional colour map ('RdBu' for the sections and 'viridis_r' for the maps by default), contour levels of the maps, optional number of worker processes, whether to rebuild
+    Function purpose: Render the sections with render_sections(), or the iso-velocity depth maps with isodepth_raster() and isovelocity_contourmap(), into an artifact directory. Only this step runs again after a change of style, and the key holds only the style options used by the chosen mode
+    Return: Artifact key and path"""
+    
+    #Import modules
+    import os
+    import shutil
+    import numpy as np
+    
+    upstream = 'slice' if maps is None else 'isovelocity'
+    source = upstream_key(workspace, upstream, source)
+    if cmap is None:
+        cmap = 'RdBu' if maps is None else 'viridis_r'
+    
+    def build(path):
+        temporary = path + '.tmp'
+        shutil.rmtree(temporary, ignore_errors=True)
+        with np.load(artifact_path(workspace, upstream, source, '.npz')) as data:
+            if maps is None:
+                from .plot import render_sections
+                titles = [str(title) for title in data['titles']]
+                cut = [(data['x_%d' % i], data['depth'], data['values_%d' % i]) for i in range(len(titles))]
+                render_sections(cut, temporary, titles, fmt, workers, cmap)
+            else:
+                from .constant_velocity import isodepth_raster
+                from .plot import isovelocity_contourmap
+                lat_axis, lon_axis, raster = isodepth_raster(data['sites'], data['depth'], maps)
+                isovelocity_contourmap(lat_axis, lon_axis, raster, list(data['velocities']), temporary, levels, fmt, cmap)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+    
+    #Contour levels only change the maps
+    inputs = {upstream: source, 'maps': maps, 'fmt': fmt, 'cmap': cmap}
+    if maps is not None:
+        inputs['levels'] = levels
+    return run_step(workspace, 'render', inputs, '', build, force)
+
+def build_parser():
+    """Function purpose: Define the command line with one subcommand per pipeline step
+    Return: argparse parser"""
+    
+    #Import module
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='python -m basin_velocity',
+                                     description="Basin velocity pipeline. Every step writes a content-addressed artifact into the workspace and is skipped when its inputs are unchanged")
+    parser.add_argument('--workspace', default='basin_workspace', help="directory of the artifacts (default: basin_workspace)")
+    parser.add_argument('--force', action='store_true', help="rebuild the artifact even when the inputs are unchanged")
+    steps = parser.add_subparsers(dest='step', required=True)
+    
+    step = steps.add_parser('ingest', help="import the site files into the merged dataset")
+    step.add_argument('files', nargs='+', help="site files or glob patterns")
+    step.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    step.add_argument('--content-hash', action='store_true', help="fingerprint the file content instead of size and modification time")
+    
+    step = steps.add_parser('grid', help="build the velocity grid from the merged dataset")
+    step.add_argument('--source', default=None, help="key of the ingest artifact (default: latest)")
+    step.add_argument('--resolution', type=float, default=None, help="grid spacing in degrees, interpolated by grid_profiles()")
+    step.add_argument('--method', default='nearest', choices=['nearest', 'idw', 'linear'], help="interpolation method")
+    
+    step = steps.add_parser('slice', help="cut sections from the velocity grid")
+    step.add_argument('--source', default=None, help="key of the grid artifact (default: latest)")
+    step.add_argument('--longitude', type=float, nargs='+', default=[], help="longitudes of north-south sections")
+    step.add_argument('--latitude', type=float, nargs='+', default=[], help="latitudes of east-west sections")
+    step.add_argument('--line', type=float, nargs=4, action='append', default=[], metavar=('LAT1', 'LON1', 'LAT2', 'LON2'), help="straight cross section between two points")
+    step.add_argument('--spacing', type=float, default=1.0, help="sample spacing of cross sections in kilometres")
+    
+    step = steps.add_parser('isovelocity', help="compute the depth of constant velocity at every site")
+    step.add_argument('velocities', type=float, nargs='+', help="velocity values in km/s")
+    step.add_argument('--source', default=None, help="key of the ingest artifact (default: latest)")
+    
+    step = steps.add_parser('render', help="render the sections, or the iso-velocity maps with --maps")
+    step.add_argument('--source', default=None, help="key of the slice or isovelocity artifact (default: latest)")
+    step.add_argument('--maps', type=float, default=None, metavar='RESOLUTION', help="render iso-velocity depth maps on a raster of this spacing in degrees")
+    step.add_argument('--format', default='png', choices=['png', 'svg'], help="image format")
+    step.add_argument('--cmap', default=None, help="colour map, RdBu for the sections and viridis_r for the maps by default")
+    step.add_argument('--levels', type=int, default=20, help="contour levels of the maps")
+    step.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    
+    return parser
+
+def main(argv=None):
+    """Input: Optional list of command line arguments
+    Function purpose: Run one pipeline step from the command line
+    Return: Exit status"""
+    
+    args = build_parser().parse_args(argv)
+    
+    if args.step == 'ingest':
+        ingest(args.workspace, args.files, args.workers, args.content_hash, args.force)
+    elif args.step == 'grid':
+        grid(args.workspace, args.source, args.resolution, args.method, args.force)
+    elif args.step == 'slice':
+        sections(args.workspace, args.source, args.longitude, args.latitude, args.line, args.spacing, args.force)
+    elif args.step == 'isovelocity':
+        isovelocity_depth(args.workspace, args.velocities, args.source, args.force)
+    else:
+        render(args.workspace, args.source, args.maps, args.format, args.cmap, args.levels, args.workers, args.force)
+    
+    return 0
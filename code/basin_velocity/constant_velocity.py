@@ -0,0 +1,277 @@
+from .monitoring import instrument
+from .io import read_profile, split_chunks
+from .grid import VelocityVolume, SparseVolume, site_profiles, barycentric_weights, ChunkedVolumeStore
+
+def velocity_crossings(depth, profiles, velocities, all_crossings=False, chunk_size=16384):
+    """Input: 1D numpy array of depth increasing downwards, 2D numpy array of velocity with shape (sites, depth), list or array of velocity values, optional flag to return every crossing, optional number of sites per chunk
+    Function purpose: Find the depth where each profile reaches each velocity, also for profiles with velocity inversions. Every profile is compared with the velocity over the whole site-by-depth matrix, and a sign change between neighbouring valid samples marks a crossing that is linearly interpolated. NaN samples are skipped, so profiles with their own depth sampling on a common depth axis are interpolated between their own samples. The first crossing is the shallowest sample at or above the velocity, so a profile that starts above the velocity gives the top depth and a profile that never reaches it gives NaN. Sites are processed in chunks to bound memory
+    Return: 2D numpy array of first-crossing depth with shape (sites, velocities), or with all_crossings, 1D numpy arrays of site index, velocity index, and depth of every crossing"""
+    
+    #Import module
+    import numpy as np
+    
+    depth = np.asarray(depth, dtype=float)
+    profiles = np.atleast_2d(profiles)
+    velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+    
+    #Exception handling
+    if profiles.shape[1] != len(depth):
+        raise Exception("Velocity profiles do not follow the depth axis")
+    
+    first_depth = np.full((len(profiles), len(velocities)), np.nan)
+    crossing_site, crossing_velocity, crossing_depth = [], [], []
+    
+    for start in range(0, len(profiles), chunk_size):
+        chunk = profiles[start:start + chunk_size]
+        site_index = np.arange(len(chunk))
+        
+        #Last valid sample at or before every sample, -1 before the first valid sample
+        valid = ~np.isnan(chunk)
+        last_valid = np.maximum.accumulate(np.where(valid, np.arange(chunk.shape[1]), -1), axis=1)
+        previous = last_valid[:, :-1]
+        
+        for v_index, velocity in enumerate(velocities):
+            #Samples at or above the velocity, NaN samples are never above
+            above = chunk >= velocity
+            
+            if all_crossings:
+                #Sign change between a valid sample and the valid sample before it
+                above_previous = np.take_along_axis(above, np.maximum(previous, 0), axis=1)
+                change = valid[:, 1:] & (previous >= 0) & (above[:, 1:] != above_previous)
+                site, upper = np.nonzero(change)
+                lower = previous[site, upper]
+                upper = upper + 1
+                v_lower = chunk[site, lower]
+                v_upper = chunk[site, upper]
+                fraction = (velocity - v_lower) / (v_upper - v_lower)
+                crossing_site.append(site + start)
+                crossing_velocity.append(np.full(len(site), v_index))
+                crossing_depth.append(depth[lower] + fraction * (depth[upper] - depth[lower]))
+                continue
+            
+            #First sample at or above the velocity
+            upper = above.argmax(axis=1)
+            reached = above[site_index, upper]
+            lower = np.where(upper > 0, last_valid[site_index, np.maximum(upper - 1, 0)], -1)
+            top = lower < 0
+            lower = np.where(top, upper, lower)
+            v_lower = chunk[site_index, lower]
+            v_upper = chunk[site_index, upper]
+            
+            #Interpolate between the sample above and the last valid sample before it, unless it is the first valid sample
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = (velocity - v_lower) / (v_upper - v_lower)
+            fraction = np.where(top, 1.0, fraction)
+            z = depth[lower] + fraction * (depth[upper] - depth[lower])
+            first_depth[start:start + len(chunk), v_index] = np.where(reached, z, np.nan)
+    
+    if all_crossings:
+        if not crossing_site:
+            return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+        site = np.concatenate(crossing_site)
+        velocity_index = np.concatenate(crossing_velocity)
+        z = np.concatenate(crossing_depth)
+        order = np.lexsort((z, velocity_index, site))
+        return site[order], velocity_index[order], z[order]
+    
+    return first_depth
+
+def isovelocity_chunk(filenames, velocity):
+    """Input: list of file directories, a velocity value
+    Function purpose: Interpolate the depth of the velocity value for a chunk of site files. This is the unit of work of a single process in the parallel isovelocity
+    Return: 2D array of iso-velocity data of the chunk"""
+    
+    import numpy as np
+    
+    #One row of latitude, longitude, and depth per file
+    z_array = np.empty((len(filenames), 3))
+
+    #Create numpy array with loop
+    for row, file in enumerate(filenames):
+        #Import a single .dat file
+        vs_lat, vs_lon, profile = read_profile(file)
+        vs_deptharray = profile[:,0]
+        vs_velarray = profile[:,1]
+        
+        #Interpolate for obtaining depth location of input velocity (ZVel) at the first crossing
+        #For example, Z1.3 is the depth where the shear wave velocity equals 1.3 km per second
+        z = velocity_crossings(vs_deptharray, vs_velarray, velocity)[0, 0]
+        z_array[row] = (vs_lat, vs_lon, z*1000)
+    
+    return z_array
+
+@instrument
+def isovelocity(filenames, velocity, workers=None):
+    """Input: list of file directories, a velocity value, optional number of worker processes
+    Function purpose: built 2D numpy array that contains depth of desired constant velocity to create isovelocity contour map. This 2D numpy array is made through the iteration of available files, interpolate the depth where the velocity is first reached (NaN when it is never reached), and stack all data into one single array. When workers is given, the file list is split into chunks that are processed in a process pool
+    Return: 2D array of iso-velocity data"""
+    
+    #Exception Handling
+    if not type(filenames) is list:
+        raise TypeError("Your input data should be list of external files")
+    if not type(velocity) is float:
+        raise TypeError("Your input velocity should be float type")
+    if workers is not None and (type(workers) is not int or workers < 1):
+        raise Exception("Number of workers should be a positive integer")
+    
+    import numpy as np
+    
+    #Serial iteration in the current process
+    if workers is None or workers == 1 or len(filenames) < 2:
+        return isovelocity_chunk(filenames, velocity)
+    
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    
+    #Process chunks in parallel, map keeps the order of the chunks
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        z_list = list(executor.map(partial(isovelocity_chunk, velocity=velocity), 
+                                   split_chunks(filenames, workers)))
+    
+    #Join all chunk arrays
+    z_array = np.concatenate(z_list)
+    
+    return z_array
+
+@instrument
+def isovelocity_table(data, velocities):
+    """Input: 2D numpy array of merged velocity dataset, CompactDataset, VelocityVolume, SparseVolume, or ChunkedVolumeStore, list or array of velocity values
+    Function purpose: Compute the depth of every velocity value at every site in one vectorized pass over the already loaded dataset, instead of reading all files again for each velocity. As in isovelocity(), the depth is taken at the first crossing of the velocity from velocity_crossings(), and it is NaN where the profile never reaches the velocity
+    Return: 2D numpy array of site latitude and longitude, and 2D numpy array of depth in metres with shape (sites, velocities)"""
+    
+    #Import module
+    import numpy as np
+    
+    #Exception handling
+    velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+    if velocities.ndim != 1:
+        raise Exception("Velocity values should be a one-dimensional list")
+    
+    #Process an on-disk store one horizontal block of chunks at a time
+    if isinstance(data, ChunkedVolumeStore):
+        results = [isovelocity_table(VelocityVolume(data.latitude[lat_window], data.longitude[lon_window], 
+                                                    data.depth, block), velocities)
+                   for lat_window, lon_window, block in data.iter_blocks()]
+        return (np.concatenate([sites for sites, _ in results]), 
+                np.concatenate([z for _, z in results]))
+    
+    #One profile per site
+    if isinstance(data, (VelocityVolume, SparseVolume)):
+        sites, d_value, profiles = data.site_profiles()
+    else:
+        sites, d_value, profiles = site_profiles(data)
+    
+    #Order depth downwards from the surface, in positive kilometres as in the files
+    depth = -d_value[::-1]
+    profiles = profiles[:, ::-1]
+    
+    #Depth of the first crossing of every velocity
+    z = velocity_crossings(depth, profiles, velocities)
+    
+    return sites, z * 1000
+
+@instrument
+def isodepth_raster(sites, depths, resolution, cache_file=None):
+    """Input: 2D numpy array of site latitude and longitude, 1D or 2D numpy array of iso-depth with one column per velocity (for example from isovelocity_table()), grid spacing in degrees (one value or a pair of latitude and longitude spacing), optional .npz file to cache the raster
+    Function purpose: Grid scattered iso-depth points onto a regular latitude-longitude raster. The sites are triangulated once and the barycentric weights of the raster nodes are computed once, then every velocity column is interpolated by the same weights. The raster is stored in the cache file together with a fingerprint of the input, and it is loaded from there when the input is unchanged
+    Return: Latitude axis, longitude axis, and 3D numpy array of depth with shape (velocities, latitude, longitude)"""
+    
+    #Import modules
+    import os
+    import hashlib
+    import numpy as np
+    from scipy.spatial import Delaunay
+    
+    sites = np.asarray(sites, dtype=float)
+    depths = np.asarray(depths, dtype=float).reshape(len(sites), -1)
+    resolution = np.broadcast_to(np.asarray(resolution, dtype=float), (2,))
+    
+    #Exception handling
+    if sites.ndim != 2 or sites.shape[1] != 2:
+        raise Exception("Sites should have two columns of latitude and longitude")
+    if not (resolution > 0).all():
+        raise Exception("Grid resolution must be positive")
+    
+    #Fingerprint of the input to validate the cache
+    key = hashlib.sha1(np.ascontiguousarray(sites).tobytes() + np.ascontiguousarray(depths).tobytes()
+                       + resolution.tobytes()).hexdigest()
+    if cache_file is not None and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if str(cached['key']) == key:
+                return cached['latitude'], cached['longitude'], cached['raster']
+    
+    #Regular axes covering all sites
+    lat_axis = np.arange(sites[:,0].min(), sites[:,0].max() + resolution[0] / 2, resolution[0])
+    lon_axis = np.arange(sites[:,1].min(), sites[:,1].max() + resolution[1] / 2, resolution[1])
+    
+    #Triangulate once and interpolate all velocity columns with the same weights
+    scale = np.cos(np.radians(sites[:,0].mean()))
+    lat_grid, lon_grid = np.meshgrid(lat_axis, lon_axis, indexing='ij')
+    node_xy = np.stack((lat_grid.reshape(-1), lon_grid.reshape(-1) * scale), axis=1)
+    vertices, weight = barycentric_weights(Delaunay(np.stack((sites[:,0], sites[:,1] * scale), axis=1)), node_xy)
+    raster = np.einsum('nk,nkv->vn', weight, depths[vertices]).reshape(-1, len(lat_axis), len(lon_axis))
+    
+    if cache_file is not None:
+        np.savez(cache_file, key=key, latitude=lat_axis, longitude=lon_axis, raster=raster)
+    
+    return lat_axis, lon_axis, raster
+
+def stream_isovelocity(batches, velocities):
+    """Input: iterable of 2D numpy arrays of velocity dataset, or of (batch, file index of every row) from iter_import_file() with return_sites, list or array of velocity values
+    Function purpose: Compute the depth of every velocity at every site while the dataset is streamed. A site is a run of rows with the same file index, or without file index, a run of consecutive rows with the same coordinate, so consecutive files with the same coordinate are only kept apart with the file index. The rows of the last site of a batch are carried over to the next batch, and the first crossing of every complete site is interpolated on its own depth samples, as in isovelocity()
+    Return: 2D numpy array of site latitude and longitude, and 2D numpy array of depth in metres with shape (sites, velocities), with the sites in input order. With the file index, the rows match isovelocity() of every velocity"""
+    
+    #Import module
+    import numpy as np
+    
+    velocities = np.atleast_1d(np.asarray(velocities, dtype=float))
+    
+    def first_crossings(data, start):
+        #Same rule as velocity_crossings() on every ragged profile, with the first sample at or above the velocity found by reduceat
+        stop = np.append(start[1:], len(data))
+        depth, vel = -data[:,2], data[:,3]
+        last_valid = np.maximum.accumulate(np.where(np.isnan(vel), -1, np.arange(len(data))))
+        site_start = np.repeat(start, stop - start)
+        z = np.full((len(start), len(velocities)), np.nan)
+        for v_index, velocity in enumerate(velocities):
+            upper = np.minimum.reduceat(np.where(vel >= velocity, np.arange(len(data)), len(data)), start)
+            reached = upper < stop
+            upper = np.where(reached, upper, start)
+            lower = last_valid[np.maximum(upper - 1, 0)]
+            top = (upper == start) | (lower < site_start[upper])
+            lower = np.where(top, upper, lower)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = (velocity - vel[lower]) / (vel[upper] - vel[lower])
+            fraction = np.where(top, 1.0, fraction)
+            z[:, v_index] = np.where(reached, depth[lower] + fraction * (depth[upper] - depth[lower]), np.nan)
+        return data[start, :2], z * 1000
+    
+    site_list = [np.empty((0, 2))]
+    z_list = [np.empty((0, len(velocities)))]
+    carry, carry_key = np.empty((0, 4)), np.empty(0)
+    
+    for batch in batches:
+        #Key of every row, the file index or the coordinate
+        if isinstance(batch, tuple):
+            batch, key = batch
+            data, key = np.concatenate((carry, batch)), np.concatenate((carry_key, key))
+            change = np.flatnonzero(key[1:] != key[:-1]) + 1
+        else:
+            data = np.concatenate((carry, batch))
+            change = np.flatnonzero((data[1:, 0] != data[:-1, 0]) | (data[1:, 1] != data[:-1, 1])) + 1
+            key = np.empty(len(data))
+        start = np.concatenate(([0], change))
+        
+        #Every site but the last one is complete
+        if len(start) > 1:
+            sites, z = first_crossings(data[:start[-1]], start[:-1])
+            site_list.append(sites)
+            z_list.append(z)
+        carry, carry_key = data[start[-1]:], key[start[-1]:]
+    
+    if len(carry):
+        sites, z = first_crossings(carry, np.array([0]))
+        site_list.append(sites)
+        z_list.append(z)
+    
+    return np.concatenate(site_list), np.concatenate(z_list)
@@ -0,0 +1,699 @@
+from .monitoring import instrument
+
+@instrument
+def resample_depth(array, depth=None, spacing=None):
+    """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset, optional common depth axis in the sign of the dataset column, optional depth spacing of an automatic axis
+    Function purpose: Resample profiles with different depth sampling onto one common depth axis, so parameter_list() and the grid stay small. Without a depth axis, the axis spans the depth of all sites with the given spacing, or with the median spacing of the profiles. All sites are interpolated together: the rows are sorted by site and depth, every site is shifted by its own depth offset into one increasing array, and the target depths of all sites are located by a single searchsorted. Depths outside the measured range of a site are left out
+    Return: 2D numpy array of latitude, longitude, depth, and velocity with every site on the common depth axis"""
+    
+    #Import module
+    import numpy as np
+    
+    #Raise exception
+    if spacing is not None and spacing <= 0:
+        raise Exception("Depth spacing should be positive")
+    
+    #Site of every row from the site table of a compact dataset
+    if isinstance(array, CompactDataset):
+        site, sites = array.site_index(), array.sites
+        d, velocity = array.depth.astype(np.float64), array.velocity
+    else:
+        #Raise exception
+        if type(array) != np.ndarray:
+            raise TypeError("Input must be a numpy array")
+        if array.ndim != 2 or array.shape[1] != 4:
+            raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+        
+        #Site of every row from runs of the same coordinate
+        change = np.flatnonzero((array[1:, 0] != array[:-1, 0]) | (array[1:, 1] != array[:-1, 1])) + 1
+        site = np.zeros(len(array), dtype=np.int64)
+        site[change] = 1
+        site = np.cumsum(site)
+        sites = array[np.concatenate(([0], change)), :2]
+        d, velocity = array[:,2], array[:,3]
+    
+    #Shift each site into its own depth interval of one increasing array, which a single sort orders by site and depth
+    if depth is not None:
+        depth = np.asarray(depth, dtype=float)
+    span = max(d.max(), depth.max() if depth is not None else d.max()) - min(d.min(), depth.min() if depth is not None else d.min()) + 1.0
+    shifted = (d - d.min()) + site * span
+    order = np.argsort(shifted)
+    site, shifted, vel = site[order], shifted[order], velocity[order]
+    
+    #Automatic axis from the top of the shallowest to the bottom of the deepest site
+    if depth is None:
+        if spacing is None:
+            step = np.diff(shifted)
+            step = step[(np.diff(site) == 0) & (step > 0)]
+            spacing = np.median(step) if len(step) else 1.0
+        count = int(np.floor((d.max() - d.min()) / spacing + 1e-9)) + 1
+        depth = d.max() - np.arange(count) * spacing
+    query = ((depth[None, :] - d.min()) + np.arange(len(sites))[:, None] * span).reshape(-1)
+    query_site = np.repeat(np.arange(len(sites)), len(depth))
+    
+    #Bracketing rows of every target depth, kept inside the site
+    first = np.searchsorted(site, np.arange(len(sites)), 'left')[query_site]
+    last = np.searchsorted(site, np.arange(len(sites)), 'right')[query_site] - 1
+    upper = np.clip(np.searchsorted(shifted, query, 'left'), first, last)
+    lower = np.clip(upper - 1, first, last)
+    inside = (query >= shifted[first]) & (query <= shifted[last])
+    
+    #Linear interpolation, exact where a target depth is measured
+    gap = shifted[upper] - shifted[lower]
+    weight = np.divide(query - shifted[lower], gap, out=np.zeros_like(query), where=gap > 0)
+    value = vel[lower] + weight * (vel[upper] - vel[lower])
+    value = np.where(weight == 0, vel[lower], np.where(weight == 1, vel[upper], value))
+    
+    result = np.empty((len(query), 4))
+    result[:, :2] = sites[query_site]
+    result[:,2] = np.tile(depth, len(sites))
+    result[:,3] = value
+    
+    return result[inside]
+
+@instrument
+def aggregate_measurements(array, tolerance=0.0, statistic='mean'):
+    """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset, tolerance of the same location (one value or latitude, longitude, and depth tolerance; zero for exact coordinates), statistic of the velocity of repeated measurements ('mean', 'median', 'std', or 'count')
+    Function purpose: Merge repeated measurements at the same point. Coordinates are quantized into integer keys of the tolerance, the rows are sorted by key once, and every group of equal keys is reduced with numpy reduceat instead of dropping all but the first row. NaN velocity is left out of the statistics. The coordinate of a group is the mean of its rows. The latitude and longitude keys of a CompactDataset are computed once per site of its site table, and its rows are only expanded in sorted order
+    Return: 2D numpy array of latitude, longitude, depth, and aggregated velocity sorted by location, 1D numpy array of standard deviation of the velocity as uncertainty, and 1D numpy array of the number of measurements"""
+    
+    #Import module
+    import numpy as np
+    
+    #Raise exception
+    if not isinstance(array, CompactDataset) and type(array) != np.ndarray:
+        raise TypeError("Input must be a numpy array or CompactDataset")
+    if type(array) == np.ndarray and (array.ndim != 2 or array.shape[1] != 4):
+        raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+    if statistic not in ['mean', 'median', 'std', 'count']:
+        raise Exception("Invalid statistic of repeated measurements")
+    tolerance = np.broadcast_to(np.asarray(tolerance, dtype=float), (3,))
+    if (tolerance < 0).any():
+        raise Exception("Tolerance should not be negative")
+    
+    #Columns of the rows with velocity, and the site of every row for columns stored per site
+    if isinstance(array, CompactDataset):
+        vel = array.velocity
+        rows = np.flatnonzero(~np.isnan(vel))
+        site = array.site_index()[rows]
+        columns = [array.sites[:,0], array.sites[:,1], array.depth[rows].astype(np.float64), vel[rows]]
+        column_rows = [site, site, None, None]
+    else:
+        array = array[~np.isnan(array[:,3])]
+        columns = [array[:,0], array[:,1], array[:,2], array[:,3]]
+        column_rows = [None] * 4
+    if len(columns[3]) == 0:
+        return np.empty((0, 4)), np.empty(0), np.empty(0, dtype=np.int64)
+    
+    def take(i, order=None):
+        #Column of every row, optionally in sorted order
+        index = column_rows[i] if order is None else order if column_rows[i] is None else column_rows[i][order]
+        return columns[i] if index is None else columns[i][index]
+    
+    #Integer key of every coordinate, as rank of the exact coordinate when there is no tolerance
+    keys = []
+    for i in range(3):
+        if tolerance[i] > 0:
+            key = np.rint(columns[i] / tolerance[i]).astype(np.int64)
+            key = key - key.min()
+        else:
+            key = np.unique(columns[i], return_inverse=True)[1].reshape(-1).astype(np.int64)
+        keys.append(key if column_rows[i] is None else key[column_rows[i]])
+    extent = [int(key.max()) + 1 for key in keys]
+    
+    #One location key when it fits in 64 bits, so a single sort groups the rows
+    if extent[0] * extent[1] * extent[2] < 2**63:
+        location = (keys[0] * extent[1] + keys[1]) * extent[2] + keys[2]
+        if statistic == 'median':
+            #Velocity order inside a location is kept by a stable sort
+            order = np.argsort(take(3))
+            order = order[np.argsort(location[order], kind='stable')]
+        else:
+            order = np.argsort(location)
+        location = location[order]
+        change = np.empty(len(order), dtype=bool)
+        change[0] = True
+        change[1:] = location[1:] != location[:-1]
+    else:
+        order = np.lexsort((take(3), keys[2], keys[1], keys[0]))
+        change = np.zeros(len(order), dtype=bool)
+        change[0] = True
+        for key in keys:
+            key = key[order]
+            change[1:] |= key[1:] != key[:-1]
+    data = np.stack([take(i, order) for i in range(4)], axis=1)
+    
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, len(data)))
+    
+    #Group mean of coordinates and velocity
+    result = np.add.reduceat(data, starts, axis=0) / counts[:, None]
+    
+    #Two-pass standard deviation as uncertainty
+    deviation = data[:,3] - np.repeat(result[:,3], counts)
+    std = np.sqrt(np.add.reduceat(deviation**2, starts) / counts)
+    
+    if statistic == 'median':
+        result[:,3] = (data[starts + (counts - 1) // 2, 3] + data[starts + counts // 2, 3]) / 2
+    elif statistic == 'std':
+        result[:,3] = std
+    elif statistic == 'count':
+        result[:,3] = counts
+    
+    return result, std, counts
+
+class CompactDataset:
+    """Input: 2D numpy array of site latitude and longitude, 1D numpy arrays of row offset and row count of every site, flat depth array, flat stored velocity array, scale and offset that decode quantized velocity
+    Purpose: Hold the merged dataset without repeating latitude and longitude on every depth row. The site table stores coordinates with the row range of each site, and depth and velocity are flat arrays. Velocity can be stored as float64, float32, or 16-bit fixed point, and depth as float32 in the compact modes. The dataset can be built from a whole array or batch by batch from iter_import_file(), and the grids, slices, and queries read the site table directly instead of expanding it.
+    Error bounds: float32 has a relative error of at most 2**-24 (about 6e-8) of each value, which applies to the depth of every compact mode and to float32 velocity, so a depth of 3 km is off by at most about 0.2 mm. Fixed point maps the velocity range of the dataset onto 65535 steps, so the absolute error is at most half a step, (maximum - minimum) / 65534 / 2. error_bound reports the bounds of both columns. NaN velocity is kept as NaN in every mode"""
+    
+    def __init__(self, sites, offsets, lengths, depth, velocity, scale=None, offset=None):
+        self.sites = sites
+        self.offsets = offsets
+        self.lengths = lengths
+        self.depth = depth
+        self.stored_velocity = velocity
+        self.scale = scale
+        self.offset = offset
+    
+    @classmethod
+    def from_array(cls, array, storage='float32'):
+        """Input parameter: 2D Numpy array of merged velocity dataset, storage mode of velocity ('float64', 'float32', or 'quantized')
+        Function purpose: Build the compact dataset. Consecutive rows with the same latitude and longitude form one site, as written by import_file() for every file
+        Return: CompactDataset"""
+        
+        #Import module
+        import numpy as np
+        
+        #Raise exception
+        if type(array) != np.ndarray:
+            raise TypeError("Input must be a numpy array")
+        
+        return cls.from_batches([array], storage)
+    
+    @classmethod
+    def from_batches(cls, batches, storage='float32', velocity_range=None):
+        """Input parameter: iterable of 2D numpy arrays of velocity dataset, or of (batch, file index of every row) from iter_import_file() with return_sites, storage mode of velocity ('float64', 'float32', or 'quantized'), optional minimum and maximum velocity of the fixed point scale
+        Function purpose: Build the compact dataset batch by batch, so the float64 array of the whole dataset is never held in memory. A site is a run of rows with the same file index, or without file index, a run of consecutive rows with the same coordinate, and a site that continues in the next batch is joined. Depth and velocity of every batch are converted to their stored type at once. Fixed point needs the velocity range before encoding: with velocity_range every batch is encoded at once, otherwise velocity is kept as float64 until the range of the whole stream is known
+        Return: CompactDataset"""
+        
+        #Import module
+        import numpy as np
+        
+        #Raise exception
+        if storage not in ['float64', 'float32', 'quantized']:
+            raise Exception("Invalid storage mode of velocity")
+        
+        def encode(vel, lower, scale):
+            #Fixed point over the velocity range, with the largest code kept for NaN
+            codes = np.full(len(vel), 65535, dtype=np.uint16)
+            filled = ~np.isnan(vel)
+            codes[filled] = np.rint((vel[filled] - lower) / scale).astype(np.uint16)
+            return codes
+        
+        if velocity_range is not None:
+            lower, upper = float(velocity_range[0]), float(velocity_range[1])
+            scale = (upper - lower) / 65534 if upper > lower else 1.0
+        
+        depth_dtype = np.float64 if storage == 'float64' else np.float32
+        velocity_dtype = np.uint16 if storage == 'quantized' and velocity_range is not None else np.float64 if storage == 'quantized' else storage
+        site_list, length_list, joined_list = [np.empty((0, 2))], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=bool)]
+        depth_list, velocity_list = [np.empty(0, dtype=depth_dtype)], [np.empty(0, dtype=velocity_dtype)]
+        last_key = None
+        
+        for batch in batches:
+            key = None
+            if isinstance(batch, tuple):
+                batch, key = batch
+            if batch.ndim != 2 or batch.shape[1] != 4:
+                raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+            if len(batch) == 0:
+                continue
+            
+            #Row range of every run of the same file index or coordinate
+            if key is not None:
+                change = np.flatnonzero(key[1:] != key[:-1]) + 1
+                first_key, end_key = key[0], key[-1]
+            else:
+                change = np.flatnonzero((batch[1:, 0] != batch[:-1, 0]) | (batch[1:, 1] != batch[:-1, 1])) + 1
+                first_key, end_key = tuple(batch[0, :2]), tuple(batch[-1, :2])
+            start = np.concatenate(([0], change)).astype(np.int64)
+            site_list.append(batch[start, :2])
+            length_list.append(np.diff(np.append(start, len(batch))))
+            
+            #The first run continues the last site of the previous batch
+            joined = np.zeros(len(start), dtype=bool)
+            joined[0] = last_key is not None and first_key == last_key
+            joined_list.append(joined)
+            last_key = end_key
+            
+            depth_list.append(batch[:,2].astype(depth_dtype))
+            vel = batch[:,3]
+            if storage == 'quantized' and velocity_range is not None:
+                if np.any(vel[~np.isnan(vel)] < lower) or np.any(vel[~np.isnan(vel)] > upper):
+                    raise Exception("Velocity exceeds the range of the fixed point scale")
+                velocity_list.append(encode(vel, lower, scale))
+            else:
+                velocity_list.append(vel.astype(velocity_dtype))
+        
+        #Site table with the joined runs merged into the site before them
+        joined = np.concatenate(joined_list)
+        site_index = np.cumsum(~joined) - 1
+        lengths = np.bincount(site_index, weights=np.concatenate(length_list), minlength=np.count_nonzero(~joined)).astype(np.int64)
+        sites = np.concatenate(site_list)[~joined]
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        
+        depth = np.concatenate(depth_list)
+        vel = np.concatenate(velocity_list)
+        
+        if storage != 'quantized':
+            return cls(sites, offsets, lengths, depth, vel)
+        if velocity_range is not None:
+            return cls(sites, offsets, lengths, depth, vel, scale, lower)
+        
+        #Range of the whole stream
+        lower = np.nanmin(vel) if np.isfinite(vel).any() else 0.0
+        upper = np.nanmax(vel) if np.isfinite(vel).any() else 0.0
+        scale = (upper - lower) / 65534 if upper > lower else 1.0
+        
+        return cls(sites, offsets, lengths, depth, encode(vel, lower, scale), scale, lower)
+    
+    def __len__(self):
+        return len(self.depth)
+    
+    @property
+    def velocity(self):
+        """Return: Velocity decoded to float64"""
+        return self.velocity_at(slice(None))
+    
+    def velocity_at(self, rows):
+        """Input: Row indices or slice of rows
+        Return: Velocity of the rows decoded to float64, without decoding the other rows"""
+        
+        #Import module
+        import numpy as np
+        
+        stored = self.stored_velocity[rows]
+        if self.scale is None:
+            return stored.astype(np.float64)
+        
+        vel = stored * self.scale + self.offset
+        vel[stored == 65535] = np.nan
+        return vel
+    
+    def stored_range(self, minimum, maximum):
+        """Input: Minimum and maximum velocity
+        Function purpose: Convert a velocity range into bounds of the stored velocity that select exactly the rows whose decoded velocity is inside the range, so sorted stored velocity can be searched without decoding it. Decoding is increasing, and the fixed point bounds are moved by whole steps until they agree with the decoded values
+        Return: Minimum and maximum of the stored velocity"""
+        
+        #Import module
+        import numpy as np
+        
+        if self.scale is None:
+            return minimum, maximum
+        
+        decode = lambda code: code * self.scale + self.offset
+        low = min(max(np.ceil((minimum - self.offset) / self.scale), 0), 65535)
+        while low > 0 and decode(low - 1) >= minimum:
+            low -= 1
+        while low < 65535 and decode(low) < minimum:
+            low += 1
+        high = min(max(np.floor((maximum - self.offset) / self.scale), -1), 65534)
+        while high < 65534 and decode(high + 1) <= maximum:
+            high += 1
+        while high >= 0 and decode(high) > maximum:
+            high -= 1
+        
+        return low, high
+    
+    @property
+    def error_bound(self):
+        """Return: Dictionary of the largest rounding error of the stored columns, with absolute velocity error for fixed point ('velocity_absolute'), relative velocity error for floating point ('velocity_relative'), and relative and absolute depth error ('depth_relative', 'depth_absolute'). Columns kept as float64 have no error"""
+        
+        #Import module
+        import numpy as np
+        
+        bound = {}
+        if self.scale is not None:
+            bound['velocity_absolute'] = self.scale / 2
+        elif self.stored_velocity.dtype == np.float64:
+            bound['velocity_relative'] = 0.0
+        else:
+            bound['velocity_relative'] = float(np.finfo(self.stored_velocity.dtype).eps / 2)
+        
+        bound['depth_relative'] = 0.0 if self.depth.dtype == np.float64 else float(np.finfo(self.depth.dtype).eps / 2)
+        bound['depth_absolute'] = bound['depth_relative'] * float(np.abs(self.depth).max()) if len(self.depth) else 0.0
+        
+        return bound
+    
+    @property
+    def nbytes(self):
+        """Return: Memory of the stored arrays in bytes"""
+        return sum(a.nbytes for a in (self.sites, self.offsets, self.lengths, self.depth, self.stored_velocity))
+    
+    def site_index(self):
+        """Return: Site index of every row"""
+        
+        #Import module
+        import numpy as np
+        
+        return np.repeat(np.arange(len(self.sites)), self.lengths)
+    
+    def scatter_velocity(self, site_node, d_value, size, block_rows=1048576):
+        """Input: Flat node index of the first depth of every site in the site table, depth axis, number of nodes, number of rows per block
+        Function purpose: Scatter the velocity into a flat NaN-filled array without expanding the dataset. The node of a row is the node of its site plus the index of its depth on the axis. Rows are decoded one block at a time, and a node keeps the velocity of its first row as in VelocityVolume.from_array()
+        Return: 1D numpy array of velocity of every node"""
+        
+        #Import module
+        import numpy as np
+        
+        values = np.full(size, np.nan)
+        filled = np.zeros(size, dtype=bool)
+        for start in range(0, len(self), block_rows):
+            stop = min(start + block_rows, len(self))
+            
+            #Node of every row of the block from its site and depth
+            site = np.searchsorted(self.offsets, np.arange(start, stop), 'right') - 1
+            node = site_node[site] + np.searchsorted(d_value, self.depth[start:stop])
+            
+            #First row of every node that no earlier block has filled
+            _, first = np.unique(node, return_index=True)
+            first = first[~filled[node[first]]]
+            values[node[first]] = self.velocity_at(first + start)
+            filled[node[first]] = True
+        
+        return values
+    
+    def to_array(self):
+        """Function purpose: Expand the compact dataset to the four-column layout of import_file()
+        Return: 2D numpy array of latitude, longitude, depth, and velocity"""
+        
+        #Import module
+        import numpy as np
+        
+        array = np.empty((len(self), 4))
+        array[:, :2] = np.repeat(self.sites, self.lengths, axis=0)
+        array[:,2] = self.depth
+        array[:,3] = self.velocity
+        
+        return array
+
+class DatasetIndex:
+    """Input: 2D numpy array of merged velocity dataset or CompactDataset
+    Purpose: Answer bounding box, radius, depth window, and velocity range queries on the merged dataset without scanning every row. The index keeps the site table (row range of every run of the same coordinate), the site order sorted by latitude and by longitude, a KD-tree over the sites on the unit sphere, and the row order sorted by depth and by velocity. Queries return sorted row indices, and the rows of one site are returned as a slice for a view. A CompactDataset is indexed on its stored depth and velocity columns, and velocity is only decoded for the rows that a query checks"""
+    
+    def __init__(self, array):
+        
+        #Import modules
+        import numpy as np
+        from scipy.spatial import cKDTree
+        
+        #Site table and flat columns
+        if isinstance(array, CompactDataset):
+            self.sites, self.offsets, self.lengths = array.sites, array.offsets, array.lengths
+            self.depth, self.velocity = array.depth, array.stored_velocity
+            self.compact = array
+        else:
+            if type(array) != np.ndarray:
+                raise TypeError("Input must be a numpy array")
+            if array.ndim != 2 or array.shape[1] != 4:
+                raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+            change = np.flatnonzero((array[1:, 0] != array[:-1, 0]) | (array[1:, 1] != array[:-1, 1])) + 1
+            self.offsets = np.concatenate(([0], change)).astype(np.int64)
+            self.lengths = np.diff(np.append(self.offsets, len(array)))
+            self.sites = array[self.offsets, :2]
+            self.depth, self.velocity = array[:,2], array[:,3]
+            self.compact = None
+        
+        #Sorted site order of each coordinate
+        self.lat_order = np.argsort(self.sites[:,0], kind='stable')
+        self.lat_sorted = self.sites[self.lat_order, 0]
+        self.lon_order = np.argsort(self.sites[:,1], kind='stable')
+        self.lon_sorted = self.sites[self.lon_order, 1]
+        
+        #KD-tree of the sites as unit vectors, so chord length gives the great-circle distance
+        self.tree = cKDTree(self.unit_vectors(self.sites[:,0], self.sites[:,1]))
+        
+        #Sorted row order of depth and velocity, with NaN velocity at the end. Decoding keeps the order of stored velocity, and its largest fixed point code is NaN
+        self.depth_order = np.argsort(self.depth, kind='stable')
+        self.depth_sorted = self.depth[self.depth_order]
+        self.velocity_order = np.argsort(self.velocity, kind='stable')
+        self.velocity_sorted = self.velocity[self.velocity_order]
+    
+    @staticmethod
+    def unit_vectors(lat, lon):
+        """Input: Latitude and longitude in degrees
+        Return: 2D numpy array of points on the unit sphere"""
+        
+        #Import module
+        import numpy as np
+        
+        lat, lon = np.radians(lat), np.radians(lon)
+        return np.stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)), axis=-1)
+    
+    def site_rows(self, site):
+        """Input: Index of a site in the site table
+        Return: Slice of the rows of the site, which takes a view of the dataset or of the depth and velocity columns"""
+        
+        start = int(self.offsets[site])
+        return slice(start, start + int(self.lengths[site]))
+    
+    def rows(self, sites):
+        """Input: Array of site indices
+        Return: Sorted row indices of all rows of the sites"""
+        
+        #Import module
+        import numpy as np
+        
+        sites = np.sort(np.asarray(sites, dtype=np.int64))
+        lengths = self.lengths[sites]
+        
+        #Ragged ranges in one step: every row is the start of its site plus its position inside the site
+        run_start = np.cumsum(lengths) - lengths
+        return np.repeat(self.offsets[sites] - run_start, lengths) + np.arange(lengths.sum())
+    
+    def bbox(self, lat_range, lon_range):
+        """Input: Minimum and maximum latitude, minimum and maximum longitude
+        Function purpose: Find the sites inside a bounding box. The coordinate with fewer candidates in its sorted order is sliced by binary search, and only these candidates are checked for the other coordinate
+        Return: Sorted site indices"""
+        
+        #Import module
+        import numpy as np
+        
+        lat_start, lat_stop = np.searchsorted(self.lat_sorted, lat_range[0], 'left'), np.searchsorted(self.lat_sorted, lat_range[1], 'right')
+        lon_start, lon_stop = np.searchsorted(self.lon_sorted, lon_range[0], 'left'), np.searchsorted(self.lon_sorted, lon_range[1], 'right')
+        
+        if lat_stop - lat_start <= lon_stop - lon_start:
+            candidate = self.lat_order[lat_start:lat_stop]
+            lon = self.sites[candidate, 1]
+            candidate = candidate[(lon >= lon_range[0]) & (lon <= lon_range[1])]
+        else:
+            candidate = self.lon_order[lon_start:lon_stop]
+            lat = self.sites[candidate, 0]
+            candidate = candidate[(lat >= lat_range[0]) & (lat <= lat_range[1])]
+        
+        return np.sort(candidate)
+    
+    def radius(self, lat, lon, distance):
+        """Input: Latitude and longitude of the centre in degrees, radius in kilometres
+        Function purpose: Find the sites within a great-circle distance from a point by a ball query of the KD-tree
+        Return: Sorted site indices"""
+        
+        #Import module
+        import numpy as np
+        
+        #Chord length of the great-circle distance on the unit sphere
+        chord = 2 * np.sin(min(distance / 6371.0, np.pi) / 2)
+        
+        return np.sort(np.asarray(self.tree.query_ball_point(self.unit_vectors(lat, lon), chord), dtype=np.int64))
+    
+    def depth_window(self, minimum, maximum):
+        """Input: Minimum and maximum depth in the sign of the dataset column
+        Return: Sorted row indices with depth inside the window"""
+        
+        #Import module
+        import numpy as np
+        
+        start, stop = np.searchsorted(self.depth_sorted, minimum, 'left'), np.searchsorted(self.depth_sorted, maximum, 'right')
+        return np.sort(self.depth_order[start:stop])
+    
+    def vs_range(self, minimum, maximum):
+        """Input: Minimum and maximum velocity
+        Return: Sorted row indices with velocity inside the range"""
+        
+        #Import module
+        import numpy as np
+        
+        if self.compact is not None:
+            minimum, maximum = self.compact.stored_range(minimum, maximum)
+        start, stop = np.searchsorted(self.velocity_sorted, minimum, 'left'), np.searchsorted(self.velocity_sorted, maximum, 'right')
+        return np.sort(self.velocity_order[start:stop])
+    
+    def query(self, lat_range=None, lon_range=None, center=None, distance=None, depth_range=None, vs_range=None):
+        """Input: Optional latitude and longitude range of a bounding box, optional (latitude, longitude) centre with radius in kilometres, optional depth window, optional velocity range
+        Function purpose: Combine the filters. The sites are selected first by the spatial filters, and the depth and velocity conditions are checked only on their rows. Without a spatial filter the narrower of the sorted depth and velocity indexes is used
+        Return: Sorted row indices"""
+        
+        #Import module
+        import numpy as np
+        
+        #Spatial filters on the site table
+        sites = None
+        if lat_range is not None or lon_range is not None:
+            sites = self.bbox(lat_range if lat_range is not None else (-np.inf, np.inf), 
+                              lon_range if lon_range is not None else (-np.inf, np.inf))
+        if center is not None:
+            if distance is None:
+                raise Exception("Radius is needed with the centre point")
+            near = self.radius(center[0], center[1], distance)
+            sites = near if sites is None else np.intersect1d(sites, near, assume_unique=True)
+        
+        if sites is not None:
+            rows = self.rows(sites)
+        elif depth_range is not None and vs_range is not None:
+            by_depth, by_vs = self.depth_window(*depth_range), self.vs_range(*vs_range)
+            return np.intersect1d(by_depth, by_vs, assume_unique=True)
+        elif depth_range is not None:
+            return self.depth_window(*depth_range)
+        elif vs_range is not None:
+            return self.vs_range(*vs_range)
+        else:
+            return np.arange(len(self.depth))
+        
+        #Row filters on the selected rows only
+        keep = np.ones(len(rows), dtype=bool)
+        if depth_range is not None:
+            depth = self.depth[rows]
+            keep &= (depth >= depth_range[0]) & (depth <= depth_range[1])
+        if vs_range is not None:
+            vel = self.velocity[rows] if self.compact is None else self.compact.velocity_at(rows)
+            keep &= (vel >= vs_range[0]) & (vel <= vs_range[1])
+        
+        return rows[keep]
+
+@instrument
+def parameter_list(array):
+    """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset
+    Function purpose: Create list of values of latitude, longitude, and depth through subsetting the array input and using numpy unique function. A CompactDataset takes latitude and longitude from its site table
+    Return: Lists of unique values
+    """
+    #Import module
+    import numpy as np
+    
+    #Unique values from the site table
+    if isinstance(array, CompactDataset):
+        return np.unique(array.sites[:,0]), np.unique(array.sites[:,1]), np.unique(array.depth.astype(np.float64))
+    
+    #Exception handling
+    if type(array) != np.ndarray:
+        raise TypeError("Input must be a numpy array")
+    if array.shape[1] < 3:
+        raise Exception("Inadequate number of columns to generate unique value lists")
+    
+    #Subsetting vs_array vertically
+    latitude = array[:,0]
+    longitude = array[:,1]
+    depth = array[:,2]
+    shearvel = array[:,3]
+
+    #Obtain unique value of coordinate and depth
+    lat_list = np.unique(latitude)
+    long_list = np.unique(longitude)
+    d_list = np.unique(depth)
+        
+    return lat_list, long_list, d_list
+
+@instrument
+def decimate_points(array, max_points, statistic='mean', seed=0):
+    """Input parameter: 2D Numpy array of velocity dataset or CompactDataset, target number of points, statistic of the velocity in each cell ('mean', 'min', 'max', or 'sample'), seed of the random sample
+    Function purpose: Reduce the number of points for preview through a voxel grid. The bounding box is divided into cubic cells, and the cell count is refined until the number of occupied cells is close to the target without exceeding it. Cells are reduced by counting bins, or by sorting when the cell grid is much larger than the data. Each occupied cell is represented by the mean coordinate of its points with the chosen velocity statistic, or by one randomly sampled point. Rows without velocity are dropped
+    Return: 2D numpy array of representative points with the same four columns"""
+    
+    #Import module
+    import numpy as np
+    
+    #Expand compact dataset
+    if isinstance(array, CompactDataset):
+        array = array.to_array()
+    
+    #Raise exception
+    if array.ndim != 2 or array.shape[1] != 4:
+        raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+    if statistic not in ['mean', 'min', 'max', 'sample']:
+        raise Exception("Invalid decimation statistic")
+    if type(max_points) is not int or max_points < 1:
+        raise Exception("Number of points should be a positive integer")
+    
+    array = array[~np.isnan(array[:,3])]
+    if len(array) <= max_points:
+        return array
+    
+    #Position of every point inside the bounding box, between 0 and 1
+    lower = array[:, :3].min(axis=0)
+    extent = array[:, :3].max(axis=0) - lower
+    position = (array[:, :3] - lower) / np.where(extent > 0, extent, 1)
+    
+    def cell_keys(n_cells):
+        cell = np.minimum((position * n_cells).astype(np.int64), n_cells - 1)
+        return (cell[:,0] * n_cells + cell[:,1]) * n_cells + cell[:,2]
+    
+    def occupied_cells(keys, n_cells):
+        #Counting bins is much faster than sorting while the cell grid is small
+        if n_cells**3 <= 64 * len(keys):
+            return np.count_nonzero(np.bincount(keys, minlength=n_cells**3))
+        return len(np.unique(keys))
+    
+    #Refine cells while the occupied cells still fit the target
+    n_cells = max(1, int(max_points ** (1 / 3)))
+    keys = cell_keys(n_cells)
+    occupied = occupied_cells(keys, n_cells)
+    while occupied * 2 <= max_points and n_cells < 2**20:
+        finer_keys = cell_keys(n_cells * 2)
+        finer_occupied = occupied_cells(finer_keys, n_cells * 2)
+        if finer_occupied > max_points:
+            break
+        n_cells, keys, occupied = n_cells * 2, finer_keys, finer_occupied
+    
+    #Small cell grid, reduce every cell by counting bins without sorting
+    if n_cells**3 <= 64 * len(keys):
+        n_bins = n_cells**3
+        count = np.bincount(keys, minlength=n_bins)
+        filled = count > 0
+        if statistic == 'sample':
+            representative = np.empty(n_bins, dtype=np.int64)
+            shuffle = np.random.default_rng(seed).permutation(len(array))
+            representative[keys[shuffle]] = shuffle
+            return array[np.sort(representative[filled])]
+        coordinate = np.stack([np.bincount(keys, array[:,i], n_bins)[filled] for i in range(3)], axis=1)
+        coordinate /= count[filled][:, None]
+        if statistic == 'mean':
+            vel = np.bincount(keys, array[:,3], n_bins)[filled] / count[filled]
+        else:
+            vel = np.full(n_bins, np.inf if statistic == 'min' else -np.inf)
+            (np.minimum if statistic == 'min' else np.maximum).at(vel, keys, array[:,3])
+            vel = vel[filled]
+        return np.column_stack((coordinate, vel))
+    
+    #Large cell grid, group points of the same cell by sorting
+    if statistic == 'sample':
+        shuffle = np.random.default_rng(seed).permutation(len(array))
+        order = shuffle[np.argsort(keys[shuffle], kind='stable')]
+    else:
+        order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    start = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+    sorted_array = array[order]
+    
+    #One representative point per cell
+    if statistic == 'sample':
+        return sorted_array[start]
+    count = np.diff(np.append(start, len(sorted_array)))[:, None]
+    coordinate = np.add.reduceat(sorted_array[:, :3], start, axis=0) / count
+    if statistic == 'mean':
+        vel = np.add.reduceat(sorted_array[:, 3], start) / count[:,0]
+    elif statistic == 'min':
+        vel = np.minimum.reduceat(sorted_array[:, 3], start)
+    else:
+        vel = np.maximum.reduceat(sorted_array[:, 3], start)
+    
+    return np.column_stack((coordinate, vel))
@@ -0,0 +1,958 @@
+from .monitoring import instrument
+from .dataset import CompactDataset, parameter_list
+
+def nearest_index(axis, value, tolerance=None):
+    """Input parameter: sorted 1D numpy array of axis values, a coordinate value, optional tolerance
+    Function purpose: Find the index of the axis value nearest to the coordinate through numpy searchsorted instead of comparing every row with exact float equality
+    Return: Integer index of the nearest axis value"""
+    
+    #Import module
+    import numpy as np
+    
+    #Exception handling
+    if type(value) is str:
+        raise Exception("Number input of coordinate is required!")
+    if len(axis) == 0:
+        raise Exception("Axis has no values")
+    
+    #Pick the nearer of the two neighbouring axis values
+    index = int(np.clip(np.searchsorted(axis, value), 1, len(axis) - 1)) if len(axis) > 1 else 0
+    if len(axis) > 1 and abs(axis[index - 1] - value) <= abs(axis[index] - value):
+        index -= 1
+    
+    if tolerance is not None and abs(axis[index] - value) > tolerance:
+        raise Exception("No axis value within the tolerance of the requested coordinate")
+    
+    return index
+
+class VelocityVolume:
+    """Input: Axis vectors of latitude, longitude, and depth, and a 3D numpy array of velocity with shape (latitude, longitude, depth)
+    Purpose: Hold the velocity dataset as a dense grid. Grid nodes without measurement are filled with NaN. The plotly-friendly DataFrame is only built when it is requested for the first time"""
+    
+    def __init__(self, latitude, longitude, depth, values):
+        #Raise exception
+        if values.shape != (len(latitude), len(longitude), len(depth)):
+            raise Exception("Velocity grid does not follow the shape of the axis vectors")
+        
+        self.latitude = latitude
+        self.longitude = longitude
+        self.depth = depth
+        self.values = values
+        self._dataframe = None
+    
+    @classmethod
+    @instrument
+    def from_array(cls, array):
+        """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset
+        Function purpose: Build the dense velocity grid in one pass. The axis vectors come from parameter_list(), the grid index of every row is found with numpy searchsorted, and the velocity is scattered into a NaN-filled grid. Rows of a repeated coordinate keep the first velocity. A CompactDataset is scattered from its site table block by block without expanding the coordinates of every row
+        Return: VelocityVolume"""
+        
+        #Import module
+        import numpy as np
+        
+        #Grid node of every site of a compact dataset
+        if isinstance(array, CompactDataset):
+            lat_value, lon_value, d_value = parameter_list(array)
+            site_node = (np.searchsorted(lat_value, array.sites[:,0]) * len(lon_value) + np.searchsorted(lon_value, array.sites[:,1])) * len(d_value)
+            values = array.scatter_velocity(site_node, d_value, len(lat_value) * len(lon_value) * len(d_value))
+            return cls(lat_value, lon_value, d_value, values.reshape(len(lat_value), len(lon_value), len(d_value)))
+        
+        #Raise exception
+        if type(array) != np.ndarray:
+            raise TypeError("Input must be a numpy array")
+        if array.shape[1] < 4:
+            raise Exception("Insufficient data size to build velocity grid")
+        elif array.shape[1] > 4:
+            raise Exception("Data size exceeding the required size to build velocity grid")
+        
+        #Call parameter_list() to generate axis vectors
+        lat_value, lon_value, d_value = parameter_list(array)
+        
+        #Grid index of every row
+        lat_index = np.searchsorted(lat_value, array[:,0])
+        lon_index = np.searchsorted(lon_value, array[:,1])
+        d_index = np.searchsorted(d_value, array[:,2])
+        flat_index = (lat_index * len(lon_value) + lon_index) * len(d_value) + d_index
+        
+        #Keep the first row of a repeated coordinate before scattering, as the order of repeated fancy assignment is undefined
+        _, first = np.unique(flat_index, return_index=True)
+        values = np.full((len(lat_value), len(lon_value), len(d_value)), np.nan)
+        values.reshape(-1)[flat_index[first]] = array[first, 3]
+        
+        return cls(lat_value, lon_value, d_value, values)
+    
+    @property
+    def shape(self):
+        """Return: Shape of the velocity grid"""
+        return self.values.shape
+    
+    @property
+    def dataframe(self):
+        """Function purpose: Build the plotly-friendly DataFrame with one row per grid node, sorted by latitude, longitude, and depth respectively. The Vs column is taken from the flattened grid without copying
+        Return: Velocity dataset in the form of Pandas DataFrame"""
+        
+        if self._dataframe is None:
+            #Import modules
+            import numpy as np
+            import pandas as pd
+            
+            n_lat, n_lon, n_depth = self.values.shape
+            self._dataframe = pd.DataFrame({'Latitude': np.repeat(self.latitude, n_lon * n_depth),
+                                            'Longitude': np.tile(np.repeat(self.longitude, n_depth), n_lat),
+                                            'Depth': np.tile(self.depth, n_lat * n_lon),
+                                            'Vs': self.values.reshape(-1)},
+                                           copy=False)
+        
+        return self._dataframe
+    
+    def north_south_section(self, longitude, tolerance=None):
+        """Input parameter: longitude value, optional tolerance of the nearest longitude
+        Function purpose: Take the north-south cross section at the nearest grid longitude
+        Return: View of the velocity grid with shape (latitude, depth)"""
+        return self.values[:, nearest_index(self.longitude, longitude, tolerance), :]
+    
+    def east_west_section(self, latitude, tolerance=None):
+        """Input parameter: latitude value, optional tolerance of the nearest latitude
+        Function purpose: Take the east-west cross section at the nearest grid latitude
+        Return: View of the velocity grid with shape (longitude, depth)"""
+        return self.values[nearest_index(self.latitude, latitude, tolerance), :, :]
+    
+    def north_south_sections(self):
+        """Function purpose: Take every north-south cross section at once
+        Return: View of the velocity grid with shape (longitude, latitude, depth)"""
+        return self.values.transpose(1, 0, 2)
+    
+    def east_west_sections(self):
+        """Function purpose: Take every east-west cross section at once
+        Return: View of the velocity grid with shape (latitude, longitude, depth)"""
+        return self.values
+    
+    def site_profiles(self):
+        """Function purpose: Rearrange the grid into one velocity profile per grid column, skipping columns without any velocity
+        Return: 2D numpy array of column latitude and longitude, depth axis, and 2D numpy array of velocity with shape (columns, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        profiles = self.values.reshape(-1, len(self.depth))
+        filled = ~np.isnan(profiles).all(axis=1)
+        lat_grid, lon_grid = np.meshgrid(self.latitude, self.longitude, indexing='ij')
+        sites = np.stack((lat_grid.reshape(-1)[filled], lon_grid.reshape(-1)[filled]), axis=1)
+        
+        return sites, self.depth, profiles[filled]
+    
+    def columns(self, lat_index, lon_index):
+        """Input parameter: arrays of latitude and longitude indices of grid columns
+        Function purpose: Gather the velocity profiles of the selected grid columns
+        Return: 2D numpy array with shape (columns, depth)"""
+        return self.values[lat_index, lon_index]
+    
+    def to_array(self):
+        """Function purpose: Convert the grid nodes that have velocity back to the four-column layout of import_file()
+        Return: 2D numpy array of latitude, longitude, depth, and velocity"""
+        
+        #Import module
+        import numpy as np
+        
+        lat_index, lon_index, d_index = np.nonzero(~np.isnan(self.values))
+        
+        return np.stack((self.latitude[lat_index], 
+                         self.longitude[lon_index], 
+                         self.depth[d_index], 
+                         self.values[lat_index, lon_index, d_index]), 
+                        axis=1)
+    
+    def columns_dataframe(self, lat_index, lon_index):
+        """Input parameter: arrays of latitude and longitude indices of grid columns
+        Function purpose: Build the DataFrame of the selected grid columns only, with rows ordered by column and depth and without the empty grid nodes
+        Return: Pandas DataFrame with latitude, longitude, depth, and velocity columns"""
+        
+        #Import modules
+        import numpy as np
+        import pandas as pd
+        
+        lat_index = np.asarray(lat_index)
+        lon_index = np.asarray(lon_index)
+        n_depth = len(self.depth)
+        
+        #Velocity of the selected columns and the mask of filled nodes
+        vel = self.values[lat_index, lon_index, :].reshape(-1)
+        filled = ~np.isnan(vel)
+        
+        return pd.DataFrame({'Latitude': np.repeat(self.latitude[lat_index], n_depth)[filled],
+                             'Longitude': np.repeat(self.longitude[lon_index], n_depth)[filled],
+                             'Depth': np.tile(self.depth, len(lat_index))[filled],
+                             'Vs': vel[filled]})
+
+class SparseVolume:
+    """Input: Axis vectors of latitude, longitude, and depth, 2D boolean numpy array of occupied grid columns with shape (latitude, longitude), 2D numpy array of the velocity profiles of the occupied columns in row-major order with shape (columns, depth)
+    Purpose: Hold the velocity grid of an irregular basin without the empty columns of its bounding rectangle. Only the occupied columns are stored, as packed depth profiles, and the occupancy mask maps a grid column to its profile. Sections and cross sections gather the occupied columns directly, and the dense grid or plotly-friendly DataFrame is only built on request"""
+    
+    def __init__(self, latitude, longitude, depth, mask, profiles):
+        
+        #Import module
+        import numpy as np
+        
+        #Raise exception
+        if mask.shape != (len(latitude), len(longitude)):
+            raise Exception("Occupancy mask does not follow the shape of the axis vectors")
+        if profiles.shape != (int(mask.sum()), len(depth)):
+            raise Exception("Profiles do not match the occupied columns and the depth axis")
+        
+        self.latitude = latitude
+        self.longitude = longitude
+        self.depth = depth
+        self.mask = mask
+        self.profiles = profiles
+        
+        #Profile of every grid column, -1 for an empty column
+        self.column_index = np.full(mask.shape, -1, dtype=np.int64)
+        self.column_index[mask] = np.arange(len(profiles))
+    
+    @classmethod
+    @instrument
+    def from_array(cls, array):
+        """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset
+        Function purpose: Build the sparse grid from the site profiles of site_profiles() without allocating the bounding rectangle
+        Return: SparseVolume"""
+        
+        #Import module
+        import numpy as np
+        
+        sites, d_value, profiles = site_profiles(array)
+        lat_value = np.unique(sites[:,0])
+        lon_value = np.unique(sites[:,1])
+        
+        #Sites are ordered by latitude and longitude, which is the row-major order of the mask
+        mask = np.zeros((len(lat_value), len(lon_value)), dtype=bool)
+        mask[np.searchsorted(lat_value, sites[:,0]), np.searchsorted(lon_value, sites[:,1])] = True
+        
+        return cls(lat_value, lon_value, d_value, mask, profiles)
+    
+    @classmethod
+    def from_volume(cls, volume):
+        """Input parameter: VelocityVolume
+        Function purpose: Pack the columns of a dense grid that have any velocity
+        Return: SparseVolume"""
+        
+        #Import module
+        import numpy as np
+        
+        mask = ~np.isnan(volume.values).all(axis=2)
+        
+        return cls(volume.latitude, volume.longitude, volume.depth, mask, volume.values[mask])
+    
+    @property
+    def shape(self):
+        """Return: Shape of the dense velocity grid"""
+        return self.mask.shape + (len(self.depth),)
+    
+    @property
+    def nbytes(self):
+        """Return: Memory of the mask, column index, and profiles in bytes"""
+        return self.mask.nbytes + self.column_index.nbytes + self.profiles.nbytes
+    
+    def to_volume(self):
+        """Function purpose: Expand the packed profiles into the dense grid
+        Return: VelocityVolume"""
+        
+        #Import module
+        import numpy as np
+        
+        values = np.full(self.shape, np.nan)
+        values[self.mask] = self.profiles
+        
+        return VelocityVolume(self.latitude, self.longitude, self.depth, values)
+    
+    @property
+    def dataframe(self):
+        """Function purpose: Build the dense plotly-friendly DataFrame of the bounding rectangle on demand
+        Return: Velocity dataset in the form of Pandas DataFrame"""
+        return self.to_volume().dataframe
+    
+    def columns(self, lat_index, lon_index):
+        """Input parameter: arrays of latitude and longitude indices of grid columns
+        Function purpose: Gather the velocity profiles of the selected grid columns. Only the occupied columns are read, and empty columns are NaN
+        Return: 2D numpy array with shape (columns, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        index = self.column_index[lat_index, lon_index]
+        result = np.full(index.shape + (len(self.depth),), np.nan)
+        occupied = index >= 0
+        result[occupied] = self.profiles[index[occupied]]
+        
+        return result
+    
+    def north_south_section(self, longitude, tolerance=None):
+        """Input parameter: longitude value, optional tolerance of the nearest longitude
+        Function purpose: Take the north-south cross section at the nearest grid longitude
+        Return: 2D numpy array with shape (latitude, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        j = nearest_index(self.longitude, longitude, tolerance)
+        return self.columns(np.arange(len(self.latitude)), np.full(len(self.latitude), j))
+    
+    def east_west_section(self, latitude, tolerance=None):
+        """Input parameter: latitude value, optional tolerance of the nearest latitude
+        Function purpose: Take the east-west cross section at the nearest grid latitude
+        Return: 2D numpy array with shape (longitude, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        i = nearest_index(self.latitude, latitude, tolerance)
+        return self.columns(np.full(len(self.longitude), i), np.arange(len(self.longitude)))
+    
+    def site_profiles(self):
+        """Function purpose: Return the occupied columns with their profiles, skipping columns without any velocity
+        Return: 2D numpy array of column latitude and longitude, depth axis, and 2D numpy array of velocity with shape (columns, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        lat_index, lon_index = np.nonzero(self.mask)
+        filled = ~np.isnan(self.profiles).all(axis=1)
+        sites = np.stack((self.latitude[lat_index], self.longitude[lon_index]), axis=1)
+        
+        return sites[filled], self.depth, self.profiles[filled]
+    
+    def to_array(self):
+        """Function purpose: Convert the nodes that have velocity back to the four-column layout of import_file()
+        Return: 2D numpy array of latitude, longitude, depth, and velocity"""
+        
+        #Import module
+        import numpy as np
+        
+        lat_index, lon_index = np.nonzero(self.mask)
+        column, d_index = np.nonzero(~np.isnan(self.profiles))
+        
+        return np.stack((self.latitude[lat_index[column]], 
+                         self.longitude[lon_index[column]], 
+                         self.depth[d_index], 
+                         self.profiles[column, d_index]), 
+                        axis=1)
+    
+    def columns_dataframe(self, lat_index, lon_index):
+        """Input parameter: arrays of latitude and longitude indices of grid columns
+        Function purpose: Build the DataFrame of the selected grid columns. Empty columns are skipped through the occupancy mask before any profile is read
+        Return: Pandas DataFrame with latitude, longitude, depth, and velocity columns"""
+        
+        #Import modules
+        import numpy as np
+        import pandas as pd
+        
+        index = self.column_index[lat_index, lon_index]
+        occupied = index >= 0
+        lat_index = np.asarray(lat_index)[occupied]
+        lon_index = np.asarray(lon_index)[occupied]
+        n_depth = len(self.depth)
+        
+        #Velocity of the occupied columns and the mask of filled nodes
+        vel = self.profiles[index[occupied]].reshape(-1)
+        filled = ~np.isnan(vel)
+        
+        return pd.DataFrame({'Latitude': np.repeat(self.latitude[lat_index], n_depth)[filled],
+                             'Longitude': np.repeat(self.longitude[lon_index], n_depth)[filled],
+                             'Depth': np.tile(self.depth, len(lat_index))[filled],
+                             'Vs': vel[filled]})
+
+@instrument
+def site_profiles(array):
+    """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset
+    Function purpose: Rearrange the dataset into one velocity profile per measurement site on the common depth axis. Sites are identified by their latitude-longitude pair, and the velocity is scattered into a NaN-filled table in one pass. Rows of a repeated coordinate keep the first velocity. A CompactDataset is read from its site table without expanding the coordinates of every row
+    Return: 2D numpy array of site latitude and longitude, depth axis, and 2D numpy array of velocity with shape (sites, depth)"""
+    
+    #Import module
+    import numpy as np
+    
+    if isinstance(array, CompactDataset):
+        lat_value, lon_value, d_value = parameter_list(array)
+        
+        #Site of every entry of the site table, then of every row
+        site_key = np.searchsorted(lat_value, array.sites[:,0]) * len(lon_value) + np.searchsorted(lon_value, array.sites[:,1])
+        site_key, table_index = np.unique(site_key, return_inverse=True)
+        sites = np.stack((lat_value[site_key // len(lon_value)], lon_value[site_key % len(lon_value)]), axis=1)
+        
+        #Scatter the rows block by block, keeping the first row of a repeated coordinate
+        profiles = array.scatter_velocity(table_index * len(d_value), d_value, len(sites) * len(d_value)).reshape(len(sites), len(d_value))
+        
+        return sites, d_value, profiles
+    
+    #Raise exception
+    if type(array) != np.ndarray:
+        raise TypeError("Input must be a numpy array")
+    if array.shape[1] != 4:
+        raise Exception("Input array should have four columns of latitude, longitude, depth, and velocity")
+    
+    #Call parameter_list() to generate axis vectors
+    lat_value, lon_value, d_value = parameter_list(array)
+    
+    #Site of every row from its latitude-longitude pair
+    site_key = np.searchsorted(lat_value, array[:,0]) * len(lon_value) + np.searchsorted(lon_value, array[:,1])
+    site_key, site_index = np.unique(site_key, return_inverse=True)
+    sites = np.stack((lat_value[site_key // len(lon_value)], lon_value[site_key % len(lon_value)]), axis=1)
+    
+    #Keep the first row of a repeated coordinate before scattering, as the order of repeated fancy assignment is undefined
+    profiles = np.full((len(sites), len(d_value)), np.nan)
+    flat_index = site_index * len(d_value) + np.searchsorted(d_value, array[:,2])
+    _, first = np.unique(flat_index, return_index=True)
+    profiles.reshape(-1)[flat_index[first]] = array[first, 3]
+    
+    return sites, d_value, profiles
+
+def barycentric_weights(triangulation, points):
+    """Input parameter: scipy Delaunay triangulation of the sites, 2D numpy array of points
+    Function purpose: Find the enclosing triangle of every point and its barycentric weights, so one triangulation can interpolate any number of values at the same points by a weighted sum. Points outside the triangulation get NaN weights
+    Return: 2D numpy array of vertex indices and 2D numpy array of weights, both with shape (points, 3)"""
+    
+    #Import module
+    import numpy as np
+    
+    simplex = triangulation.find_simplex(points)
+    transform = triangulation.transform[simplex]
+    partial_weight = np.einsum('nij,nj->ni', transform[:, :2], points - transform[:, 2])
+    weight = np.concatenate((partial_weight, 1 - partial_weight.sum(axis=1, keepdims=True)), axis=1)
+    weight[simplex < 0] = np.nan
+    
+    return triangulation.simplices[simplex], weight
+
+@instrument
+def grid_profiles(array, resolution, method='nearest', neighbours=8, power=2.0, chunk_size=None, workers=None):
+    """Input parameter: 2D Numpy array of merged velocity dataset, grid spacing in degrees (one value or a pair of latitude and longitude spacing), interpolation method ('nearest', 'idw', or 'linear'), number of neighbours and power of inverse distance weighting, optional number of grid nodes per chunk, optional number of threads
+    Function purpose: Interpolate the profiles of irregularly distributed sites onto a regular latitude-longitude grid covering the sites. The neighbour index (KD-tree for nearest and idw, Delaunay triangulation for linear) is built once, and the grid nodes are interpolated in chunks so memory stays bounded on large grids. Chunks can be processed by several threads
+    Return: VelocityVolume of the regular grid"""
+    
+    #Import modules
+    import numpy as np
+    from scipy.spatial import cKDTree, Delaunay
+    
+    #Exception handling
+    if method not in ['nearest', 'idw', 'linear']:
+        raise Exception("Invalid interpolation method")
+    resolution = np.broadcast_to(np.asarray(resolution, dtype=float), (2,))
+    if not (resolution > 0).all():
+        raise Exception("Grid resolution must be positive")
+    
+    sites, d_value, profiles = site_profiles(array)
+    
+    #Regular axes covering all sites
+    lat_axis = np.arange(sites[:,0].min(), sites[:,0].max() + resolution[0] / 2, resolution[0])
+    lon_axis = np.arange(sites[:,1].min(), sites[:,1].max() + resolution[1] / 2, resolution[1])
+    
+    #Scale longitude so that distances are roughly isotropic
+    scale = np.cos(np.radians(sites[:,0].mean()))
+    site_xy = np.stack((sites[:,0], sites[:,1] * scale), axis=1)
+    lat_grid, lon_grid = np.meshgrid(lat_axis, lon_axis, indexing='ij')
+    node_xy = np.stack((lat_grid.reshape(-1), lon_grid.reshape(-1) * scale), axis=1)
+    
+    #Build the neighbour index once
+    if method == 'linear':
+        index = Delaunay(site_xy)
+    else:
+        index = cKDTree(site_xy)
+        neighbours = 1 if method == 'nearest' else min(neighbours, len(sites))
+    
+    #Keep about four million gathered velocities per chunk
+    if chunk_size is None:
+        width = 3 if method == 'linear' else neighbours
+        chunk_size = max(1, 4000000 // (width * len(d_value)))
+    
+    values = np.empty((len(node_xy), len(d_value)))
+    
+    def interpolate_chunk(start):
+        points = node_xy[start:start + chunk_size]
+        if method == 'linear':
+            #Barycentric weights of the enclosing triangle
+            vertices, weight = barycentric_weights(index, points)
+            chunk_values = np.einsum('nk,nkd->nd', weight, profiles[vertices])
+        elif method == 'nearest':
+            _, nearest = index.query(points, k=1)
+            chunk_values = profiles[nearest]
+        else:
+            #Inverse distance weighting that ignores NaN of the neighbours
+            distance, nearest = index.query(points, k=neighbours)
+            distance = distance.reshape(len(points), -1)
+            nearest = nearest.reshape(len(points), -1)
+            weight = 1.0 / np.maximum(distance, 1e-12)**power
+            neighbour_values = profiles[nearest]
+            weight = np.where(np.isnan(neighbour_values), 0.0, weight[:, :, None])
+            with np.errstate(invalid='ignore'):
+                chunk_values = (np.nansum(weight * neighbour_values, axis=1) / weight.sum(axis=1))
+        values[start:start + chunk_size] = chunk_values
+    
+    starts = range(0, len(node_xy), chunk_size)
+    if workers is None or workers == 1:
+        for start in starts:
+            interpolate_chunk(start)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(interpolate_chunk, starts))
+    
+    return VelocityVolume(lat_axis, lon_axis, d_value, values.reshape(len(lat_axis), len(lon_axis), len(d_value)))
+
+class VolumePyramid:
+    """Input: List of VelocityVolume from the full resolution to the coarsest level
+    Purpose: Hold a multiresolution pyramid of the velocity grid, in which every level halves the number of latitudes, longitudes, and depths of the previous level. Views pick the coarsest level that still meets the requested resolution inside the viewed window, so zooming in refines the view on demand"""
+    
+    def __init__(self, levels):
+        self.levels = levels
+    
+    @staticmethod
+    def downsample(volume):
+        """Input parameter: VelocityVolume
+        Function purpose: Halve the grid along every axis. Each coarse node is the average of up to eight fine nodes, ignoring NaN, and odd axes are padded with NaN so the last node is averaged with fewer neighbours
+        Return: VelocityVolume of the coarser level"""
+        
+        #Import module
+        import numpy as np
+        
+        def pad(values, axis):
+            if values.shape[axis] % 2 == 0:
+                return values
+            width = [(0, 0)] * values.ndim
+            width[axis] = (0, 1)
+            return np.pad(values, width, constant_values=np.nan)
+        
+        def halve_axis(axis_value):
+            with np.errstate(invalid='ignore'):
+                return np.nanmean(pad(axis_value.astype(float), 0).reshape(-1, 2), axis=1)
+        
+        values = volume.values
+        for axis in range(3):
+            values = pad(values, axis)
+        n_lat, n_lon, n_depth = (size // 2 for size in values.shape)
+        blocks = values.reshape(n_lat, 2, n_lon, 2, n_depth, 2)
+        
+        #Average of the filled nodes of every 2x2x2 block
+        filled = ~np.isnan(blocks)
+        count = filled.sum(axis=(1, 3, 5))
+        with np.errstate(invalid='ignore'):
+            coarse = np.where(filled, blocks, 0.0).sum(axis=(1, 3, 5)) / count
+        
+        return VelocityVolume(halve_axis(volume.latitude), halve_axis(volume.longitude), 
+                              halve_axis(volume.depth), coarse)
+    
+    @classmethod
+    def from_volume(cls, volume, min_size=2):
+        """Input parameter: VelocityVolume, smallest number of latitudes or longitudes of the coarsest level
+        Function purpose: Build the pyramid by repeated downsampling of the full-resolution grid
+        Return: VolumePyramid"""
+        
+        levels = [volume]
+        while min(levels[-1].shape[:2]) > min_size:
+            levels.append(cls.downsample(levels[-1]))
+        
+        return cls(levels)
+    
+    @staticmethod
+    def volume_key(volume):
+        """Input parameter: VelocityVolume
+        Function purpose: Fingerprint the axes and values of the full-resolution grid, so a stored pyramid can be matched with the volume it was built from
+        Return: Hexadecimal string"""
+        
+        #Import modules
+        import hashlib
+        import numpy as np
+        
+        key = hashlib.sha1()
+        for value in (volume.latitude, volume.longitude, volume.depth, volume.values):
+            key.update(np.ascontiguousarray(value, dtype=float).tobytes())
+        
+        return key.hexdigest()
+    
+    def save(self, cache_dir):
+        """Input parameter: directory of the dataset cache
+        Function purpose: Store every level as a .npy grid next to the cached dataset of cached_import_file(), with the axis vectors and the fingerprint of the full-resolution grid in one .npz file
+        Return: None"""
+        
+        #Import modules
+        import os
+        import numpy as np
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        axes = {'key': self.volume_key(self.levels[0])}
+        for k, level in enumerate(self.levels):
+            np.save(os.path.join(cache_dir, "pyramid_level_%d.npy" % k), level.values)
+            axes["latitude_%d" % k] = level.latitude
+            axes["longitude_%d" % k] = level.longitude
+            axes["depth_%d" % k] = level.depth
+        np.savez(os.path.join(cache_dir, "pyramid_axes.npz"), n_levels=len(self.levels), **axes)
+    
+    @classmethod
+    def load(cls, cache_dir, volume=None):
+        """Input parameter: directory of the dataset cache, optional VelocityVolume of the current dataset
+        Function purpose: Load a pyramid stored by save(), with every level memory-mapped so only the viewed parts are read. When the current volume is given, the stored fingerprint must match it, so a pyramid left over from an older dataset is never shown
+        Return: VolumePyramid, or None when the stored pyramid was built from a different volume and has to be rebuilt"""
+        
+        #Import modules
+        import os
+        import numpy as np
+        
+        levels = []
+        with np.load(os.path.join(cache_dir, "pyramid_axes.npz")) as axes:
+            #Stale pyramid of another dataset
+            if volume is not None and ("key" not in axes.files or str(axes["key"]) != cls.volume_key(volume)):
+                return None
+            
+            for k in range(int(axes["n_levels"])):
+                values = np.load(os.path.join(cache_dir, "pyramid_level_%d.npy" % k), mmap_mode='r')
+                levels.append(VelocityVolume(axes["latitude_%d" % k], axes["longitude_%d" % k], 
+                                             axes["depth_%d" % k], values))
+        
+        return cls(levels)
+    
+    def level_for(self, resolution, lat_range=None, lon_range=None):
+        """Input parameter: number of nodes needed along the horizontal axes of the view, optional (minimum, maximum) latitude and longitude of the viewed window
+        Function purpose: Pick the coarsest level that has at least the requested number of latitudes and longitudes inside the window, or the full resolution when no level has enough, and crop it to the window
+        Return: VelocityVolume of the window"""
+        
+        #Import module
+        import numpy as np
+        
+        def window(axis, value_range):
+            if value_range is None:
+                return slice(0, len(axis))
+            return slice(np.searchsorted(axis, value_range[0], side='left'), 
+                         np.searchsorted(axis, value_range[1], side='right'))
+        
+        for level in reversed(self.levels):
+            lat_window = window(level.latitude, lat_range)
+            lon_window = window(level.longitude, lon_range)
+            if min(len(level.latitude[lat_window]), len(level.longitude[lon_window])) >= resolution \
+                    or level is self.levels[0]:
+                return VelocityVolume(level.latitude[lat_window], level.longitude[lon_window], level.depth, 
+                                      level.values[lat_window, lon_window])
+
+class ChunkedVolumeStore:
+    """Input: Directory of the store, number of chunks kept in memory
+    Purpose: Keep a velocity grid that does not fit in memory on disk as fixed-size 3D chunks. Every chunk is a .npy file next to a JSON index of the grid shape, chunk shape, and written chunks, and the axis vectors are stored in one .npz file. Chunks that were never written are read as NaN. Reads only load the chunks that intersect the requested region, and the most recently used chunks are kept in a bounded cache that is safe to share between threads"""
+    
+    def __init__(self, path, cache_size=64):
+        #Import modules
+        import os
+        import json
+        import threading
+        import numpy as np
+        from collections import OrderedDict
+        
+        with open(os.path.join(path, "store_index.json")) as f:
+            index = json.load(f)
+        with np.load(os.path.join(path, "store_axes.npz")) as axes:
+            self.latitude = axes["latitude"]
+            self.longitude = axes["longitude"]
+            self.depth = axes["depth"]
+        
+        self.path = path
+        self.shape = tuple(index["shape"])
+        self.chunk_shape = tuple(index["chunk_shape"])
+        self.dtype = np.dtype(index["dtype"])
+        self.written = set(tuple(key) for key in index["chunks"])
+        self.cache_size = cache_size
+        self.chunk_reads = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def create(cls, path, latitude, longitude, depth, chunk_shape=(32, 32, 64), dtype='float64', cache_size=64):
+        """Input parameter: directory of the store, axis vectors of latitude, longitude, and depth, shape of a chunk, data type of velocity, number of chunks kept in memory
+        Function purpose: Create an empty store for a grid with the given axes
+        Return: ChunkedVolumeStore"""
+        
+        #Import modules
+        import os
+        import json
+        import numpy as np
+        
+        os.makedirs(path, exist_ok=True)
+        np.savez(os.path.join(path, "store_axes.npz"), latitude=latitude, longitude=longitude, depth=depth)
+        with open(os.path.join(path, "store_index.json"), "w") as f:
+            json.dump({"shape": [len(latitude), len(longitude), len(depth)], 
+                       "chunk_shape": list(chunk_shape), 
+                       "dtype": np.dtype(dtype).str, 
+                       "chunks": []}, f)
+        
+        return cls(path, cache_size)
+    
+    @classmethod
+    def from_volume(cls, volume, path, chunk_shape=(32, 32, 64), dtype='float64', cache_size=64):
+        """Input parameter: VelocityVolume, directory of the store, shape of a chunk, data type of velocity, number of chunks kept in memory
+        Function purpose: Write a whole grid into a new store
+        Return: ChunkedVolumeStore"""
+        
+        store = cls.create(path, volume.latitude, volume.longitude, volume.depth, chunk_shape, dtype, cache_size)
+        store.write_region((0, 0, 0), volume.values)
+        
+        return store
+    
+    def chunk_file(self, key):
+        """Return: File of the chunk with the given (latitude, longitude, depth) chunk index"""
+        import os
+        return os.path.join(self.path, "chunk_%d_%d_%d.npy" % key)
+    
+    def chunk_ranges(self, start, stop):
+        """Input parameter: start and end grid index of a region along the three axes
+        Function purpose: List the chunks that intersect the region, with the part of the chunk and the part of the region they share
+        Return: List of (chunk index, slices inside the chunk, slices inside the region)"""
+        
+        #Import module
+        import itertools
+        
+        per_axis = []
+        for axis in range(3):
+            size = self.chunk_shape[axis]
+            parts = []
+            for c in range(start[axis] // size, (stop[axis] - 1) // size + 1 if stop[axis] > start[axis] else 0):
+                low = max(start[axis], c * size)
+                high = min(stop[axis], (c + 1) * size)
+                parts.append((c, slice(low - c * size, high - c * size), slice(low - start[axis], high - start[axis])))
+            per_axis.append(parts)
+        
+        return [(tuple(p[0] for p in combination), 
+                 tuple(p[1] for p in combination), 
+                 tuple(p[2] for p in combination)) 
+                for combination in itertools.product(*per_axis)]
+    
+    def chunk_size(self, key):
+        """Return: Shape of the chunk with the given chunk index, which is smaller at the end of an axis"""
+        return tuple(min(self.chunk_shape[a], self.shape[a] - key[a] * self.chunk_shape[a]) for a in range(3))
+    
+    def write_region(self, start, values):
+        """Input parameter: first grid index of the region along the three axes, 3D numpy array of velocity of the region
+        Function purpose: Write a region of the grid into the chunks it intersects, creating NaN chunks where needed
+        Return: None"""
+        
+        stop = tuple(start[a] + values.shape[a] for a in range(3))
+        if any(stop[a] > self.shape[a] for a in range(3)):
+            raise Exception("Region exceeds the grid of the store")
+        
+        for key, chunk_part, region_part in self.chunk_ranges(start, stop):
+            chunk = self.open_chunk(key)
+            chunk[chunk_part] = values[region_part]
+            self.close_chunk(key, chunk)
+        
+        self.save_index()
+    
+    def write_batches(self, batches):
+        """Input parameter: iterable of 2D numpy arrays of velocity dataset, for example from iter_import_file()
+        Function purpose: Scatter streamed rows into the chunks of the store batch by batch with constant memory. Every row must lie on the axes of the store. As in VelocityVolume.from_array(), a grid node keeps the first velocity written to it: a repeated coordinate inside a batch is reduced to its first row, and nodes filled by an earlier batch or write are not overwritten. The rows of a batch are grouped by chunk with one stable sort
+        Return: Number of written rows"""
+        
+        #Import module
+        import numpy as np
+        
+        axes = (self.latitude, self.longitude, self.depth)
+        chunk_shape = np.array(self.chunk_shape)
+        n_chunks = tuple(-(-self.shape[a] // self.chunk_shape[a]) for a in range(3))
+        n_rows = 0
+        for batch in batches:
+            #Grid index of every row
+            index = np.stack([np.clip(np.searchsorted(axis, batch[:,a]), 0, len(axis) - 1) 
+                              for a, axis in enumerate(axes)], axis=1)
+            if not all(np.array_equal(axis[index[:,a]], batch[:,a]) for a, axis in enumerate(axes)):
+                raise Exception("Rows do not lie on the axes of the store")
+            
+            #Group the rows by chunk, keeping the batch order inside every group
+            chunk_index = index // chunk_shape
+            chunk_key = np.ravel_multi_index(chunk_index.T, n_chunks)
+            order = np.argsort(chunk_key, kind='stable')
+            boundary = np.flatnonzero(chunk_key[order][1:] != chunk_key[order][:-1]) + 1
+            
+            for member in np.split(order, boundary):
+                key = tuple(chunk_index[member[0]].tolist())
+                local = index[member] - chunk_index[member] * chunk_shape
+                chunk = self.open_chunk(key)
+                
+                #First row of every node, written only where the node is still empty
+                _, first = np.unique(np.ravel_multi_index(local.T, chunk.shape), return_index=True)
+                member, local = member[first], local[first]
+                empty = np.isnan(chunk[local[:,0], local[:,1], local[:,2]])
+                chunk[local[empty, 0], local[empty, 1], local[empty, 2]] = batch[member[empty], 3]
+                self.close_chunk(key, chunk)
+            n_rows += len(batch)
+        
+        self.save_index()
+        
+        return n_rows
+    
+    def open_chunk(self, key):
+        """Input parameter: chunk index along the three axes
+        Function purpose: Open a chunk file for writing as a memory map, creating it filled with NaN when it does not exist
+        Return: Memory-mapped 3D numpy array of the chunk"""
+        
+        #Import module
+        import numpy as np
+        
+        if key in self.written:
+            return np.load(self.chunk_file(key), mmap_mode='r+')
+        chunk = np.lib.format.open_memmap(self.chunk_file(key), mode='w+', dtype=self.dtype, 
+                                          shape=self.chunk_size(key))
+        chunk[...] = np.nan
+        
+        return chunk
+    
+    def close_chunk(self, key, chunk):
+        """Input parameter: chunk index along the three axes, memory-mapped chunk from open_chunk()
+        Function purpose: Flush a written chunk, mark it as written, and drop its stale copy from the cache
+        Return: None"""
+        
+        chunk.flush()
+        with self._lock:
+            self.written.add(key)
+            self._cache.pop(key, None)
+    
+    def save_index(self):
+        """Function purpose: Write the JSON index with the list of written chunks
+        Return: None"""
+        
+        #Import modules
+        import os
+        import json
+        
+        with open(os.path.join(self.path, "store_index.json"), "w") as f:
+            json.dump({"shape": list(self.shape), 
+                       "chunk_shape": list(self.chunk_shape), 
+                       "dtype": self.dtype.str, 
+                       "chunks": sorted(list(key) for key in self.written)}, f)
+    
+    def chunk(self, key):
+        """Input parameter: chunk index along the three axes
+        Function purpose: Get the decoded chunk from the bounded cache, loading it from disk when it is not cached and evicting the least recently used chunk when the cache is full
+        Return: 3D numpy array of the chunk"""
+        
+        #Import module
+        import numpy as np
+        
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        
+        #Load outside the lock so other threads can read cached chunks meanwhile
+        if key in self.written:
+            values = np.load(self.chunk_file(key))
+        else:
+            values = np.full(self.chunk_size(key), np.nan, dtype=self.dtype)
+        values.setflags(write=False)
+        
+        with self._lock:
+            self.chunk_reads += 1
+            self._cache[key] = values
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        
+        return values
+    
+    def read(self, lat_window=slice(None), lon_window=slice(None), depth_window=slice(None)):
+        """Input parameter: slices of latitude, longitude, and depth index, with an optional step
+        Function purpose: Assemble a region of the grid from the chunks it intersects. With a step, only the selected nodes of every chunk are copied, so a coarse preview does not assemble the full region
+        Return: 3D numpy array of velocity of the region"""
+        
+        #Import modules
+        import itertools
+        import numpy as np
+        
+        #Contiguous windows are copied as chunk blocks
+        windows = [window.indices(size) for window, size in zip((lat_window, lon_window, depth_window), self.shape)]
+        if all(step == 1 for _, _, step in windows):
+            start = tuple(low for low, _, _ in windows)
+            stop = tuple(max(low, high) for low, high, _ in windows)
+            
+            region = np.empty(tuple(stop[a] - start[a] for a in range(3)), dtype=self.dtype)
+            for key, chunk_part, region_part in self.chunk_ranges(start, stop):
+                region[region_part] = self.chunk(key)[chunk_part]
+            
+            return region
+        
+        #Selected index of every axis, grouped by the chunk that holds it
+        per_axis = []
+        for axis, window in enumerate(windows):
+            index = np.arange(*window)
+            chunk_index = index // self.chunk_shape[axis]
+            per_axis.append([(c, index[chunk_index == c] - c * self.chunk_shape[axis], np.flatnonzero(chunk_index == c)) 
+                             for c in np.unique(chunk_index).tolist()])
+        
+        region = np.empty(tuple(len(np.arange(*window)) for window in windows), dtype=self.dtype)
+        for combination in itertools.product(*per_axis):
+            key = tuple(part[0] for part in combination)
+            region[np.ix_(*[part[2] for part in combination])] = self.chunk(key)[np.ix_(*[part[1] for part in combination])]
+        
+        return region
+    
+    def columns(self, lat_index, lon_index):
+        """Input parameter: arrays of latitude and longitude indices of grid columns
+        Function purpose: Gather the velocity profiles of the selected grid columns, loading only the chunks that hold them
+        Return: 2D numpy array with shape (columns, depth)"""
+        
+        #Import module
+        import numpy as np
+        
+        lat_index = np.asarray(lat_index)
+        lon_index = np.asarray(lon_index)
+        profiles = np.empty((len(lat_index), self.shape[2]), dtype=self.dtype)
+        
+        #Group the columns by their horizontal chunk
+        lat_chunk = lat_index // self.chunk_shape[0]
+        lon_chunk = lon_index // self.chunk_shape[1]
+        for ci, cj in set(zip(lat_chunk.tolist(), lon_chunk.tolist())):
+            member = np.flatnonzero((lat_chunk == ci) & (lon_chunk == cj))
+            i = lat_index[member] - ci * self.chunk_shape[0]
+            j = lon_index[member] - cj * self.chunk_shape[1]
+            for ck in range(-(-self.shape[2] // self.chunk_shape[2])):
+                depth_start = ck * self.chunk_shape[2]
+                block = self.chunk((ci, cj, ck))
+                profiles[member, depth_start:depth_start + block.shape[2]] = block[i, j]
+        
+        return profiles
+    
+    def north_south_section(self, longitude, tolerance=None):
+        """Input parameter: longitude value, optional tolerance of the nearest longitude
+        Function purpose: Read the north-south cross section at the nearest grid longitude
+        Return: 2D numpy array with shape (latitude, depth)"""
+        j = nearest_index(self.longitude, longitude, tolerance)
+        return self.read(slice(None), slice(j, j + 1))[:, 0, :]
+    
+    def east_west_section(self, latitude, tolerance=None):
+        """Input parameter: latitude value, optional tolerance of the nearest latitude
+        Function purpose: Read the east-west cross section at the nearest grid latitude
+        Return: 2D numpy array with shape (longitude, depth)"""
+        i = nearest_index(self.latitude, latitude, tolerance)
+        return self.read(slice(i, i + 1))[0]
+    
+    def iter_blocks(self):
+        """Function purpose: Walk the grid one horizontal block of chunks at a time, with all depths of the block
+        Return: Generator of (latitude slice, longitude slice, 3D numpy array of velocity)"""
+        for lat_start in range(0, self.shape[0], self.chunk_shape[0]):
+            for lon_start in range(0, self.shape[1], self.chunk_shape[1]):
+                lat_window = slice(lat_start, min(lat_start + self.chunk_shape[0], self.shape[0]))
+                lon_window = slice(lon_start, min(lon_start + self.chunk_shape[1], self.shape[1]))
+                yield lat_window, lon_window, self.read(lat_window, lon_window)
+
+@instrument
+def plotly_friendly_dataframe(filled_array):
+    """Input parameter: 2D Numpy array of merged velocity dataset or CompactDataset
+    Function purpose: Arrange new dataset in Pandas DataFrame type that can be readily plotted for 
+    3D plotly visualization. The dataset in the form of array should be rearranged to follow the grid pattern in order to be plotly-friendly. The grid is built as VelocityVolume, in which grid nodes without measurement are NaN, and a CompactDataset is read from its site table
+    Return: Velocity dataset in the form of Pandas DataFrame"""
+    
+    #Import modules
+    import numpy as np
+    
+    #Raise exception
+    if not isinstance(filled_array, CompactDataset):
+        if type(filled_array) != np.ndarray:
+            raise TypeError("Input must be a numpy array")
+        if filled_array.shape[1] < 4:
+            raise Exception("Insufficient data size to convert to Pandas DataFrame")
+        elif filled_array.shape[1] > 4:
+            raise Exception("Data size exceeding the required size to convert to Pandas DataFrame")
+    
+    #Build dense grid and its DataFrame view
+    vs_database = VelocityVolume.from_array(filled_array).dataframe
+    
+    return vs_database
@@ -0,0 +1,292 @@
+from .monitoring import instrument
+
+@instrument
+def read_profile(file):
+    """
+    Input parameter: a single .dat or .txt file
+    Function purpose: Read one measurement site in a single pass. The header line holds longitude and latitude, and the remaining rows hold depth and velocity. The header is split by hand and the body is parsed once with the vectorized numpy loader on the same file handle
+    Return: Latitude, longitude, and a 2D numpy array with two columns which consist of depth and velocity, respectively
+    """
+    #Import module
+    import numpy as np
+    
+    with open(file) as f:
+        #Header stores longitude first, then latitude
+        header = f.readline().split()
+        if len(header) < 2:
+            raise Exception("File header should contain longitude and latitude")
+        vs_lon = float(header[0])
+        vs_lat = float(header[1])
+        
+        #Parse depth and velocity columns of the remaining rows at once
+        profile = np.loadtxt(f, usecols=(0, 1), ndmin=2)
+    
+    return vs_lat, vs_lon, profile
+
+def split_chunks(filenames, workers):
+    """
+    Input parameter: list of files, number of worker processes
+    Function purpose: Split the file list into contiguous chunks so that a process pool receives a few chunks per worker. Contiguous chunks keep the order of the files when the results are joined back
+    Return: List of file lists
+    """
+    #Use about four chunks per worker to balance uneven file sizes
+    n_chunks = min(len(filenames), workers * 4)
+    chunk_size = -(-len(filenames) // n_chunks)
+    
+    return [filenames[i:i + chunk_size] for i in range(0, len(filenames), chunk_size)]
+
+def import_chunk(filenames, return_lengths=False):
+    """
+    Input parameter: list of .dat or .txt file, optional flag to also return the number of rows of every file
+    Function purpose: Read a chunk of site files into one compact 2D numpy array. This is the unit of work of a single process in the parallel import_file, so only one array per chunk is sent back to the parent process
+    Return: A 2D numpy array with four columns which consist of latitude, longitude, depth, and velocity, respectively (and a 1D array of rows per file)
+    """
+    #Import module
+    import numpy as np
+    
+    #Read every site of the chunk once
+    sites = [read_profile(file) for file in filenames]
+    
+    #Fill lat, lon, depth, and shear wave columns of one preallocated 2D array
+    chunk_array = np.empty((sum(len(profile) for _, _, profile in sites), 4))
+    row = 0
+    for vs_lat, vs_lon, profile in sites:
+        single_location_data = chunk_array[row:row + len(profile)]
+        single_location_data[:,0] = vs_lat
+        single_location_data[:,1] = vs_lon
+        np.negative(profile[:,0], out=single_location_data[:,2])
+        single_location_data[:,3] = profile[:,1]
+        row += len(profile)
+    
+    if return_lengths:
+        return chunk_array, np.array([len(profile) for _, _, profile in sites], dtype=np.int64)
+    
+    return chunk_array
+
+@instrument
+def import_file(filenames, workers=None):   
+    """
+    Input parameter: list of .dat or .txt file, optional number of worker processes
+    Function purpose: Read and import multiple files in which a single file correspond to an individual location with given latitude and longitude. Each file will be structured, stacked, and arranged into one 2D numpy array. When workers is given, the file list is split into chunks that are parsed in a process pool
+    Return: A 2D numpy array with four columns which consist of latitude, longitude, depth, and velocity, respectively
+    """
+    #Import module
+    import numpy as np
+    
+    #Raise exception
+    if not type(filenames) is list:
+        raise TypeError("Your input data should be list of external files")
+    if workers is not None and (type(workers) is not int or workers < 1):
+        raise Exception("Number of workers should be a positive integer")
+    
+    #Serial import in the current process
+    if workers is None or workers == 1 or len(filenames) < 2:
+        return import_chunk(filenames)
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    #Parse chunks in parallel, map keeps the order of the chunks
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_arrays = list(executor.map(import_chunk, split_chunks(filenames, workers)))
+    
+    #Join all chunk arrays into one single 2D array
+    vs_array = np.concatenate(chunk_arrays)
+    
+    return vs_array
+
+@instrument
+def cached_import_file(filenames, cache_dir, workers=None, writable=False):
+    """
+    Input parameter: list of .dat or .txt file, directory of the cache, optional number of worker processes, whether to return a writable copy
+    Function purpose: Import multiple files through a binary cache of the merged dataset. The merged array is stored as .npy next to a JSON manifest with path, size, modification time, and row range of every source file. When nothing changed the cached array is memory-mapped directly. Otherwise only new or modified files are parsed, and the cache is rewritten from the unchanged rows of the old cache and the newly parsed rows. The new files are written under unique temporary names and moved into place, so processes refreshing the same cache do not overwrite each other's partial files
+    Return: A 2D numpy array with four columns which consist of latitude, longitude, depth, and velocity, respectively. Unlike import_file(), the array is a read-only view of the memory-mapped cache and assigning to it raises ValueError, unless writable is True, which returns a copy in memory
+    """
+    #Import modules
+    import os
+    import json
+    import tempfile
+    import numpy as np
+    
+    #Raise exception
+    if not type(filenames) is list:
+        raise TypeError("Your input data should be list of external files")
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    array_path = os.path.join(cache_dir, "velocity_dataset.npy")
+    manifest_path = os.path.join(cache_dir, "velocity_manifest.json")
+    
+    #Fingerprint of every source file
+    paths = [os.path.abspath(file) for file in filenames]
+    fingerprints = []
+    for path in paths:
+        stat = os.stat(path)
+        fingerprints.append((stat.st_size, stat.st_mtime_ns))
+    
+    #Read previous manifest and cached array
+    cached_entries = {}
+    cached_array = None
+    if os.path.exists(manifest_path) and os.path.exists(array_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        cached_entries = {entry["path"]: entry for entry in manifest["files"]}
+        cached_array = np.load(array_path, mmap_mode='r')
+        
+        #Return memory-mapped cache when every file is unchanged and in the same order
+        if [entry["path"] for entry in manifest["files"]] == paths and all(
+                (cached_entries[path]["size"], cached_entries[path]["mtime_ns"]) == fingerprint
+                for path, fingerprint in zip(paths, fingerprints)):
+            return np.array(cached_array) if writable else np.asarray(cached_array)
+    
+    #Files that are missing from the cache or modified since
+    stale = [file for file, path, fingerprint in zip(filenames, paths, fingerprints)
+             if path not in cached_entries
+             or (cached_entries[path]["size"], cached_entries[path]["mtime_ns"]) != fingerprint]
+    
+    #Parse only stale files
+    parsed = {}
+    if stale:
+        if workers is None or workers == 1 or len(stale) < 2:
+            chunk_results = [import_chunk(stale, return_lengths=True)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            from functools import partial
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_results = list(executor.map(partial(import_chunk, return_lengths=True), 
+                                                  split_chunks(stale, workers)))
+        stale_array = np.concatenate([chunk_array for chunk_array, _ in chunk_results])
+        stale_lengths = np.concatenate([lengths for _, lengths in chunk_results])
+        stale_offsets = np.concatenate(([0], np.cumsum(stale_lengths)[:-1]))
+        for file, offset, length in zip(stale, stale_offsets, stale_lengths):
+            parsed[os.path.abspath(file)] = stale_array[offset:offset + length]
+    
+    #Row count of every file, either from the manifest or from the parsed rows
+    lengths = [len(parsed[path]) if path in parsed else cached_entries[path]["rows"] for path in paths]
+    
+    #Write the merged array straight into a new .npy file with a unique name
+    descriptor, temporary_path = tempfile.mkstemp(suffix=".npy", dir=cache_dir)
+    os.close(descriptor)
+    merged = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=np.float64, 
+                                       shape=(sum(lengths), 4))
+    entries = []
+    row = 0
+    for path, fingerprint, length in zip(paths, fingerprints, lengths):
+        if path in parsed:
+            merged[row:row + length] = parsed[path]
+        else:
+            cached_offset = cached_entries[path]["offset"]
+            merged[row:row + length] = cached_array[cached_offset:cached_offset + length]
+        entries.append({"path": path, "size": fingerprint[0], "mtime_ns": fingerprint[1], 
+                        "offset": row, "rows": length})
+        row += length
+    merged.flush()
+    del merged, cached_array
+    
+    #Replace cache and manifest
+    os.replace(temporary_path, array_path)
+    descriptor, temporary_manifest = tempfile.mkstemp(suffix=".json", dir=cache_dir)
+    with os.fdopen(descriptor, "w") as f:
+        json.dump({"files": entries}, f)
+    os.replace(temporary_manifest, manifest_path)
+    
+    cached_array = np.load(array_path, mmap_mode='r')
+    return np.array(cached_array) if writable else np.asarray(cached_array)
+
+def iter_import_file(filenames, batch_rows=65536, return_sites=False):
+    """
+    Input parameter: list of .dat or .txt file, number of rows per batch, whether to also yield the file index of every row
+    Function purpose: Stream the merged dataset as fixed-size record batches while the files are parsed, instead of collecting all files before joining them. Only one batch and one file are held in memory at a time. Rows keep the order of import_file(), so the rows of one site are contiguous, although a site may continue in the next batch. The file index marks where one site ends and the next begins, also when two consecutive files have the same coordinate
+    Return: Generator of 2D numpy arrays with four columns which consist of latitude, longitude, depth, and velocity, respectively, or of (batch, 1D numpy array of file index of every row) with return_sites. Every batch has batch_rows rows except the last one
+    """
+    #Import module
+    import numpy as np
+    
+    #Raise exception
+    if not type(filenames) is list:
+        raise TypeError("Your input data should be list of external files")
+    if type(batch_rows) is not int or batch_rows < 1:
+        raise Exception("Number of rows per batch should be a positive integer")
+    
+    batch = np.empty((batch_rows, 4))
+    sites = np.empty(batch_rows, dtype=np.int64)
+    row = 0
+    for file_index, file in enumerate(filenames):
+        vs_lat, vs_lon, profile = read_profile(file)
+        
+        #Copy the profile into the batch, yielding every time the batch is full
+        start = 0
+        while start < len(profile):
+            n_rows = min(batch_rows - row, len(profile) - start)
+            single_location_data = batch[row:row + n_rows]
+            single_location_data[:,0] = vs_lat
+            single_location_data[:,1] = vs_lon
+            np.negative(profile[start:start + n_rows, 0], out=single_location_data[:,2])
+            single_location_data[:,3] = profile[start:start + n_rows, 1]
+            sites[row:row + n_rows] = file_index
+            row += n_rows
+            start += n_rows
+            if row == batch_rows:
+                yield (batch, sites) if return_sites else batch
+                batch = np.empty((batch_rows, 4))
+                sites = np.empty(batch_rows, dtype=np.int64)
+                row = 0
+    
+    if row > 0:
+        yield (batch[:row], sites[:row]) if return_sites else batch[:row]
+
+def stream_statistics(batches):
+    """
+    Input parameter: iterable of 2D numpy arrays of velocity dataset, for example from iter_import_file()
+    Function purpose: Summarize the dataset batch by batch with constant memory. Coordinate ranges are updated per batch, and the mean and standard deviation of velocity are merged from per-batch moments
+    Return: Dictionary of number of rows, coordinate and velocity ranges, and velocity mean and standard deviation
+    """
+    #Import module
+    import numpy as np
+    
+    n_rows = 0
+    mean = 0.0
+    m2 = 0.0
+    lower = np.full(4, np.inf)
+    upper = np.full(4, -np.inf)
+    
+    for batch in batches:
+        vel = batch[:,3][~np.isnan(batch[:,3])]
+        lower = np.fmin(lower, np.nanmin(batch, axis=0))
+        upper = np.fmax(upper, np.nanmax(batch, axis=0))
+        if len(vel) == 0:
+            continue
+        
+        #Merge mean and sum of squared deviation of the batch
+        batch_mean = vel.mean()
+        batch_m2 = ((vel - batch_mean)**2).sum()
+        total = n_rows + len(vel)
+        delta = batch_mean - mean
+        mean += delta * len(vel) / total
+        m2 += batch_m2 + delta**2 * n_rows * len(vel) / total
+        n_rows = total
+    
+    return {'rows': n_rows,
+            'latitude_range': (lower[0], upper[0]),
+            'longitude_range': (lower[1], upper[1]),
+            'depth_range': (lower[2], upper[2]),
+            'velocity_range': (lower[3], upper[3]),
+            'velocity_mean': mean if n_rows else np.nan,
+            'velocity_std': np.sqrt(m2 / n_rows) if n_rows else np.nan}
+
+def stream_axes(batches):
+    """
+    Input parameter: iterable of 2D numpy arrays of velocity dataset, for example from iter_import_file()
+    Function purpose: Collect the unique latitude, longitude, and depth values batch by batch, as parameter_list() does for the whole array, so a grid or ChunkedVolumeStore can be created before the data is written
+    Return: Lists of unique values
+    """
+    #Import module
+    import numpy as np
+    
+    lat_list = np.array([])
+    long_list = np.array([])
+    d_list = np.array([])
+    for batch in batches:
+        lat_list = np.union1d(lat_list, batch[:,0])
+        long_list = np.union1d(long_list, batch[:,1])
+        d_list = np.union1d(d_list, batch[:,2])
+    
+    return lat_list, long_list, d_list
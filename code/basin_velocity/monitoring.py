@@ -0,0 +1,187 @@
+import threading
+
+#State of the instrumentation, disabled by default. Stages can run in thread pools, so every thread keeps its own stack of running stages,
+#and the exporters and the count of traced stages that keeps tracemalloc running are guarded by one lock
+INSTRUMENTATION = {'enabled': False, 'exporters': [], 'trace_memory': False, 'profile_stage': None, 'local': threading.local(), 
+                   'traced_stages': 0, 'started_tracing': False}
+INSTRUMENTATION_LOCK = threading.Lock()
+
+def stage_stack():
+    """Return: List of the frames of the stages running in the current thread"""
+    
+    local = INSTRUMENTATION['local']
+    if not hasattr(local, 'stack'):
+        local.stack = []
+    
+    return local.stack
+
+def count_rows(value):
+    """Input: Argument or result of a stage
+    Function purpose: Count the rows of arrays, DataFrames, and lists. For a tuple the largest row count of its members is taken, as for the profile returned by read_profile()
+    Return: Number of rows, or None when the value has no rows"""
+    
+    if isinstance(value, tuple):
+        counts = [count for count in map(count_rows, value) if count is not None]
+        return max(counts) if counts else None
+    shape = getattr(value, 'shape', None)
+    if isinstance(shape, tuple) and len(shape) > 0:
+        return int(shape[0])
+    if isinstance(value, list):
+        return len(value)
+    
+    return None
+
+def instrument(function):
+    """Input: Function of a pipeline stage
+    Function purpose: Decorator that records the stage when the instrumentation is enabled. When it is disabled the call only checks one flag, so the hot path costs nothing measurable
+    Return: Wrapped function"""
+    
+    #Import module
+    import functools
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not INSTRUMENTATION['enabled']:
+            return function(*args, **kwargs)
+        return run_instrumented(function, args, kwargs)
+    
+    return wrapper
+
+def run_instrumented(function, args, kwargs):
+    """Input: Function of a stage, its positional and keyword arguments
+    Function purpose: Call the stage and send one record to every exporter. The record holds the stage name, wall time, rows of the first argument and of the result, the size of an input file, the peak of traced memory above the memory at the start (when trace_memory is enabled), and the cProfile statistics when the stage is the profiled one. Nested stages report their own record, and the peak of a stage includes the peak of its inner stages. Nesting is tracked per thread, and records are sent to the exporters under a lock, so stages may run in thread pools. tracemalloc is shared by the process: it runs while any traced stage runs, and the peak of a stage that overlaps stages of other threads is approximate and includes their memory
+    Return: Result of the stage"""
+    
+    #Import modules
+    import os
+    import time
+    import tracemalloc
+    
+    #First data argument, after the class of a class method
+    data = args[1:] if args and isinstance(args[0], type) else args
+    record = {'stage': function.__qualname__, 'rows_in': count_rows(data[0]) if data else None}
+    if data and isinstance(data[0], str) and os.path.isfile(data[0]):
+        record['file'] = data[0]
+        record['bytes_in'] = os.path.getsize(data[0])
+    
+    #Memory at the start, with the running peak of the outer stage kept on the stack
+    trace = INSTRUMENTATION['trace_memory']
+    frame = {'inner_peak': 0}
+    if trace:
+        with INSTRUMENTATION_LOCK:
+            if INSTRUMENTATION['traced_stages'] == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                INSTRUMENTATION['started_tracing'] = True
+            INSTRUMENTATION['traced_stages'] += 1
+            frame['current'], frame['outer_peak'] = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+    stack = stage_stack()
+    stack.append(frame)
+    
+    #Optional cProfile capture of one stage
+    profiler = None
+    if INSTRUMENTATION['profile_stage'] == record['stage']:
+        import cProfile
+        profiler = cProfile.Profile()
+    
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            result = profiler.runcall(function, *args, **kwargs)
+        else:
+            result = function(*args, **kwargs)
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        stack.pop()
+        if trace:
+            with INSTRUMENTATION_LOCK:
+                peak = max(tracemalloc.get_traced_memory()[1], frame['inner_peak'])
+                INSTRUMENTATION['traced_stages'] -= 1
+                if INSTRUMENTATION['traced_stages'] == 0 and INSTRUMENTATION['started_tracing']:
+                    tracemalloc.stop()
+                    INSTRUMENTATION['started_tracing'] = False
+            record['peak_bytes'] = max(peak - frame['current'], 0)
+            if stack:
+                outer = stack[-1]
+                outer['inner_peak'] = max(outer['inner_peak'], peak, frame['outer_peak'])
+    
+    record['rows_out'] = count_rows(result)
+    if profiler is not None:
+        import io
+        import pstats
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(30)
+        record['profile'] = text.getvalue()
+    
+    with INSTRUMENTATION_LOCK:
+        for exporter in INSTRUMENTATION['exporters']:
+            exporter(record)
+    
+    return result
+
+def enable_instrumentation(exporters=None, trace_memory=False, profile_stage=None):
+    """Input: Optional list of exporters (callables that receive every record as a dictionary), whether to trace peak memory with tracemalloc, optional name of one stage to capture with cProfile
+    Function purpose: Turn on the instrumentation of the decorated stages
+    Return: None"""
+    
+    INSTRUMENTATION['exporters'] = list(exporters) if exporters is not None else []
+    INSTRUMENTATION['trace_memory'] = trace_memory
+    INSTRUMENTATION['profile_stage'] = profile_stage
+    INSTRUMENTATION['enabled'] = True
+
+def disable_instrumentation():
+    """Function purpose: Turn off the instrumentation, so the decorated stages only check one flag
+    Return: None"""
+    
+    INSTRUMENTATION['enabled'] = False
+    INSTRUMENTATION['exporters'] = []
+    INSTRUMENTATION['profile_stage'] = None
+    INSTRUMENTATION['local'] = threading.local()
+
+class instrumentation:
+    """Input: Optional list of further exporters, whether to trace peak memory, optional name of one stage to capture with cProfile
+    Purpose: Context manager that enables the instrumentation inside a with block and collects the records in a list, for example
+        with instrumentation(trace_memory=True) as records:
+            array = import_file(files)
+    The instrumentation is disabled again when the block ends"""
+    
+    def __init__(self, exporters=None, trace_memory=False, profile_stage=None):
+        self.records = []
+        self.exporters = [self.records.append] + list(exporters or [])
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+    
+    def __enter__(self):
+        enable_instrumentation(self.exporters, self.trace_memory, self.profile_stage)
+        return self.records
+    
+    def __exit__(self, *exc):
+        disable_instrumentation()
+        return False
+
+def json_lines_exporter(filename):
+    """Input: Output file
+    Function purpose: Build an exporter that appends every record to a JSON lines file
+    Return: Exporter function"""
+    
+    #Import module
+    import json
+    
+    def exporter(record):
+        with open(filename, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+    
+    return exporter
+
+def summary_exporter(summary):
+    """Input: Dictionary to fill
+    Function purpose: Build an exporter that sums calls, wall time, and rows per stage into the dictionary, which summarises the per-file records of ingest into one line per stage
+    Return: Exporter function"""
+    
+    def exporter(record):
+        stage = summary.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'rows_out': 0})
+        stage['calls'] += 1
+        stage['seconds'] += record['seconds']
+        stage['rows_out'] += record['rows_out'] or 0
+    
+    return exporter
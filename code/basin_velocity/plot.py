@@ -0,0 +1,425 @@
+from .monitoring import instrument
+from .io import split_chunks
+from .dataset import CompactDataset, decimate_points
+from .grid import VolumePyramid
+
+@instrument
+def basin_scatterplot(array, max_points=None, statistic='mean', resolution=None):
+    """Input parameter: 2D Numpy array of merged velocity dataset, CompactDataset, or VolumePyramid, optional number of points as level of detail, statistic of decimate_points(), number of latitudes and longitudes needed from a VolumePyramid
+    Function purpose: Visualize the velocity distribution in a given coordinate and depth through 3D scatterplot using Matplotlib. When max_points is given, large datasets are decimated through decimate_points() before plotting. A VolumePyramid is plotted from its coarsest level with enough nodes
+    Return: 3D Matplotlib visualization
+    """
+    #Import module
+    import numpy as np
+    import matplotlib.pyplot as plt
+    
+    #Pick the level of the pyramid
+    if isinstance(array, VolumePyramid):
+        array = array.level_for(resolution if resolution is not None else np.inf).to_array()
+    
+    #Expand compact dataset
+    if isinstance(array, CompactDataset):
+        array = array.to_array()
+    
+    #Raise exception 
+    if type(array) != np.ndarray:
+        raise TypeError("Input must be a numpy array")
+    if array.shape[1] < 4:
+        raise Exception("Insufficient data size for 3D plotting")
+    elif array.shape[1] > 4:
+        raise Exception("Data size exceeding required size for 3D plotting")
+    
+    #Level of detail
+    if max_points is not None:
+        array = decimate_points(array, max_points, statistic)
+    
+    latitude = array[:,0]
+    longitude = array[:,1]
+    depth = array[:,2]
+    shearvel = array[:,3]
+    
+    fig = plt.figure(figsize=(12, 12))
+    ax = plt.axes(projection='3d')
+
+    basin_plot = ax.scatter3D(latitude, longitude, depth, c=shearvel, cmap='rainbow_r')
+
+    colorbar = plt.colorbar(basin_plot, pad=0.2)
+    colorbar.ax.set_ylabel('Shear wave (km/s)')
+
+    ax.set_xlabel('Latitude')
+    ax.set_ylabel('Longitude')
+    ax.set_zlabel('Depth')
+
+    ax.invert_xaxis()
+
+    return plt.show()
+
+#Triangulations of irregular slices, keyed by the fingerprint of their coordinates
+TRIANGULATION_CACHE = {}
+
+@instrument
+def slice_contourf(ax, x, y, z, levels, cmap):
+    """Input: Matplotlib axes, horizontal coordinate, depth, and velocity of a slice, contour levels, colour map
+    Function purpose: Draw the filled contour of a slice. When the slice rows fall on the grid of their unique coordinates without repeated nodes, and every column and every depth holds at least two rows, they are placed on a NaN-filled 2D grid and drawn with contourf, so partially filled slices need no triangulation either. Otherwise the points lie off the grid, and the Delaunay triangulation is taken from TRIANGULATION_CACHE, so slices that share the same geometry triangulate only once
+    Return: Matplotlib contour set"""
+    
+    #Import modules
+    import hashlib
+    import numpy as np
+    from matplotlib.tri import Triangulation
+    
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    
+    #Grid index of every row
+    x_axis = np.unique(x)
+    y_axis = np.unique(y)
+    x_index = np.searchsorted(x_axis, x)
+    y_index = np.searchsorted(y_axis, y)
+    flat_index = x_index * len(y_axis) + y_index
+    
+    #Grid without repeated nodes, the missing nodes are NaN
+    if len(x_axis) > 1 and len(y_axis) > 1 and len(np.unique(flat_index)) == len(z) \
+            and np.bincount(x_index).min() > 1 and np.bincount(y_index).min() > 1:
+        grid = np.full(len(x_axis) * len(y_axis), np.nan)
+        grid[flat_index] = z
+        return ax.contourf(x_axis, y_axis, grid.reshape(len(x_axis), len(y_axis)).T, levels=levels, cmap=cmap)
+    
+    #Irregular slice, reuse the triangulation of the same coordinates
+    key = hashlib.sha1(x.tobytes() + y.tobytes()).hexdigest()
+    if key not in TRIANGULATION_CACHE:
+        if len(TRIANGULATION_CACHE) >= 32:
+            TRIANGULATION_CACHE.pop(next(iter(TRIANGULATION_CACHE)))
+        TRIANGULATION_CACHE[key] = Triangulation(x, y)
+    
+    return ax.tricontourf(TRIANGULATION_CACHE[key], z, levels=levels, cmap=cmap)
+
+def finish_figure(fig, filename=None):
+    """Input: Matplotlib figure, optional image file
+    Function purpose: Save the figure to file and close it for unattended batch production, or show it when no file is given
+    Return: Filename of the saved image, or the result of plt.show()"""
+    
+    #Import module
+    import matplotlib.pyplot as plt
+    
+    #Save to file for unattended batch production
+    if filename is not None:
+        fig.savefig(filename)
+        plt.close(fig)
+        return filename
+    
+    return plt.show()
+
+@instrument
+def slice_scatterplot(dataframe, filename=None, max_points=None, statistic='mean'):
+    """Input: Pandas Dataframe of velocity dataset, optional image file to save the plot instead of showing it, optional number of points as level of detail, statistic of decimate_points()
+    Function purpose: Visualize 2D cross-sections of 3D basin volume using Matplotlib. The visualization utilize 3D scatterplot to show the cross-section location in the 3D area. When max_points is given, large slices are decimated through decimate_points() before plotting
+    Return: 3D Matplotlib visualization"""
+    
+    #Import modules
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    
+    #Exception handling
+    if len(dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for visualize sliced dataset")
+    if list(dataframe.columns) != ['Latitude', 'Longitude', 'Depth', 'Vs']:
+        raise Exception("Input dataframe does not contain desired parameters to plot")
+    
+    #Level of detail
+    if max_points is not None:
+        dataframe = pd.DataFrame(decimate_points(dataframe.to_numpy(dtype=float), max_points, statistic), 
+                                 columns=dataframe.columns)
+    
+    fig = plt.figure(figsize=(12,12))
+    ax = plt.axes(projection='3d')
+    surf = ax.scatter3D(dataframe['Longitude'],
+                          dataframe['Latitude'],
+                          dataframe['Depth'],
+                          c=dataframe['Vs'],
+                          cmap='RdBu')
+
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_zlabel('Depth')
+
+    colorbar = plt.colorbar(surf)
+    colorbar.ax.set_ylabel('Shear Wave (km/s)')
+
+    return finish_figure(fig, filename)
+
+@instrument
+def northeast_southwest_contourplot(nesw_dataframe, filename=None, levels=250):
+    """Input: Pandas Dataframe of northeast-southwest slice dataset, optional image file to save the plot instead of showing it, number of contour levels
+    Function purpose: Visualize 2D cross-sections of 3D basin volume in the form of filled contour plot across northeast - southwest line. Slices on a complete grid are contoured directly with slice_contourf()
+    Return: 2D Matplotlib visualization"""
+    
+    #Exception handling
+    if len(nesw_dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for visualize sliced dataset")
+    if list(nesw_dataframe.columns) != ['Latitude', 'Longitude', 'Depth', 'Vs']:
+        raise Exception("Input dataframe does not contain desired parameters to plot")
+        
+    #Import module
+    import numpy as np
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    
+    #2D Contourplot
+    x_long = nesw_dataframe['Longitude']
+    x_lat = nesw_dataframe['Latitude']
+    y = nesw_dataframe['Depth']
+    z = nesw_dataframe['Vs']
+    levels = np.linspace(z.min(), z.max(), levels)
+
+    #Define Plot Matrix
+    fig, ax = plt.subplots(2, 1, figsize=(12, 6))
+    fig.tight_layout()
+
+    #Plot with respect to longitude
+    ax[0].plot(x_long, y, 'o', markersize=0.5)
+    cont1 = slice_contourf(ax[0], x_long, y, z, levels, 'RdBu')
+    ax[0].set(xlim=(x_long.min(), x_long.max()), ylim=(y.min(), y.max()))
+    ax[0].set_xlabel('Longitude')
+    ax[0].set_ylabel('Depth')
+    ax[0].set_title('NE - SW Cross Section of Velocity Structure')
+    ax[0].annotate('Southwest', (106.74, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+    ax[0].annotate('Northeast', (106.99, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+
+    fig.colorbar(cont1, ax=ax[0])
+
+    #Plot with respect to latitude
+    ax[1].plot(x_lat, y, 'o', markersize=0.5)
+    cont2 = slice_contourf(ax[1], x_lat, y, z, levels, 'RdBu')
+    ax[1].set(xlim=(x_lat.min(), x_lat.max()), ylim=(y.min(), y.max()))
+    ax[1].set_xlabel('Latitude')
+    ax[1].set_ylabel('Depth')
+    ax[1].annotate('Southwest', (-6.42, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+    ax[1].annotate('Northeast', (-6.11, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+
+    fig.colorbar(cont2, ax=ax[1])
+
+    return finish_figure(fig, filename)
+
+@instrument
+def northwest_southeast_contourplot(nwse_dataframe, filename=None, levels=250):
+    """Input: Pandas Dataframe of northwest-southeast slice dataset, optional image file to save the plot instead of showing it, number of contour levels
+    Function purpose: Visualize 2D cross-sections of 3D basin volume in the form of filled contour plot across northwest - southeast line. Slices on a complete grid are contoured directly with slice_contourf()
+    Return: 2D Matplotlib visualization"""
+    
+    #Exception handling
+    if len(nwse_dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for visualize sliced dataset")
+    if list(nwse_dataframe.columns) != ['Latitude', 'Longitude', 'Depth', 'Vs']:
+        raise Exception("Input dataframe does not contain desired parameters to plot")
+    
+    #Import module
+    import numpy as np
+    import matplotlib.pyplot as plt
+    
+    #2D Contourplot
+    x_long = nwse_dataframe['Longitude']
+    x_lat = nwse_dataframe['Latitude']
+    y = nwse_dataframe['Depth']
+    z = nwse_dataframe['Vs']
+    levels = np.linspace(z.min(), z.max(), levels)
+
+    #Define Plot Matrix
+    fig, ax = plt.subplots(2, 1, figsize=(12, 6))
+    fig.tight_layout()
+
+    #Plot with respect to longitude
+    ax[0].plot(x_long, y, 'o', markersize=0.5)
+    cont3 = slice_contourf(ax[0], x_long, y, z, levels, 'RdBu')
+    ax[0].set(xlim=(x_long.min(), x_long.max()), ylim=(y.min(), y.max()))
+    ax[0].set_xlabel('Longitude')
+    ax[0].set_ylabel('Depth')
+    ax[0].set_title('NW - SE Cross Section of Velocity Structure')
+    ax[0].annotate('Northwest', (106.67, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+    ax[0].annotate('Southeast', (106.89, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+
+    fig.colorbar(cont3, ax=ax[0])
+
+    #Plot with respect to latitude
+    ax[1].plot(x_lat, y, 'o', markersize=0.5)
+    cont4 = slice_contourf(ax[1], x_lat, y, z, levels, 'RdBu')
+    ax[1].set(xlim=(x_lat.min(), x_lat.max()), ylim=(y.min(), y.max()))
+    ax[1].set_xlabel('Latitude')
+    ax[1].set_ylabel('Depth')
+    ax[1].annotate('Southeast', (-6.40, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+    ax[1].annotate('Northwest', (-6.12, -3.5), bbox=dict(boxstyle="round", fc="0.9", ec="gray"), size=12)
+
+    fig.colorbar(cont4, ax=ax[1])
+
+    return finish_figure(fig, filename)
+
+@instrument
+def latitudinal_longitudinal_contourplot(dataframe, coordinate_type, filename=None, levels=250):
+    """Input: Pandas Dataframe of constant latitude or longitude, and type of coordinate (either 'Latitude' or 'Longitude'), optional image file to save the plot instead of showing it, number of contour levels
+    Function purpose: Visualize 2D cross-sections of 3D basin volume in the form of filled contour plot across north-south or east-west direction. Slices on a complete grid are contoured directly with slice_contourf()
+    Return: 2D Matplotlib visualization"""
+    
+    #Exception handling
+    if len(dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for visualize sliced dataset")
+    if list(dataframe.columns) != ['Latitude', 'Longitude', 'Depth', 'Vs']:
+        raise Exception("Input dataframe does not contain desired parameters to plot")
+    if coordinate_type not in ['Latitude', 'Longitude']:
+        raise Exception("Invalid coordinate type")
+    
+    #Import module
+    import numpy as np
+    import matplotlib.pyplot as plt
+    
+    x = dataframe[coordinate_type]
+    y = dataframe['Depth']
+    vel = dataframe['Vs']
+    levels = np.linspace(vel.min(), vel.max(), levels)
+
+    #Define Plot Matrix
+    fig, ax = plt.subplots(figsize=(12, 6))
+    fig.tight_layout()
+
+    #Plot
+    ax.plot(x, y, 'o', markersize=0.5)
+    plot_nondiagonal = slice_contourf(ax, x, y, vel, levels, 'RdBu')
+    ax.set(xlim=(x.min(), x.max()), ylim=(y.min(), y.max()))
+    ax.set_xlabel(coordinate_type)
+    ax.set_ylabel('Depth')
+    ax.set_title(coordinate_type + ' Cross Section of Velocity Structure')
+
+    cbar6 = plt.colorbar(plot_nondiagonal)
+    cbar6.ax.set_ylabel('Shear wave (km/s)')
+
+    return finish_figure(fig, filename)
+
+def render_section_chunk(sections, filenames, titles, vmin, vmax, cmap='RdBu', xlabel='Distance'):
+    """Input: List of sections as (x, depth, velocity) tuples with velocity shape (x, depth), list of image files, list of titles, colour limits, colour map, label of the x axis
+    Function purpose: Render a chunk of sections with the headless Agg backend. One figure, axes, and colorbar are created for the chunk and reused for every frame: the velocity mesh is updated in place when the section shape is unchanged, and replaced otherwise. This is the unit of work of a single process in render_sections()
+    Return: List of written image files"""
+    
+    #Import modules
+    import numpy as np
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    #Figure, axes, and colorbar shared by all frames
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.08, 0.1, 0.78, 0.8])
+    cax = fig.add_axes([0.88, 0.1, 0.025, 0.8])
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Depth')
+    mesh = None
+    mesh_x = mesh_depth = None
+    colorbar = None
+    
+    for (x, depth, values), filename, title in zip(sections, filenames, titles):
+        if mesh is not None and np.array_equal(x, mesh_x) and np.array_equal(depth, mesh_depth):
+            #Same geometry, only update the velocity
+            mesh.set_array(values.T)
+        else:
+            if mesh is not None:
+                mesh.remove()
+            mesh = ax.pcolormesh(x, depth, values.T, shading='nearest', cmap=cmap, vmin=vmin, vmax=vmax)
+            mesh_x, mesh_depth = x, depth
+            ax.set(xlim=(min(x), max(x)), ylim=(min(depth), max(depth)))
+            if colorbar is None:
+                colorbar = fig.colorbar(mesh, cax=cax)
+                colorbar.ax.set_ylabel('Shear wave (km/s)')
+            else:
+                colorbar.update_normal(mesh)
+        ax.set_title(title)
+        
+        #Fixed metadata and SVG ids keep the output byte-identical between runs
+        with matplotlib.rc_context({'svg.hashsalt': 'section'}):
+            fig.savefig(filename, metadata={'Software': None} if filename.endswith('.png') else {'Date': None})
+    
+    return list(filenames)
+
+@instrument
+def render_sections(sections, output_dir, titles=None, fmt='png', workers=None, cmap='RdBu', xlabel='Distance'):
+    """Input: List of sections as (x, depth, velocity) tuples with velocity shape (x, depth), for example from cross_section() or VelocityVolume.north_south_section(), output directory, optional list of titles, image format ('png' or 'svg'), optional number of worker processes, colour map, label of the x axis
+    Function purpose: Render many sections to image files without a display. All frames share one colour scale so they can be compared. When workers is given, the sections are split into chunks that are rendered in a process pool. The output files are deterministic, so they can be compared with reference images
+    Return: List of written image files in the order of the sections"""
+    
+    #Import modules
+    import os
+    import numpy as np
+    
+    #Exception handling
+    if fmt not in ['png', 'svg']:
+        raise Exception("Image format should be either 'png' or 'svg'")
+    if titles is None:
+        titles = ['Section %d' % i for i in range(len(sections))]
+    if len(titles) != len(sections):
+        raise Exception("Number of titles does not match the number of sections")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    sections = [(np.asarray(x), np.asarray(depth), np.asarray(values)) for x, depth, values in sections]
+    filenames = [os.path.join(output_dir, 'section_%04d.%s' % (i, fmt)) for i in range(len(sections))]
+    
+    #Common colour scale of all frames
+    vmin = min(np.nanmin(values) for _, _, values in sections)
+    vmax = max(np.nanmax(values) for _, _, values in sections)
+    
+    if workers is None or workers == 1 or len(sections) < 2:
+        return render_section_chunk(sections, filenames, titles, vmin, vmax, cmap, xlabel)
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    #Render chunks in parallel, map keeps the order of the chunks
+    chunks = split_chunks(list(range(len(sections))), workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(render_section_chunk, 
+                               [[sections[i] for i in chunk] for chunk in chunks], 
+                               [[filenames[i] for i in chunk] for chunk in chunks], 
+                               [[titles[i] for i in chunk] for chunk in chunks], 
+                               [vmin] * len(chunks), [vmax] * len(chunks), 
+                               [cmap] * len(chunks), [xlabel] * len(chunks))
+        written = [filename for chunk_files in results for filename in chunk_files]
+    
+    return written
+
+@instrument
+def isovelocity_contourmap(lat_axis, lon_axis, raster, velocities, output_dir, levels=20, fmt='png', cmap='viridis_r'):
+    """Input: Latitude axis, longitude axis, 3D numpy array of iso-depth raster from isodepth_raster(), list of velocity values of the raster, output directory, number of contour levels, image format, colour map
+    Function purpose: Render the filled depth contour map of every velocity with the headless Agg backend. All maps share the raster grid, and one figure with its axes is reused for the whole family of maps
+    Return: List of written image files"""
+    
+    #Import modules
+    import os
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    #Exception handling
+    if len(velocities) != len(raster):
+        raise Exception("Number of velocities does not match the number of rasters")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    #One figure for the whole family of maps
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.1, 0.1, 0.72, 0.8])
+    cax = fig.add_axes([0.85, 0.1, 0.03, 0.8])
+    
+    written = []
+    for velocity, depth_map in zip(velocities, raster):
+        ax.clear()
+        cax.clear()
+        
+        #Depth contour of one velocity
+        contour = ax.contourf(lon_axis, lat_axis, depth_map, levels=levels, cmap=cmap)
+        fig.colorbar(contour, cax=cax).ax.set_ylabel('Depth (m)')
+        ax.set_xlabel('Longitude')
+        ax.set_ylabel('Latitude')
+        ax.set_title('Depth of Vs = %s km/s' % velocity)
+        
+        filename = os.path.join(output_dir, 'isovelocity_%s.%s' % (velocity, fmt))
+        fig.savefig(filename)
+        written.append(filename)
+    
+    return written
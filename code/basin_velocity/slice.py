@@ -0,0 +1,266 @@
+from .monitoring import instrument
+from .dataset import CompactDataset, parameter_list
+from .grid import nearest_index, VelocityVolume, SparseVolume, VolumePyramid, ChunkedVolumeStore
+
+@instrument
+def northeast_southwest_slice(array, dataframe):
+    """Input: Velocity dataset in the form of numpy array (or CompactDataset) and pandas dataframe
+    Function purpose: Subset the velocity dataframe to create new dataframe with data only from northeast-southwest coordinates to make visualization-ready dataset
+    Return: New pandas dataframe that store data in northeast-southwest line"""
+            
+    #Import module    
+    import numpy as np
+    import pandas as pd
+    
+    #Raise exception, a compact dataset gives its axes from the site table
+    if not isinstance(array, CompactDataset):
+        if type(array) != np.ndarray and type(dataframe) != pd.core.frame.DataFrame:
+            raise TypeError("Invalid type of input")
+        if array.shape[1] < 4:
+            raise Exception("Insufficient data size to convert to Pandas DataFrame")
+        elif array.shape[1] > 4:
+            raise Exception("Data size exceeding the required size to convert to Pandas DataFrame")  
+    if len(dataframe.columns) != 4:
+        raise Exception("Dataframe has no suitable shape for generate sliced dataset")
+    
+    lat_val, lon_val, d_val = parameter_list(array)
+    
+    #Pair the coordinate combination for NE-SW diagonal plot
+    if len(lat_val) == len(lon_val):
+        nesw = np.stack((lat_val, lon_val), axis=1)
+    elif len(lat_val) > len(lon_val):
+        residue = len(lat_val) - len(lon_val)
+        nesw = np.stack((lat_val[:-residue], lon_val), axis=1)
+    else:
+        residue = len(lon_val) - len(lat_val)
+        nesw = np.stack((lat_val, lon_val[:-residue]), axis=1)
+    
+    #Convert 2D numpy array of coordinate pair into dataframe
+    nesw_coordinate = pd.DataFrame(nesw, columns=['Latitude', 'Longitude'])   
+    
+    #Subset vs_database from northeast-southwest coordinate
+    keys = list(nesw_coordinate.columns.values)
+    i1 = dataframe.set_index(keys).index
+    i2 = nesw_coordinate.set_index(keys).index
+    nesw_df = dataframe[i1.isin(i2)]
+    
+    #Drop null value from the database
+    nesw_dataframe = nesw_df.dropna()
+    
+    return nesw_dataframe
+
+@instrument
+def northwest_southeast_slice(array, dataframe):
+    """Input: Velocity dataset in the form of numpy array (or CompactDataset) and pandas dataframe
+    Function purpose: Subset the velocity dataframe to create new dataframe with data only from northwest-southeast coordinates to make visualization-ready dataset
+    Return: New pandas dataframe that store data in northwest-southeast line"""
+            
+    #Import modules
+    import numpy as np
+    import pandas as pd
+        
+    #Raise exception, a compact dataset gives its axes from the site table
+    if not isinstance(array, CompactDataset):
+        if type(array) != np.ndarray and type(dataframe) != pd.core.frame.DataFrame:
+            raise TypeError("Invalid type of input")
+        if array.shape[1] < 4:
+            raise Exception("Insufficient data size to convert to Pandas DataFrame")
+        elif array.shape[1] > 4:
+            raise Exception("Data size exceeding the required size to convert to Pandas DataFrame")
+    
+    if len(dataframe.columns) != 4:
+        raise Exception("Dataframe has no suitable shape for generate sliced dataset")
+
+    lat_val, lon_val, d_val = parameter_list(array)
+    
+    #Create flipped lat_val
+    flipped_lat = np.flip(lat_val)
+    
+    #Pair the coordinate combination for NW-SE diagonal plot
+    if len(flipped_lat) == len(lon_val):
+        nwse = np.stack((flipped_lat, lon_val), axis=1)
+    elif len(flipped_lat) > len(lon_val):
+        res = len(flipped_lat) - len(lon_val)
+        nwse = np.stack((flipped_lat[:-res], lon_val), axis=1)
+    else:
+        res = len(lon_val) - len(flipped_lat)
+        nwse = np.stack((flipped_lat, lon_val[:-res]), axis=1)
+        
+    #Convert 2D numpy array of coordinate pair into dataframe
+    nwse_coordinate = pd.DataFrame(nwse, columns=['Latitude', 'Longitude'])   
+        
+    #Subset vs_database from northeast-southwest coordinate
+    keys = list(nwse_coordinate.columns.values)
+    i1 = dataframe.set_index(keys).index
+    i2 = nwse_coordinate.set_index(keys).index
+    nwse_df = dataframe[i1.isin(i2)]
+    
+    #Drop rows with null Vs
+    nwse_dataframe = nwse_df.dropna()
+        
+    return nwse_dataframe
+
+@instrument
+def north_south_slice(dataframe, long, tolerance=None, resolution=None):
+    """Input: Pandas DataFrame, VelocityVolume, SparseVolume, or VolumePyramid of velocity dataset, longitude value from velocity dataset, optional tolerance of the nearest grid longitude, number of latitudes needed from a VolumePyramid
+    Function purpose: Build new Pandas DataFrame for visualization of north-south cross section at constant longitude that are available from the database. A VelocityVolume is sliced by the index of the nearest grid longitude, so only the rows of the section are touched, and a SparseVolume only reads the occupied columns of the section. A VolumePyramid is sliced at its coarsest level with enough latitudes
+    Return: Pandas DataFrame of north-south direction"""
+    
+    #Import modules
+    import numpy as np
+    import pandas as pd
+    
+    #Pick the level of the pyramid
+    if isinstance(dataframe, VolumePyramid):
+        dataframe = dataframe.level_for(resolution if resolution is not None else np.inf)
+    
+    #Slice the occupied columns of a sparse grid only
+    if isinstance(dataframe, SparseVolume):
+        lon_index = nearest_index(dataframe.longitude, long, tolerance)
+        lat_index = np.flatnonzero(dataframe.mask[:, lon_index])
+        return dataframe.columns_dataframe(lat_index, np.full(len(lat_index), lon_index))
+    
+    #Slice the grid by axis index
+    if isinstance(dataframe, VelocityVolume):
+        lon_index = nearest_index(dataframe.longitude, long, tolerance)
+        lat_index = np.arange(len(dataframe.latitude))
+        return dataframe.columns_dataframe(lat_index, np.full(len(lat_index), lon_index))
+    
+    #Exception handling
+    if type(dataframe) != pd.core.frame.DataFrame:
+        raise TypeError("Invalid type of dataset")
+    if len(dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for generate sliced dataset")  
+    if type(long) is str:
+        raise Exception("Number input of longitude is required!")
+    
+    #Subset dataframe in desired constant longitude
+    north_south_df = dataframe[dataframe['Longitude'] == long]
+    north_south_dataframe = north_south_df.dropna()
+    
+    return north_south_dataframe
+
+@instrument
+def east_west_slice(dataframe, lat, tolerance=None, resolution=None):
+    """Input: Pandas DataFrame, VelocityVolume, SparseVolume, or VolumePyramid of velocity dataset, latitude value from velocity dataset, optional tolerance of the nearest grid latitude, number of longitudes needed from a VolumePyramid
+    Function purpose: Build new Pandas DataFrame for visualization of east-west cross section at constant latitude that are available from the database. A VelocityVolume is sliced by the index of the nearest grid latitude, so only the rows of the section are touched, and a SparseVolume only reads the occupied columns of the section. A VolumePyramid is sliced at its coarsest level with enough longitudes
+    Return: Pandas DataFrame of east-west direction"""
+    
+    #Import modules
+    import numpy as np
+    import pandas as pd
+    
+    #Pick the level of the pyramid
+    if isinstance(dataframe, VolumePyramid):
+        dataframe = dataframe.level_for(resolution if resolution is not None else np.inf)
+    
+    #Slice the occupied columns of a sparse grid only
+    if isinstance(dataframe, SparseVolume):
+        lat_index = nearest_index(dataframe.latitude, lat, tolerance)
+        lon_index = np.flatnonzero(dataframe.mask[lat_index])
+        return dataframe.columns_dataframe(np.full(len(lon_index), lat_index), lon_index)
+    
+    #Slice the grid by axis index
+    if isinstance(dataframe, VelocityVolume):
+        lat_index = nearest_index(dataframe.latitude, lat, tolerance)
+        lon_index = np.arange(len(dataframe.longitude))
+        return dataframe.columns_dataframe(np.full(len(lon_index), lat_index), lon_index)
+    
+    #Exception handling
+    if type(dataframe) != pd.core.frame.DataFrame:
+        raise TypeError("Invalid type of dataset")
+    if len(dataframe.columns) != 4:
+        raise Exception("Input dataframe has no suitable shape for generate sliced dataset")   
+    if type(lat) is str:
+        raise Exception("Number input of latitude is required!")
+    
+    #Subset dataframe in desired constant longitude
+    east_west_df = dataframe[dataframe['Latitude'] == lat]
+    east_west_dataframe = east_west_df.dropna()
+    
+    return east_west_dataframe
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Input: Latitude and longitude of two points or arrays of points, in degrees
+    Function purpose: Compute great-circle distance on a spherical Earth
+    Return: Distance in kilometres"""
+    
+    #Import module
+    import numpy as np
+    
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+@instrument
+def polyline_section(volume, points, spacing):
+    """Input: VelocityVolume, SparseVolume, or ChunkedVolumeStore, list of (latitude, longitude) vertices of the section line, sample spacing in kilometres
+    Function purpose: Build a cross section along any line or polyline (fence diagram). Sample points are placed at a constant distance along the line, and the velocity of every depth is bilinearly interpolated from the four surrounding grid columns in one vectorized step. Samples outside the grid or next to empty grid nodes are NaN
+    Return: Latitude, longitude, and distance along the line of the samples, and 2D numpy array of velocity with shape (samples, depth)"""
+    
+    #Import module
+    import numpy as np
+    
+    #Exception handling
+    if not isinstance(volume, (VelocityVolume, SparseVolume, ChunkedVolumeStore)):
+        raise TypeError("Input must be a VelocityVolume, SparseVolume, or ChunkedVolumeStore")
+    points = np.asarray(points, dtype=float)
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2:
+        raise Exception("Section line requires at least two (latitude, longitude) points")
+    if not spacing > 0:
+        raise Exception("Sample spacing must be positive")
+    if len(volume.latitude) < 2 or len(volume.longitude) < 2:
+        raise Exception("Velocity grid requires at least two latitudes and longitudes to interpolate")
+    
+    #Distance of every vertex along the line
+    segment = haversine_distance(points[:-1,0], points[:-1,1], points[1:,0], points[1:,1])
+    vertex_distance = np.concatenate(([0.0], np.cumsum(segment)))
+    
+    #Sample points at constant spacing, including the end of the line
+    distance = np.arange(0.0, vertex_distance[-1], spacing)
+    distance = np.append(distance, vertex_distance[-1])
+    sample_lat = np.interp(distance, vertex_distance, points[:,0])
+    sample_lon = np.interp(distance, vertex_distance, points[:,1])
+    
+    #Lower grid index and fractional position of every sample
+    lat_axis = volume.latitude
+    lon_axis = volume.longitude
+    i = np.clip(np.searchsorted(lat_axis, sample_lat) - 1, 0, len(lat_axis) - 2)
+    j = np.clip(np.searchsorted(lon_axis, sample_lon) - 1, 0, len(lon_axis) - 2)
+    t = ((sample_lat - lat_axis[i]) / (lat_axis[i + 1] - lat_axis[i]))[:, None]
+    u = ((sample_lon - lon_axis[j]) / (lon_axis[j + 1] - lon_axis[j]))[:, None]
+    
+    #Bilinear interpolation of all depths at once
+    section = ((1 - t) * (1 - u) * volume.columns(i, j) + (1 - t) * u * volume.columns(i, j + 1)
+               + t * (1 - u) * volume.columns(i + 1, j) + t * u * volume.columns(i + 1, j + 1))
+    
+    #Samples outside the grid have no velocity
+    outside = (t[:,0] < 0) | (t[:,0] > 1) | (u[:,0] < 0) | (u[:,0] > 1)
+    section[outside] = np.nan
+    
+    return sample_lat, sample_lon, distance, section
+
+def cross_section(volume, start, end, spacing):
+    """Input: VelocityVolume, SparseVolume, or ChunkedVolumeStore, (latitude, longitude) of the start and end of the section, sample spacing in kilometres
+    Function purpose: Build a straight cross section at any azimuth between two points through polyline_section()
+    Return: Latitude, longitude, and distance along the line of the samples, and 2D numpy array of velocity with shape (samples, depth)"""
+    
+    return polyline_section(volume, [start, end], spacing)
+
+def section_dataframe(sample_lat, sample_lon, depth, section):
+    """Input: Latitude and longitude of the section samples, depth axis, 2D numpy array of section velocity with shape (samples, depth)
+    Function purpose: Arrange the section from cross_section() or polyline_section() into the DataFrame layout of the other slice functions, so it can be passed to the plot functions. NaN samples are dropped
+    Return: Pandas DataFrame with latitude, longitude, depth, and velocity columns"""
+    
+    #Import modules
+    import numpy as np
+    import pandas as pd
+    
+    vel = section.reshape(-1)
+    filled = ~np.isnan(vel)
+    
+    return pd.DataFrame({'Latitude': np.repeat(sample_lat, len(depth))[filled],
+                         'Longitude': np.repeat(sample_lon, len(depth))[filled],
+                         'Depth': np.tile(depth, len(sample_lat))[filled],
+                         'Vs': vel[filled]})
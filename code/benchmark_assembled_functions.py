@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+if __package__:
+    from .basin_velocity import *
+else:
+    from basin_velocity import *
+
+def synthetic_basin(directory, sites, depth_step=0.05, max_depth=3.0, seed=0):
+    """Input: Folder of the site files, number of sites, depth interval and maximum depth of the profiles in kilometres, seed of the random generator
+    Function purpose: Write artificial .dat site profiles of a sedimentary basin in the format read by import_file(). The sites lie on a regular latitude-longitude grid inside an irregular lobed outline. The sediment velocity increases with depth, with a low-velocity inversion layer and lateral variation, above a faster basement whose depth follows the basin shape
+    Return: List of written filenames"""
+    
+    #Import module
+    import numpy as np
+    
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    
+    #Irregular outline in polar form, with its area fraction of the bounding square
+    theta = np.linspace(0, 2 * np.pi, 721)
+    outline = lambda angle: 0.75 + 0.15 * np.sin(3 * angle + 0.4) + 0.08 * np.cos(5 * angle)
+    area_fraction = np.mean(outline(theta)**2) * np.pi / 4
+    
+    #Grid size that places the requested number of sites inside the outline
+    size = int(np.ceil(np.sqrt(sites / area_fraction))) + 2
+    row, column = np.divmod(np.arange(size * size), size)
+    x, y = (column - (size - 1) / 2) * 2 / size, (row - (size - 1) / 2) * 2 / size
+    radius = np.hypot(x, y) / outline(np.arctan2(y, x))
+    inside = np.flatnonzero(radius < 1)[:sites]
+    
+    #Basin centred on Jakarta with 0.01 degree grid spacing
+    lat = -6.2 + (row[inside] - size // 2) * 0.01
+    lon = 106.8 + (column[inside] - size // 2) * 0.01
+    basement = 0.3 + (max_depth * 0.8 - 0.3) * (1 - radius[inside]**2)
+    
+    depth = np.round(np.arange(0, max_depth + depth_step / 2, depth_step), 6)
+    filenames = []
+    for i in range(len(inside)):
+        gradient = 0.5 + 0.2 * rng.random()
+        vel = 0.15 + gradient * depth + 0.01 * rng.standard_normal(len(depth))
+        
+        #Low-velocity inversion layer in the upper sediment
+        top = 0.3 * basement[i]
+        vel -= 0.1 * ((depth > top) & (depth < top + 0.2))
+        
+        #Basement below the sediment
+        vel = np.where(depth > basement[i], 2.5 + 0.1 * depth, vel)
+        
+        filename = os.path.join(directory, "site_%06d.dat" % i)
+        np.savetxt(filename, np.stack((depth, vel), axis=1), fmt="%.3f", header="%.5f %.5f" % (lon[i], lat[i]), comments="")
+        filenames.append(filename)
+    
+    return filenames
+
+def legacy_import_file(filenames):
+    """Input: List of .dat or .txt files
+    Function purpose: Reference copy of the previous import_file(), which read every file four times with numpy.genfromtxt, to measure the speedup of the single-pass reader on the same files
+    Return: 2D numpy array of latitude, longitude, depth, and velocity"""
+    
+    #Import module
+    import numpy as np
+    
+    vs_array_list = []
+    for file in filenames:
+        #Four reads of a single .dat file
+        vs_velarray = np.genfromtxt(file, skip_header=1, usecols=1)
+        vs_darray = np.negative(np.genfromtxt(file, skip_header=1, usecols=0))
+        vs_lat = np.genfromtxt(file, usecols=1, max_rows=1)
+        vs_lon = np.genfromtxt(file, usecols=0, max_rows=1)
+        
+        vs_array_list.append(np.stack((np.full(len(vs_darray), vs_lat), 
+                                       np.full(len(vs_darray), vs_lon), 
+                                       vs_darray, 
+                                       vs_velarray), 
+                                      axis=1))
+    
+    return np.concatenate(vs_array_list)
+
+def measure(function, *args, memory=True, **kwargs):
+    """Input: Function of a stage with its arguments, whether to record the peak of allocated memory
+    Function purpose: Time one call of the stage, then repeat it under tracemalloc to record its peak memory, so tracing does not inflate the time
+    Return: Result of the timed call and dictionary of seconds and peak bytes"""
+    
+    #Import module
+    import matplotlib.pyplot as plt
+    
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    record = {'seconds': time.perf_counter() - start}
+    plt.close('all')
+    
+    if memory:
+        tracemalloc.start()
+        function(*args, **kwargs)
+        record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        plt.close('all')
+    
+    return result, record
+
+def run_benchmark(sites, directory, memory=True, workers=None, max_points=None, plots=True, compare_legacy=False):
+    """Input: Number of sites, folder of the synthetic files, whether to record peak memory, number of import workers, number of points of the 3D scatterplots, whether to run the plot stages, whether to also run the previous four-genfromtxt reader
+    Function purpose: Generate a synthetic basin and run every stage of the pipeline on it: importing, list making, DataFrame building, slicing, plotting, and isovelocity. With compare_legacy, legacy_import_file() reads the same files, its array is checked against import_file(), and the ratio of their times is reported as the import speedup
+    Return: Dictionary of dataset size, of the time and memory of every stage, and optionally of the import speedup"""
+    
+    #Import modules
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    
+    filenames = synthetic_basin(directory, sites)
+    stages = {}
+    
+    array, stages['import_file'] = measure(import_file, filenames, memory=memory, workers=workers)
+    if compare_legacy:
+        legacy_array, stages['legacy_import_file'] = measure(legacy_import_file, filenames, memory=memory)
+        if not np.array_equal(legacy_array, array):
+            raise Exception("The legacy reader returns different array")
+        del legacy_array
+    (lat_val, lon_val, d_val), stages['parameter_list'] = measure(parameter_list, array, memory=memory)
+    dataframe, stages['plotly_friendly_dataframe'] = measure(plotly_friendly_dataframe, array, memory=memory)
+    
+    #Slices through the middle of the basin
+    long, lat = lon_val[len(lon_val) // 2], lat_val[len(lat_val) // 2]
+    nesw, stages['northeast_southwest_slice'] = measure(northeast_southwest_slice, array, dataframe, memory=memory)
+    nwse, stages['northwest_southeast_slice'] = measure(northwest_southeast_slice, array, dataframe, memory=memory)
+    north_south, stages['north_south_slice'] = measure(north_south_slice, dataframe, long, memory=memory)
+    east_west, stages['east_west_slice'] = measure(east_west_slice, dataframe, lat, memory=memory)
+    
+    if plots:
+        image = lambda name: os.path.join(directory, name + ".png")
+        stages['basin_scatterplot'] = measure(basin_scatterplot, array, max_points, memory=memory)[1]
+        stages['slice_scatterplot'] = measure(slice_scatterplot, north_south, image('slice'), max_points, memory=memory)[1]
+        stages['northeast_southwest_contourplot'] = measure(northeast_southwest_contourplot, nesw, image('nesw'), memory=memory)[1]
+        stages['northwest_southeast_contourplot'] = measure(northwest_southeast_contourplot, nwse, image('nwse'), memory=memory)[1]
+        stages['latitudinal_longitudinal_contourplot'] = measure(latitudinal_longitudinal_contourplot, north_south, 'Latitude', image('north_south'), memory=memory)[1]
+    
+    stages['isovelocity'] = measure(isovelocity, filenames, 1.0, memory=memory, workers=workers)[1]
+    
+    run = {'sites': len(filenames),
+           'depths': len(d_val),
+           'rows': len(array),
+           'grid_rows': len(dataframe),
+           'stages': stages}
+    if compare_legacy:
+        run['import_speedup'] = stages['legacy_import_file']['seconds'] / stages['import_file']['seconds']
+    
+    return run
+
+def main(argv=None):
+    """Input: Optional list of command line arguments
+    Function purpose: Run the benchmark at every requested number of sites and write the results with the environment to a JSON file
+    Return: Dictionary of the written results"""
+    
+    #Import modules
+    import numpy as np
+    import pandas as pd
+    import matplotlib
+    
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the basin pipeline on synthetic site files")
+    parser.add_argument('--sites', type=int, nargs='+', default=[100, 1000, 10000], help="numbers of sites, for example 100 1000 10000 100000")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file of the results")
+    parser.add_argument('--directory', default=None, help="folder of the synthetic files, a temporary folder by default")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes of import_file() and isovelocity()")
+    parser.add_argument('--max-points', type=int, default=None, help="level of detail of the 3D scatterplots")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run of every stage")
+    parser.add_argument('--no-plots', action='store_true', help="skip the plot stages")
+    parser.add_argument('--compare-legacy', action='store_true', help="also run the previous four-genfromtxt reader and report the import speedup")
+    args = parser.parse_args(argv)
+    
+    results = {'environment': {'python': platform.python_version(),
+                               'platform': platform.platform(),
+                               'cpu_count': os.cpu_count(),
+                               'numpy': np.__version__,
+                               'pandas': pd.__version__,
+                               'matplotlib': matplotlib.__version__,
+                               'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')},
+               'settings': {'workers': args.workers, 'max_points': args.max_points, 'compare_legacy': args.compare_legacy},
+               'runs': []}
+    
+    for sites in args.sites:
+        with tempfile.TemporaryDirectory() as temporary:
+            directory = os.path.join(args.directory, str(sites)) if args.directory else temporary
+            run = run_benchmark(sites, directory, not args.no_memory, args.workers, args.max_points, not args.no_plots, args.compare_legacy)
+        results['runs'].append(run)
+        print("%d sites: %s" % (run['sites'], ", ".join("%s %.3f s" % (name, stage['seconds']) for name, stage in run['stages'].items())), file=sys.stderr)
+        if args.compare_legacy:
+            print("%d sites: import speedup %.1fx" % (run['sites'], run['import_speedup']), file=sys.stderr)
+    
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,18 @@ import pandas
 
 from src.assembled_functions import *
 
+def write_site_files(directory, sites, name="site_%03d.dat"):
+    """Write artificial .dat site files with longitude-latitude header into a tmp_path folder from a list of (longitude, latitude, depth, velocity), and return the list of filenames"""
+    import numpy as np
+    
+    filenames = []
+    for i, (lon, lat, depth, vel) in enumerate(sites):
+        filename = str(directory / (name % i))
+        np.savetxt(filename, np.stack((depth, vel), axis=1), header="%f %f" % (lon, lat), comments="")
+        filenames.append(filename)
+    
+    return filenames
+
 def test_project_documentation(expected_type=str):
     """Test the type of documentation for this project. Expect string as the documentation type"""
     
@@ -28,6 +40,70 @@ def test_import_file(expected_type = numpy.ndarray, expected_columns = 4):
     assert array_from_import.shape[1] == expected_columns, "***The function returns unexpected number of columns of array"
 
 
+def test_read_profile(tmp_path, expected_columns=2):
+    """Test the single-pass reader against the previous four genfromtxt calls on an artificial site file"""
+    import numpy as np
+    
+    #Write artificial site file with longitude-latitude header
+    depth = np.linspace(0, 3, 31)
+    vel = np.linspace(0.2, 2.5, 31)
+    test_file = tmp_path / "site.dat"
+    np.savetxt(test_file, np.stack((depth, vel), axis=1), header="106.85 -6.21", comments="")
+    
+    vs_lat, vs_lon, profile = read_profile(str(test_file))
+    
+    assert profile.shape[1] == expected_columns, "***The function returns unexpected number of columns of array"
+    assert vs_lat == np.genfromtxt(test_file, usecols=1, max_rows=1), "***The function reads different latitude"
+    assert vs_lon == np.genfromtxt(test_file, usecols=0, max_rows=1), "***The function reads different longitude"
+    assert np.array_equal(profile[:,0], np.genfromtxt(test_file, skip_header=1, usecols=0)), "***The function reads different depth"
+    assert np.array_equal(profile[:,1], np.genfromtxt(test_file, skip_header=1, usecols=1)), "***The function reads different velocity"
+
+def test_import_file_workers(tmp_path):
+    """Test that the parallel import and isovelocity return the same rows in the same order as the serial iteration"""
+    import numpy as np
+    
+    #Write artificial site files with longitude-latitude header
+    files_test = write_site_files(tmp_path, [(106 + i, -6 - i, np.linspace(0, 3, 10 + i), np.linspace(0.2, 2.5, 10 + i)) for i in range(9)])
+    
+    assert np.array_equal(import_file(files_test), import_file(files_test, workers=2)), "***The parallel import returns different array"
+    assert np.array_equal(isovelocity(files_test, 1.0), isovelocity(files_test, 1.0, workers=2)), "***The parallel isovelocity returns different array"
+
+def test_cached_import_file(tmp_path, expected_type=numpy.ndarray):
+    """Test that the cached import returns the same array as import_file after first import, unchanged files, and a modified file"""
+    import os
+    import numpy as np
+    
+    #Write artificial site files with longitude-latitude header
+    files_test = write_site_files(tmp_path, [(106 + i, -6 - i, np.linspace(0, 3, 10 + i), np.linspace(0.2, 2.5, 10 + i)) for i in range(5)])
+    cache_dir = str(tmp_path / "cache")
+    
+    first_array = cached_import_file(files_test, cache_dir)
+    second_array = cached_import_file(files_test, cache_dir)
+    
+    assert type(second_array) == expected_type, "***The function returns different data type"
+    assert np.array_equal(first_array, import_file(files_test)), "***The first import returns different array"
+    assert np.array_equal(second_array, import_file(files_test)), "***The cached import returns different array"
+    
+    #Modify one file and add a new one
+    np.savetxt(files_test[2], np.array([[0.0, 0.3], [1.0, 0.9]]), header="110.0 -7.0", comments="")
+    os.utime(files_test[2], ns=(0, 0))
+    files_test += write_site_files(tmp_path, [(111.0, -8.0, np.array([0.0, 2.0]), np.array([0.5, 1.5]))], "site_new_%d.dat")
+    
+    updated_array = cached_import_file(files_test, cache_dir)
+    
+    assert np.array_equal(updated_array, import_file(files_test)), "***The incremental update returns different array"
+    assert sorted(os.listdir(cache_dir)) == ["velocity_dataset.npy", "velocity_manifest.json"], "***The update leaves temporary files in the cache"
+
+    #The cached array is read-only unless a writable copy is requested
+    try:
+        updated_array[0, 3] = 0.0
+        assert False, "***The memory-mapped cache can be modified"
+    except ValueError:
+        pass
+    writable_array = cached_import_file(files_test, cache_dir, writable=True)
+    writable_array[0, 3] = 0.0
+    assert cached_import_file(files_test, cache_dir)[0, 3] != 0.0, "***The writable copy modifies the cache"
+
 def test_parameter_list(expected_type=tuple, expected_total_lists=3):
     """ """
     #Create simple artifical dataset for testing
@@ -94,6 +170,63 @@ def test_plotly_friendly_dataframe(expected_type=pandas.core.frame.DataFrame, ex
     assert type(test_dataframe) == expected_type, "***The function is not producing DataFrame"
     assert test_dataframe.shape[1] == expected_columns, "***The function is unable to return four columns"
     
+def test_velocity_volume(expected_shape=(20, 10, 15)):
+    
+    #Create simple artifical dataset for testing
+    import numpy as np
+
+    x = np.linspace(0, 10, 10)
+    y = np.linspace(0, 10, 20)
+    z = np.linspace(0, 10, 15)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = np.random.rand(20, 10, 15)
+
+    test_array = np.stack((yi.flatten(), 
+                           xi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    #Remove one site to leave empty grid nodes
+    test_array = test_array[(test_array[:,0] != y[3]) | (test_array[:,1] != x[4])]
+    test_volume = VelocityVolume.from_array(test_array)
+    
+    assert test_volume.shape == expected_shape, "***The function returns grid with unexpected shape"
+    assert np.isnan(test_volume.values[3, 4]).all(), "***The empty grid nodes are not filled with NaN"
+    assert np.array_equal(test_volume.values[0, 0], val[0, 0]), "***The grid does not store the velocity of the dataset"
+    assert len(test_volume.dataframe) == test_volume.values.size, "***The DataFrame does not have one row per grid node"
+
+    #Repeated coordinates keep the velocity of their first row
+    repeated_array = np.concatenate((test_array, test_array[::2] + [0, 0, 0, 1]))
+    assert np.array_equal(VelocityVolume.from_array(repeated_array).values, test_volume.values, equal_nan=True), "***A repeated coordinate does not keep the first velocity"
+
+def test_grid_profiles():
+    #Create artificial irregular sites with linear velocity for testing
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    lat = -6.4 + 0.3 * rng.random(60)
+    lon = 106.6 + 0.4 * rng.random(60)
+    z = np.linspace(-3, 0, 10)
+    
+    test_array = np.concatenate([np.stack((np.full(len(z), la), 
+                                           np.full(len(z), lo), 
+                                           z, 
+                                           2 * la + 3 * lo - z), 
+                                          axis=1) for la, lo in zip(lat, lon)])
+    
+    sites, d_value, profiles = site_profiles(test_array)
+    assert profiles.shape == (60, 10), "***The site table has unexpected shape"
+    
+    for method in ['nearest', 'idw', 'linear']:
+        test_volume = grid_profiles(test_array, 0.02, method, chunk_size=50, workers=2)
+        assert test_volume.shape[2] == len(z), "***The gridded volume does not keep the depth axis"
+    
+    #Linear interpolation reproduces linear velocity inside the site hull
+    lat_grid, lon_grid, d_grid = np.meshgrid(test_volume.latitude, test_volume.longitude, test_volume.depth, indexing='ij')
+    inside = ~np.isnan(test_volume.values)
+    assert np.allclose(test_volume.values[inside], (2 * lat_grid + 3 * lon_grid - d_grid)[inside]), "***The linear gridding does not reproduce linear velocity"
+    
 def test_northeast_southwest_slice(expected_type=pandas.core.frame.DataFrame, expected_columns=4):
     
     #Create simple artifical dataset for testing
@@ -195,6 +328,68 @@ def test_north_south_slice(expected_type=pandas.core.frame.DataFrame, expected_c
     assert len(pd.unique(test_dataframe['Depth'])) == len(pd.unique(test_ns_database['Depth'])), "***The function returns slice dataframe that reach all depth"
     assert len(test_ns_database['Longitude'].unique()) == 1, "***The returned DataFrame has no constant latitude value"
 
+def test_nearest_index(expected_index=5):
+    import numpy as np
+    
+    axis = np.linspace(0, 10, 11)
+    
+    assert nearest_index(axis, 5.2) == expected_index, "***The function does not return the nearest index"
+    assert nearest_index(axis, 4.9, tolerance=0.2) == expected_index, "***The function does not return the nearest index within tolerance"
+    with pytest.raises(Exception):
+        nearest_index(axis, 5.4, tolerance=0.1)
+
+def test_volume_slice(expected_type=pandas.core.frame.DataFrame):
+    #Create simple artifical dataset for testing
+    import numpy as np
+
+    x = np.linspace(0, 10, 20)
+    y = np.linspace(0, 10, 10)
+    z = np.linspace(0, 10, 15)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = np.random.rand(10, 20, 15)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    test_volume = VelocityVolume.from_array(test_array)
+    test_dataframe = plotly_friendly_dataframe(test_array)
+    test_ns_database = north_south_slice(test_volume, np.unique(y)[5])
+    test_ew_database = east_west_slice(test_volume, np.unique(x)[5])
+    
+    assert type(test_ns_database) == expected_type, "***The function is not producing DataFrame"
+    assert np.array_equal(test_ns_database.to_numpy(), north_south_slice(test_dataframe, np.unique(y)[5]).to_numpy()), "***The grid slice differs from the DataFrame slice"
+    assert np.array_equal(test_ew_database.to_numpy(), east_west_slice(test_dataframe, np.unique(x)[5]).to_numpy()), "***The grid slice differs from the DataFrame slice"
+    assert np.shares_memory(test_volume.north_south_section(y[5]), test_volume.values), "***The section is not a view of the grid"
+    assert test_volume.north_south_sections().shape == (10, 20, 15), "***The batch of sections has unexpected shape"
+    
+def test_cross_section(expected_type=pandas.core.frame.DataFrame):
+    #Create simple artifical dataset with linear velocity for testing
+    import numpy as np
+
+    x = np.linspace(-6.4, -6.1, 20)
+    y = np.linspace(106.6, 107.0, 30)
+    z = np.linspace(-3, 0, 15)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = 2 * xi + 3 * yi - zi
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    test_volume = VelocityVolume.from_array(test_array)
+    sample_lat, sample_lon, distance, section = cross_section(test_volume, (-6.35, 106.65), (-6.15, 106.95), 1.0)
+    test_path_section = polyline_section(test_volume, [(-6.35, 106.65), (-6.2, 106.7), (-6.15, 106.95)], 0.5)[3]
+    
+    assert section.shape == (len(distance), len(z)), "***The section has unexpected shape"
+    assert np.allclose(section, 2 * sample_lat[:, None] + 3 * sample_lon[:, None] - z), "***The bilinear interpolation does not reproduce linear velocity"
+    assert not np.isnan(test_path_section).any(), "***The polyline section has samples outside the grid"
+    assert type(section_dataframe(sample_lat, sample_lon, z, section)) == expected_type, "***The function is not producing DataFrame"
+    
 def test_slice_scatterplot():
     #Create simple artifical dataset for testing
     import numpy as np
@@ -309,17 +504,620 @@ def test_isovelocity(expected_type = numpy.ndarray, expected_columns=3):
     
     assert type(isovel_array) == expected_type, "***The function returns different data type"
     assert isovel_array.shape[1] == expected_columns, "***The function returns unexpected number of columns of array"
+
+
+def test_isovelocity_table(expected_shape=(25, 3)):
+    #Create simple artifical dataset with velocity increasing with depth for testing
+    import numpy as np
+
+    x = np.linspace(0, 10, 5)
+    y = np.linspace(0, 10, 5)
+    z = np.linspace(-3, 0, 31)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = 0.2 - zi * (1 + 0.01 * xi)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
     
+    velocities = [0.5, 1.0, 2.5]
+    test_sites, test_table = isovelocity_table(test_array, velocities)
+    test_volume_table = isovelocity_table(VelocityVolume.from_array(test_array), velocities)[1]
     
+    #Depth of one site from numpy interpolation in metres
+    site_profile = test_array[(test_array[:,0] == test_sites[0, 0]) & (test_array[:,1] == test_sites[0, 1])]
+    expected_depth = np.interp(velocities, site_profile[::-1, 3], -site_profile[::-1, 2]) * 1000
     
+    assert test_table.shape == expected_shape, "***The function returns table with unexpected shape"
+    assert np.allclose(test_table[0], expected_depth), "***The function returns different depth from interpolation"
 
+    #Repeated depths keep the velocity of their first row
+    repeated_array = np.concatenate((test_array, test_array[::3] + [0, 0, 0, 1]))
+    assert np.array_equal(site_profiles(repeated_array)[2], site_profiles(test_array)[2]), "***A repeated depth does not keep the first velocity"
+    assert np.array_equal(isovelocity_table(repeated_array, velocities)[1], test_table, equal_nan=True), "***The table changes with repeated depths"
+    assert np.allclose(test_table, test_volume_table), "***The function returns different depth from VelocityVolume"
+
+
+def test_velocity_crossings():
+    #Create artificial profile with velocity inversion for testing
+    import numpy as np
     
+    depth = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    profiles = np.array([[0.5, 1.5, 0.5, 1.5, 2.5],
+                         [0.2, 0.4, 0.6, 0.8, 0.9]])
     
+    first_depth = velocity_crossings(depth, profiles, [1.0, 2.0])
+    site, velocity_index, all_depth = velocity_crossings(depth, profiles, [1.0], all_crossings=True)
     
+    assert np.allclose(first_depth[0], [0.5, 3.5]), "***The function does not return the first crossing of the inverted profile"
+    assert np.isnan(first_depth[1]).all(), "***The function returns depth for velocity that is never reached"
+    assert np.array_equal(site, [0, 0, 0]), "***The function does not return every crossing of the inverted profile"
+    assert np.allclose(all_depth, [0.5, 1.5, 2.5]), "***The function returns wrong depth of the crossings"
+
+
+def test_isodepth_raster(tmp_path, expected_maps=2):
+    #Create artificial irregular sites with linear iso-depth for testing
+    import os
+    import numpy as np
     
+    rng = np.random.default_rng(0)
+    sites = np.stack((-6.4 + 0.3 * rng.random(50), 106.6 + 0.4 * rng.random(50)), axis=1)
+    depths = np.stack((100 * sites[:,0] + 50 * sites[:,1], 200 * sites[:,0]), axis=1)
+    cache_file = str(tmp_path / "raster.npz")
     
+    lat_axis, lon_axis, raster = isodepth_raster(sites, depths, 0.02, cache_file=cache_file)
+    cached_raster = isodepth_raster(sites, depths, 0.02, cache_file=cache_file)[2]
+    lat_grid, lon_grid = np.meshgrid(lat_axis, lon_axis, indexing='ij')
+    inside = ~np.isnan(raster[0])
     
+    assert raster.shape == (2, len(lat_axis), len(lon_axis)), "***The raster has unexpected shape"
+    assert np.allclose(raster[0][inside], (100 * lat_grid + 50 * lon_grid)[inside]), "***The raster does not reproduce linear iso-depth"
+    assert np.array_equal(raster, cached_raster, equal_nan=True), "***The cached raster differs from the computed raster"
     
+    written = isovelocity_contourmap(lat_axis, lon_axis, raster, [1.0, 2.5], str(tmp_path / "maps"))
+    assert len(written) == expected_maps and all(os.path.exists(f) for f in written), "***The function does not write every contour map"
+
+
+def test_render_sections(tmp_path, expected_files=6):
+    #Create simple artifical dataset for testing
+    import os
+    import numpy as np
+
+    x = np.linspace(0, 10, 8)
+    y = np.linspace(0, 10, 6)
+    z = np.linspace(-3, 0, 10)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = np.random.rand(6, 8, 10)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    test_volume = VelocityVolume.from_array(test_array)
+    sections = [(test_volume.latitude, test_volume.depth, test_volume.north_south_section(lon)) for lon in test_volume.longitude]
+    
+    written = render_sections(sections, str(tmp_path / "serial"))
+    parallel_written = render_sections(sections, str(tmp_path / "parallel"), workers=2)
+    
+    assert len(written) == expected_files and all(os.path.exists(f) for f in written), "***The function does not write every section"
+    assert all(open(f, 'rb').read() == open(g, 'rb').read() for f, g in zip(written, parallel_written)), "***The parallel rendering is not identical to the serial rendering"
+    assert os.path.exists(latitudinal_longitudinal_contourplot(north_south_slice(test_volume, y[2]), 'Latitude', filename=str(tmp_path / "section.png"))), "***The contour plot is not saved to file"
+
+
+def test_slice_contourf():
+    #Create simple artifical slice for testing
+    import numpy as np
+    import matplotlib.pyplot as plt
+    from matplotlib.contour import QuadContourSet
+    from matplotlib.tri import TriContourSet
+    
+    xi, yi = np.meshgrid(np.linspace(0, 10, 20), np.linspace(-3, 0, 15))
+    x = xi.flatten()
+    y = yi.flatten()
+    z = np.random.rand(len(x))
+    
+    #Partially filled slice without the deepest nodes of the last columns
+    partial = ~((x > 8) & (y < -2))
+    
+    #Scattered points off the grid
+    x_scatter, y_scatter = np.random.rand(2, 100) * [[10], [3]] - [[0], [3]]
+    
+    fig, ax = plt.subplots()
+    grid_contour = slice_contourf(ax, x, y, z, 10, 'RdBu')
+    cached_triangulations = len(TRIANGULATION_CACHE)
+    partial_contour = slice_contourf(ax, x[partial], y[partial], z[partial], 10, 'RdBu')
+    assert len(TRIANGULATION_CACHE) == cached_triangulations, "***The partially filled slice is triangulated"
+    irregular_contour = slice_contourf(ax, x_scatter, y_scatter, z[:100], 10, 'RdBu')
+    cached_triangulations = len(TRIANGULATION_CACHE)
+    slice_contourf(ax, x_scatter, y_scatter, z[:100][::-1], 10, 'RdBu')
+    plt.close(fig)
+    
+    assert isinstance(grid_contour, QuadContourSet) and not isinstance(grid_contour, TriContourSet), "***The complete grid slice is not contoured on the grid"
+    assert isinstance(partial_contour, QuadContourSet) and not isinstance(partial_contour, TriContourSet), "***The partially filled slice is not contoured on the grid"
+    assert isinstance(irregular_contour, TriContourSet), "***The scattered slice is not triangulated"
+    assert len(TRIANGULATION_CACHE) == cached_triangulations, "***The triangulation of the same geometry is not reused"
+
+
+def test_decimate_points(expected_columns=4, max_points=1000):
+    #Create simple artifical dataset for testing
+    import numpy as np
+
+    x = np.linspace(0, 10, 40)
+    y = np.linspace(0, 10, 40)
+    z = np.linspace(0, 10, 40)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = np.random.rand(40, 40, 40)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    for statistic in ['mean', 'min', 'max', 'sample']:
+        test_decimated = decimate_points(test_array, max_points, statistic)
+        assert test_decimated.shape[1] == expected_columns, "***The function returns unexpected number of columns of array"
+        assert max_points / 8 <= len(test_decimated) <= max_points, "***The function does not follow the point budget"
+    
+    assert test_decimated[:,3].min() >= 0 and test_decimated[:,3].max() <= 1, "***The decimated velocity is outside the data range"
+    basin_scatterplot(test_array, max_points=max_points)
+
+
+def test_volume_pyramid(tmp_path):
+    #Create simple artifical dataset for testing
+    import numpy as np
+
+    x = np.linspace(0, 10, 33)
+    y = np.linspace(0, 10, 20)
+    z = np.linspace(-3, 0, 9)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = np.random.rand(20, 33, 9)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    #Leave empty grid nodes that should be ignored by the averaging
+    test_array[::7, 3] = np.nan
+    test_volume = VelocityVolume.from_array(test_array)
+    test_pyramid = VolumePyramid.from_volume(test_volume)
+    
+    assert test_pyramid.levels[1].shape == (17, 10, 5), "***The first coarse level does not halve every axis"
+    assert np.isclose(test_pyramid.levels[1].values[0, 0, 0], np.nanmean(test_volume.values[:2, :2, :2])), "***The coarse node is not the NaN-aware average"
+    
+    test_pyramid.save(str(tmp_path))
+    loaded_pyramid = VolumePyramid.load(str(tmp_path), test_volume)
+    assert len(loaded_pyramid.levels) == len(test_pyramid.levels), "***The stored pyramid has different number of levels"
+    
+    #A pyramid stored from another dataset is not loaded for the current one
+    test_array[0, 3] = 5.0
+    assert VolumePyramid.load(str(tmp_path), VelocityVolume.from_array(test_array)) is None, "***The stale pyramid of a changed dataset is loaded"
+    
+    #Coarse view of the whole basin and finer view of a zoomed window
+    assert loaded_pyramid.level_for(5).shape[:2] == test_pyramid.levels[2].shape[:2], "***The function does not pick the coarsest level that meets the resolution"
+    assert loaded_pyramid.level_for(5, lat_range=(0, 3), lon_range=(0, 3)).shape[:2] == (10, 6), "***The function does not refine the zoomed window"
+    assert len(north_south_slice(loaded_pyramid, 5.0, resolution=5)['Latitude'].unique()) == 9, "***The slice is not taken from the picked level"
+
+
+def test_chunked_volume_store(tmp_path):
+    #Create simple artifical dataset for testing
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+
+    x = np.linspace(-6.4, -6.1, 25)
+    y = np.linspace(106.6, 107.0, 30)
+    z = np.linspace(-3, 0, 20)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = 0.2 - zi + np.random.rand(30, 25, 20) * 0.01
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    
+    test_volume = VelocityVolume.from_array(test_array)
+    test_store = ChunkedVolumeStore.from_volume(test_volume, str(tmp_path / "store"), chunk_shape=(8, 8, 8), cache_size=4)
+    test_store = ChunkedVolumeStore(str(tmp_path / "store"), cache_size=4)
+    
+    #A section only loads the chunks it intersects
+    ns_section = test_store.north_south_section(y[3])
+    assert np.array_equal(ns_section, test_volume.north_south_section(y[3])), "***The store section differs from the grid section"
+    assert test_store.chunk_reads == 4 * 3, "***The section loads chunks it does not intersect"
+    assert np.array_equal(test_store.read(slice(3, 20), slice(5, 9), slice(2, 17)), test_volume.values[3:20, 5:9, 2:17]), "***The store region differs from the grid region"
+    assert np.array_equal(test_store.read(slice(1, None, 3), slice(None, None, -2), slice(18, 2, -5)), test_volume.values[1::3, ::-2, 18:2:-5]), "***The stepped store region differs from the grid region"
+
+    #Streamed rows keep the first velocity of a repeated node, across batches and inside one batch
+    batch_store = ChunkedVolumeStore.create(str(tmp_path / "batches"), test_volume.latitude, test_volume.longitude, test_volume.depth, chunk_shape=(8, 8, 8))
+    batch_store.write_batches([test_array[:5000], test_array[:5000:7] + [0, 0, 0, 1], test_array[5000:], test_array[5000:] + [0, 0, 0, 1]])
+    assert np.array_equal(batch_store.read(), test_volume.values), "***The streamed store does not keep the first velocity of a node"
+    
+    #Concurrent reads from several threads
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        sections = list(executor.map(test_store.east_west_section, x))
+    assert all(np.array_equal(section, test_volume.east_west_section(lat)) for section, lat in zip(sections, x)), "***The concurrent reads differ from the grid"
+    
+    #Cross section and iso-depth from the store
+    assert np.allclose(cross_section(test_store, (-6.35, 106.65), (-6.15, 106.95), 2.0)[3], cross_section(test_volume, (-6.35, 106.65), (-6.15, 106.95), 2.0)[3]), "***The store cross section differs from the grid"
+    store_sites, store_table = isovelocity_table(test_store, [1.0, 2.0])
+    order = np.lexsort((store_sites[:,1], store_sites[:,0]))
+    assert np.allclose(store_table[order], isovelocity_table(test_volume, [1.0, 2.0])[1]), "***The store iso-depth differs from the grid"
+
+
+def test_iter_import_file(tmp_path, batch_rows=7):
+    """Test the streamed batches and their incremental consumers against the whole imported array"""
+    import numpy as np
+    
+    #Write artificial site files on a regular grid with longitude-latitude header
+    depth = np.linspace(0, 3, 12)
+    files_test = write_site_files(tmp_path, [(106 + 0.1 * j, -6 - 0.1 * i, depth, 0.2 + depth * (1 + 0.1 * i + 0.01 * j)) for i in range(3) for j in range(4)])
+    
+    test_array = import_file(files_test)
+    batches = list(iter_import_file(files_test, batch_rows))
+    
+    assert all(len(batch) == batch_rows for batch in batches[:-1]), "***The batches do not have fixed size"
+    assert np.array_equal(np.concatenate(batches), test_array), "***The streamed batches differ from the imported array"
+    
+    #Statistics and axes from the stream
+    statistics = stream_statistics(iter_import_file(files_test, batch_rows))
+    assert statistics['rows'] == len(test_array), "***The streamed statistics miss rows"
+    assert np.isclose(statistics['velocity_mean'], test_array[:,3].mean()) and np.isclose(statistics['velocity_std'], test_array[:,3].std()), "***The streamed statistics differ from the whole array"
+    axes = stream_axes(iter_import_file(files_test, batch_rows))
+    assert all(np.array_equal(a, b) for a, b in zip(axes, parameter_list(test_array))), "***The streamed axes differ from parameter_list()"
+    
+    #Iso-depth from the stream
+    stream_sites, stream_table = stream_isovelocity(iter_import_file(files_test, batch_rows), [1.0, 2.0])
+    order = np.lexsort((stream_sites[:,1], stream_sites[:,0]))
+    assert np.allclose(stream_table[order], isovelocity_table(test_array, [1.0, 2.0])[1]), "***The streamed iso-depth differs from the whole array"
+
+    #A following file at the same coordinate with its own sampling is kept apart by the file index, in file order
+    files_repeat = files_test + write_site_files(tmp_path, [(106.3, -6.2, np.linspace(0, 2.5, 9), np.linspace(0.1, 2.2, 9))], "site_repeat_%d.dat")
+    stream_sites, stream_table = stream_isovelocity(iter_import_file(files_repeat, batch_rows, return_sites=True), [1.0, 2.0])
+    for v_index, velocity in enumerate([1.0, 2.0]):
+        file_table = isovelocity(files_repeat, velocity)
+        assert np.array_equal(stream_sites, file_table[:, :2]), "***The streamed sites are not in file order"
+        assert np.allclose(stream_table[:, v_index], file_table[:,2], equal_nan=True), "***The streamed iso-depth differs from isovelocity()"
+    assert len(stream_isovelocity(iter_import_file(files_repeat, batch_rows), [1.0])[0]) == len(files_test), "***Consecutive rows of one coordinate are not one site without the file index"
+    
+    #Writing the stream into an on-disk store
+    test_store = ChunkedVolumeStore.create(str(tmp_path / "store"), *axes, chunk_shape=(2, 2, 5))
+    test_store.write_batches(iter_import_file(files_test, batch_rows))
+    assert np.array_equal(test_store.read(), VelocityVolume.from_array(test_array).values), "***The streamed store differs from the grid"
+
+
+
+def test_compact_dataset(expected_shape=(25, 3)):
+    """Test the compact storage modes against the full float64 array and their documented error bounds"""
+    import numpy as np
+    
+    #Create simple artifical dataset with velocity increasing with depth for testing
+    x = np.linspace(0, 10, 5)
+    y = np.linspace(0, 10, 5)
+    z = np.linspace(-3, 0, 31)
+    xi, yi, zi = np.meshgrid(x, y, z)
+    val = 0.2 - zi * (1 + 0.01 * xi)
+
+    test_array = np.stack((xi.flatten(), 
+                           yi.flatten(), 
+                           zi.flatten(), 
+                           val.flatten()), 
+                          axis=1)
+    test_array[5, 3] = np.nan
+    
+    velocities = [0.5, 1.0, 2.5]
+    expected_table = isovelocity_table(test_array, velocities)[1]
+    
+    for storage in ['float64', 'float32', 'quantized']:
+        test_compact = CompactDataset.from_array(test_array, storage)
+        compact_array = test_compact.to_array()
+        
+        assert len(test_compact.sites) == 25, "***The site table has unexpected number of sites"
+        assert test_compact.nbytes < test_array.nbytes, "***The compact dataset is not smaller than the array"
+        assert np.array_equal(compact_array[:, :2], test_array[:, :2]), "***The coordinates differ after expanding"
+        assert np.isnan(compact_array[5, 3]), "***The missing velocity is not kept"
         
+        #Depth and velocity within the documented error bounds
+        bound = test_compact.error_bound
+        assert np.all(np.abs(compact_array[:,2] - test_array[:,2]) <= np.abs(test_array[:,2]) * bound['depth_relative']), "***The depth error exceeds its relative bound"
+        assert np.max(np.abs(compact_array[:,2] - test_array[:,2])) <= bound['depth_absolute'] * (1 + 1e-9), "***The depth error exceeds its absolute bound"
+        error = np.abs(compact_array[:,3] - test_array[:,3])
+        if storage == 'quantized':
+            assert np.nanmax(error) <= bound['velocity_absolute'] * (1 + 1e-9), "***The fixed point error exceeds its bound"
+        else:
+            assert np.nanmax(error / np.abs(test_array[:,3])) <= bound['velocity_relative'], "***The floating point error exceeds its bound"
+        
+        #Batch by batch construction gives the same dataset, also when a site continues in the next batch
+        batch_compact = CompactDataset.from_batches(np.array_split(test_array, 7), storage)
+        assert np.array_equal(batch_compact.lengths, test_compact.lengths), "***The batches give a different site table"
+        assert np.array_equal(batch_compact.to_array(), compact_array, equal_nan=True), "***The batches give a different dataset"
+        
+        #Functions accept the compact dataset
+        assert all(np.allclose(a, b) for a, b in zip(parameter_list(test_compact), parameter_list(test_array))), "***The compact axes differ"
+        test_table = isovelocity_table(test_compact, velocities)[1]
+        assert test_table.shape == expected_shape, "***The function returns table with unexpected shape"
+        assert np.allclose(test_table, expected_table, equal_nan=True, atol=0.1), "***The compact iso-depth differs from the array"
+        test_volume = VelocityVolume.from_array(test_compact)
+        assert np.array_equal(test_volume.values, VelocityVolume.from_array(compact_array).values, equal_nan=True), "***The compact grid differs from the expanded grid"
+        test_dataframe = plotly_friendly_dataframe(test_compact)
+        assert northeast_southwest_slice(test_compact, test_dataframe).equals(northeast_southwest_slice(compact_array, test_dataframe)), "***The compact slice differs from the expanded slice"
+        assert test_compact.scatter_velocity(np.arange(25) * 31, test_volume.depth, 25 * 31, block_rows=100).shape == (25 * 31,), "***The blockwise scatter has unexpected size"
+    
+    #Fixed point with a known range is encoded batch by batch, and the file index keeps equal coordinates apart
+    repeated_array, file_index = np.concatenate((test_array[:31], test_array[:31])), np.repeat([0, 1], 31)
+    site_compact = CompactDataset.from_batches([(repeated_array[:40], file_index[:40]), (repeated_array[40:], file_index[40:])], 'quantized', (0.0, 4.0))
+    assert site_compact.stored_velocity.dtype == np.uint16 and site_compact.scale == 4.0 / 65534, "***The known range is not used as the fixed point scale"
+    assert np.array_equal(site_compact.lengths, [31, 31]), "***The file index does not split the sites"
+    assert np.array_equal(CompactDataset.from_batches([repeated_array[:40], repeated_array[40:]]).lengths, [62]), "***Consecutive rows of one coordinate are not one site without the file index"
+
+
+def test_dataset_index():
+    """Test the bounding box, radius, depth window, and velocity range queries against boolean masking of the whole array"""
+    import numpy as np
+    
+    #Create artificial dataset on scattered sites with a few depths
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-7, -6, 500)
+    lon = rng.uniform(106, 107, 500)
+    test_array = np.stack((np.repeat(lat, 6), 
+                           np.repeat(lon, 6), 
+                           np.tile(np.linspace(-2.5, 0, 6), 500), 
+                           rng.uniform(0.1, 3, 3000)), 
+                          axis=1)
+    
+    test_index = DatasetIndex(test_array)
+    in_box = (test_array[:,0] >= -6.6) & (test_array[:,0] <= -6.3) & (test_array[:,1] >= 106.2) & (test_array[:,1] <= 106.4)
+    in_depth = (test_array[:,2] >= -1.5) & (test_array[:,2] <= -0.5)
+    in_vs = (test_array[:,3] >= 1.0) & (test_array[:,3] <= 2.0)
+    
+    assert np.array_equal(test_index.rows(test_index.bbox((-6.6, -6.3), (106.2, 106.4))), np.flatnonzero(in_box)), "***The bounding box query returns different rows"
+    assert np.array_equal(test_index.radius(-6.5, 106.5, 20.0), np.flatnonzero(haversine_distance(-6.5, 106.5, lat, lon) <= 20.0)), "***The radius query returns different sites"
+    assert np.array_equal(test_index.depth_window(-1.5, -0.5), np.flatnonzero(in_depth)), "***The depth query returns different rows"
+    assert np.array_equal(test_index.vs_range(1.0, 2.0), np.flatnonzero(in_vs)), "***The velocity query returns different rows"
+    assert np.array_equal(test_index.query(lat_range=(-6.6, -6.3), lon_range=(106.2, 106.4), depth_range=(-1.5, -0.5), vs_range=(1.0, 2.0)), 
+                          np.flatnonzero(in_box & in_depth & in_vs)), "***The combined query returns different rows"
+    assert np.shares_memory(test_array[test_index.site_rows(3)], test_array), "***The rows of one site are not a view"
+    
+    #Same queries on the compact dataset
+    compact_index = DatasetIndex(CompactDataset.from_array(test_array, 'float64'))
+    assert np.array_equal(compact_index.query(lat_range=(-6.6, -6.3), lon_range=(106.2, 106.4), vs_range=(1.0, 2.0)), np.flatnonzero(in_box & in_vs)), "***The compact query returns different rows"
+    
+    #Stored velocity is searched without a decoded copy, with the same rows as the decoded velocity
+    for storage in ['float32', 'quantized']:
+        test_compact = CompactDataset.from_array(test_array, storage)
+        compact_index = DatasetIndex(test_compact)
+        decoded = test_compact.velocity
+        assert compact_index.velocity.dtype == test_compact.stored_velocity.dtype, "***The index keeps a decoded copy of velocity"
+        for minimum, maximum in [(1.0, 2.0), (decoded[7], decoded[7]), (-np.inf, decoded[11]), (5.0, 6.0)]:
+            assert np.array_equal(compact_index.vs_range(minimum, maximum), np.flatnonzero((decoded >= minimum) & (decoded <= maximum))), "***The stored velocity query returns different rows"
+        assert np.array_equal(compact_index.query(lat_range=(-6.6, -6.3), lon_range=(106.2, 106.4), vs_range=(1.0, 2.0)), np.flatnonzero(in_box & (decoded >= 1.0) & (decoded <= 2.0))), "***The compact row filter returns different rows"
+
+
+def test_aggregate_measurements(expected_locations=40):
+    """Test the merged repeated measurements against pandas groupby on an artificial dataset with jittered coordinates"""
+    import numpy as np
+    import pandas as pd
+    
+    #Create artificial dataset with several measurements at every location
+    rng = np.random.default_rng(0)
+    location = rng.integers(0, expected_locations, 2000)
+    lat = -6 - (location // 8) * 0.1
+    lon = 106 + (location % 8) * 0.1
+    test_array = np.stack((lat + rng.uniform(-1e-5, 1e-5, 2000), 
+                           lon + rng.uniform(-1e-5, 1e-5, 2000), 
+                           np.full(2000, -0.5), 
+                           rng.uniform(0.1, 3, 2000)), 
+                          axis=1)
+    test_array[0, 3] = np.nan
+    
+    group = pd.DataFrame({'lat': lat, 'lon': lon, 'vs': test_array[:,3]}).groupby(['lat', 'lon'])['vs']
+    
+    for statistic, expected in [('mean', group.mean()), ('median', group.median()), ('std', group.std(ddof=0)), ('count', group.count())]:
+        test_result, test_std, test_count = aggregate_measurements(test_array, (1e-3, 1e-3, 0), statistic)
+        
+        assert test_result.shape == (expected_locations, 4), "***The function returns unexpected number of locations"
+        assert np.allclose(test_result[:, :2], np.stack((expected.index.get_level_values(0), expected.index.get_level_values(1)), axis=1), atol=1e-4), "***The function returns different locations"
+        assert np.allclose(test_result[:,3], expected.values), "***The function returns different %s" % statistic
+        assert np.allclose(test_std, group.std(ddof=0).values) and np.array_equal(test_count, group.count().values), "***The function returns different uncertainty"
+        
+        #The compact dataset is aggregated from its site table without a different result
+        compact_result = aggregate_measurements(CompactDataset.from_array(test_array, 'float64'), (1e-3, 1e-3, 0), statistic)
+        assert all(np.array_equal(a, b) for a, b in zip(compact_result, (test_result, test_std, test_count))), "***The compact dataset returns different %s" % statistic
+    
+    #Profiles of two sites measured twice at the exact same coordinates
+    depth = np.linspace(0, 3, 7)
+    profiles = np.concatenate([np.stack((np.full(7, -6 - 0.1 * (i % 2)), np.full(7, 106.0), -depth, 0.2 + depth + 0.01 * i), axis=1) for i in range(4)])
+    compact_result = aggregate_measurements(CompactDataset.from_array(profiles, 'float32'), statistic='median')
+    assert len(compact_result[0]) == 14 and (compact_result[2] == 2).all(), "***The repeated sites of the compact dataset are not merged"
+    assert np.allclose(compact_result[0], aggregate_measurements(profiles, statistic='median')[0]), "***The compact dataset returns different median"
+
+
+def test_resample_depth(expected_depths=31):
+    """Test the common depth axis against numpy interpolation of every profile with its own depth sampling"""
+    import numpy as np
+    
+    #Create artificial profiles with different depth sampling at every site
+    rng = np.random.default_rng(1)
+    profiles = []
+    for i in range(12):
+        depth = np.concatenate(([0], np.sort(rng.uniform(0, 3, 10 + i)), [3]))
+        vel = 0.2 + depth * (1 + 0.1 * i)
+        profiles.append(np.stack((np.full(len(depth), -6 - 0.1 * (i // 4)), 
+                                  np.full(len(depth), 106 + 0.1 * (i % 4)), 
+                                  -depth, 
+                                  vel), 
+                                 axis=1))
+    test_array = np.concatenate(profiles)
+    
+    test_resampled = resample_depth(test_array, spacing=0.1)
+    
+    assert len(parameter_list(test_resampled)[2]) == expected_depths, "***The function returns unexpected number of depths"
+    assert len(test_resampled) == expected_depths * len(profiles), "***The function returns unexpected number of rows"
+    for profile in profiles:
+        site = test_resampled[(test_resampled[:,0] == profile[0, 0]) & (test_resampled[:,1] == profile[0, 1])]
+        assert np.allclose(site[:,3], np.interp(site[:,2], profile[::-1, 2], profile[::-1, 3])), "***The function returns different velocity from interpolation"
+    
+    #User depth axis beyond the measured range
+    test_axis = np.linspace(-4, 0, 9)
+    assert set(resample_depth(test_array, depth=test_axis)[:,2]) == set(test_axis[test_axis >= -3]), "***The function returns depth outside the profiles"
+
+
+def test_instrumentation(tmp_path):
+    """Test the stage records, per-file parse records, exporters, and the cProfile capture of one stage"""
+    import json
+    import numpy as np
+    
+    #Write artificial site files with longitude-latitude header
+    depth = np.linspace(0, 3, 11)
+    files_test = write_site_files(tmp_path, [(106 + 0.1 * i, -6, depth, 0.2 + depth) for i in range(4)])
+    
+    summary = {}
+    log_file = str(tmp_path / "stages.jsonl")
+    with instrumentation([summary_exporter(summary), json_lines_exporter(log_file)], trace_memory=True, profile_stage='parameter_list') as records:
+        test_array = import_file(files_test)
+        parameter_list(test_array)
+    
+    stages = [record['stage'] for record in records]
+    assert stages == ['read_profile'] * 4 + ['import_file', 'parameter_list'], "***The instrumentation records unexpected stages"
+    assert all(record['rows_out'] == 11 and record['bytes_in'] > 0 for record in records[:4]), "***The per-file records miss parse statistics"
+    assert records[4]['rows_in'] == 4 and records[4]['rows_out'] == 44, "***The stage record has unexpected rows"
+    assert records[4]['peak_bytes'] >= max(record['peak_bytes'] for record in records[:4]), "***The stage peak misses the peak of its inner stages"
+    assert 'profile' in records[5] and 'profile' not in records[4], "***The profile is not captured for the chosen stage only"
+    assert summary['read_profile']['calls'] == 4, "***The summary exporter misses calls"
+    assert [json.loads(line)['stage'] for line in open(log_file)] == stages, "***The JSON lines exporter misses records"
+    
+    #Nothing is recorded once disabled
+    assert not INSTRUMENTATION['enabled'], "***The instrumentation is not disabled after the block"
+    parameter_list(test_array)
+    assert len(records) == 6, "***Stages are recorded while disabled"
+
+    #Stages in a thread pool keep their own nesting and every record reaches the exporters
+    import tracemalloc
+    from concurrent.futures import ThreadPoolExecutor
+    summary = {}
+    with instrumentation([summary_exporter(summary)], trace_memory=True) as records:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda i: import_file(files_test), range(16)))
+    assert len(records) == 16 * 5 and summary['read_profile']['calls'] == 16 * 4, "***Records of concurrent stages are lost"
+    assert all(record['peak_bytes'] >= 0 for record in records), "***The memory of concurrent stages is not traced"
+    assert INSTRUMENTATION['traced_stages'] == 0 and not tracemalloc.is_tracing(), "***Memory tracing is left running after the concurrent stages"
+
+
+def test_lazy_import():
+    """Test that reading files and computing iso-velocity through the package never loads pandas or matplotlib"""
+    import os
+    import sys
+    import subprocess
+    
+    #Run in a fresh interpreter from the folder above the package
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys\n"
+            "from src.basin_velocity.io import import_file\n"
+            "from src.basin_velocity.constant_velocity import isovelocity\n"
+            "import src.basin_velocity as package\n"
+            "package.parameter_list, package.VelocityVolume, package.isovelocity_table\n"
+            "print(sorted(name for name in ('matplotlib', 'pandas') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    
+    assert result.returncode == 0, "***The package cannot be imported: " + result.stderr
+    assert result.stdout.strip() == "[]", "***Importing the data-processing submodules loads plotting modules"
+    assert isovelocity is __import__('src.basin_velocity', fromlist=['isovelocity']).isovelocity, "***The compatibility module exports different functions"
+
+
+def test_command_line(tmp_path, capsys):
+    """Test that every step of the command line writes an artifact and that a step with unchanged inputs is skipped"""
+    import os
+    import numpy as np
+    from src.basin_velocity.cli import main
+    
+    #Write artificial site files on a regular grid with longitude-latitude header
+    depth = np.linspace(0, 3, 16)
+    write_site_files(tmp_path, [(106 + 0.1 * j, -6 - 0.1 * i, depth, 0.2 + depth * (1 + 0.1 * j)) for i in range(3) for j in range(4)])
+    
+    workspace = str(tmp_path / "workspace")
+    steps = [['ingest', str(tmp_path / "*.dat")], 
+             ['grid'], 
+             ['slice', '--longitude', '106.1', '--line', '-6.0', '106.0', '-6.2', '106.3'], 
+             ['render'], 
+             ['isovelocity', '1.0', '2.0']]
+    for step in steps:
+        assert main(['--workspace', workspace] + step) == 0, "***The %s step fails" % step[0]
+    assert "reusing" not in capsys.readouterr().out, "***A new step is skipped"
+    
+    #Unchanged inputs reuse every artifact
+    for step in steps:
+        main(['--workspace', workspace] + step)
+    assert capsys.readouterr().out.count("reusing") == len(steps), "***A step runs again with unchanged inputs"
+    
+    #The interpolation method is ignored by the measured grid
+    main(['--workspace', workspace, 'grid', '--method', 'idw'])
+    assert "reusing" in capsys.readouterr().out, "***The measured grid is built again after a change of interpolation method"
+    
+    #A change of style renders again from the same sections
+    main(['--workspace', workspace, 'render', '--cmap', 'viridis'])
+    output = capsys.readouterr().out
+    assert output.startswith("render: wrote"), "***The render step is not run after a change of style"
+    assert len(os.listdir(output.split()[-1])) == 2, "***The render step writes unexpected number of images"
+
+    #Contour levels do not change the sections, and the colour map changes the maps
+    main(['--workspace', workspace, 'render', '--cmap', 'viridis', '--levels', '5'])
+    assert "reusing" in capsys.readouterr().out, "***The sections are rendered again after a change of the map levels"
+    main(['--workspace', workspace, 'render', '--maps', '0.1'])
+    main(['--workspace', workspace, 'render', '--maps', '0.1', '--cmap', 'magma'])
+    assert capsys.readouterr().out.count("render: wrote") == 2, "***The maps are not rendered again after a change of colour map"
+
+
+def test_sparse_volume(expected_shape=(20, 30, 15)):
+    """Test the sparse grid of an elongated basin against the dense grid"""
+    import numpy as np
+    
+    #Create artificial dataset inside an elongated diagonal band of the bounding rectangle
+    x = np.linspace(-6.5, -6.0, 20)
+    y = np.linspace(106.5, 107.0, 30)
+    z = np.linspace(-3, 0, 15)
+    xi, yi, zi = np.meshgrid(x, y, z, indexing='ij')
+    val = 0.2 - zi * (1 + xi - yi)
+    inside = np.abs((xi + 6.5) / 0.5 - (yi - 106.5) / 0.5) < 0.15
+    
+    test_array = np.stack((xi[inside], yi[inside], zi[inside], val[inside]), axis=1)
+    test_volume = VelocityVolume.from_array(test_array)
+    test_sparse = SparseVolume.from_array(test_array)
+    
+    assert test_sparse.shape == expected_shape, "***The sparse grid has unexpected shape"
+    assert test_sparse.mask.sum() == inside[:, :, 0].sum(), "***The sparse grid stores empty columns"
+    assert test_sparse.nbytes < test_volume.values.nbytes / 2, "***The sparse grid is not smaller than the dense grid"
+    assert np.array_equal(test_sparse.to_volume().values, test_volume.values, equal_nan=True), "***The dense view differs from the dense grid"
+    assert np.array_equal(SparseVolume.from_volume(test_volume).profiles, test_sparse.profiles), "***The packed profiles differ between constructors"
+    
+    #Sections, cross sections, and iso-depth skip the empty columns
+    sparse_slice = north_south_slice(test_sparse, y[12])
+    assert np.array_equal(sparse_slice.to_numpy(), north_south_slice(test_volume, y[12]).to_numpy()), "***The north-south slice differs from the dense grid"
+    assert np.array_equal(east_west_slice(test_sparse, x[7]).to_numpy(), east_west_slice(test_volume, x[7]).to_numpy()), "***The east-west slice differs from the dense grid"
+    assert np.array_equal(test_sparse.east_west_section(x[7]), test_volume.east_west_section(x[7]), equal_nan=True), "***The east-west section differs from the dense grid"
+    assert np.allclose(cross_section(test_sparse, (-6.5, 106.5), (-6.0, 107.0), 2.0)[3], cross_section(test_volume, (-6.5, 106.5), (-6.0, 107.0), 2.0)[3], equal_nan=True), "***The cross section differs from the dense grid"
+    assert np.allclose(isovelocity_table(test_sparse, [0.5, 1.0])[1], isovelocity_table(test_volume, [0.5, 1.0])[1], equal_nan=True), "***The iso-depth differs from the dense grid"
+    assert len(test_sparse.dataframe) == np.prod(expected_shape), "***The dense plotly view has unexpected number of rows"
+
+def test_isovelocity_mixed_spacing(tmp_path, expected_depth=(1000.0, 1625.0)):
+    """Test that the iso-depth of sites with different depth spacing on the common depth axis is interpolated between the own samples of every site, as in isovelocity()"""
+    import numpy as np
+    
+    #Write artificial site files with linear velocity and different depth spacing
+    sites = [(106 + 0.1 * i, -6, np.linspace(0, 3, 7 + 5 * i), 0.2 + 0.8 * np.linspace(0, 3, 7 + 5 * i)) for i in range(4)]
+    files_test = write_site_files(tmp_path, sites)
+    test_array = import_file(files_test)
+    
+    test_sites, test_table = isovelocity_table(test_array, [1.0, 1.5])
+    order = np.lexsort((test_sites[:,0], test_sites[:,1]))
+    
+    assert np.allclose(test_table, expected_depth), "***The iso-depth snaps to samples of other sites"
+    for v_index, velocity in enumerate([1.0, 1.5]):
+        assert np.allclose(test_table[order, v_index], isovelocity(files_test, velocity)[:, 2]), "***The iso-depth differs from isovelocity"
     
-    
\ No newline at end of file
+    stream_table = stream_isovelocity(iter_import_file(files_test, batch_rows=10, return_sites=True), [1.0, 1.5])[1]
+    assert np.allclose(stream_table, expected_depth), "***The streamed iso-depth differs from the own samples of every site"